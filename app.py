@@ -1,14 +1,81 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from core.enhanced_tryangel import EnhancedTryAngel
+from core import metrics
+from core.instance_registry import InstanceRegistry
+from core.memory_log import iter_log, offset_for_timestamp
+from core.profile_store import get_profile_store
+from core.retention import get_retention_compactor
+from core.tts_cache import get_tts_cache
+from core.tts_jobs import QueueFull, get_tts_queue
+import cProfile
+import datetime
+import json
 import os
+import time
+from urllib.parse import quote
 
 app = Flask(__name__)
-instances = {}
+instances = InstanceRegistry(EnhancedTryAngel)
+tts_cache = get_tts_cache()
+tts_queue = get_tts_queue()
+VOICE_CACHE_MAX_AGE = 365 * 24 * 3600
+ASYNC_TTS_DEFAULT = os.environ.get("TRYANGEL_TTS_ASYNC", "0") == "1"
+STATUS_MAX_WAIT = 30.0
+MEMORY_PAGE_MAX = 500
+BATCH_MAX_ITEMS = int(os.environ.get("TRYANGEL_BATCH_MAX_ITEMS", "200"))
+BATCH_TTS_TIMEOUT = 60.0
+# Profilage cProfile d'une requête avec l'en-tête X-TryAngel-Profile: 1 (si TRYANGEL_PROFILING=1).
+PROFILING_ALLOWED = os.environ.get("TRYANGEL_PROFILING", "0") == "1"
+PROFILE_DIR = os.environ.get("TRYANGEL_PROFILE_DIR", "request_profiles")
+
+metrics.stats_collector("tryangel_tts_cache", tts_cache.stats, counters=("hits", "misses", "evictions"))
+metrics.stats_collector("tryangel_tts_queue", tts_queue.stats, counters=("rejected",))
+metrics.stats_collector("tryangel_instances", instances.stats, counters=("hits", "misses", "evictions"))
+metrics.stats_collector("tryangel_profiles", lambda: get_profile_store().stats(),
+                        counters=("hits", "misses", "evictions", "events", "writes"))
+retention = get_retention_compactor()
+retention.start()
+metrics.stats_collector("tryangel_retention", retention.stats,
+                        counters=("passes", "users_compacted") + tuple(k for k in retention.stats() if k.startswith("archived_")))
 
 def get_instance(user_id):
-    if user_id not in instances:
-        instances[user_id] = EnhancedTryAngel(user_id=user_id)
-    return instances[user_id]
+    return instances.get(user_id)
+
+@app.before_request
+def start_request_timer():
+    if metrics.ENABLED:
+        g.request_start = time.perf_counter()
+    if PROFILING_ALLOWED and request.headers.get("X-TryAngel-Profile") == "1":
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def stop_request_timer(response):
+    # Mesure et profil sont clos à la fermeture de la réponse, pas ici : les corps en flux
+    # (/speak en stream, /memory en ndjson) ne sont générés qu'après after_request.
+    profiler = g.pop("profiler", None)
+    start = g.pop("request_start", None)
+    if profiler is None and start is None:
+        return response
+    endpoint = request.endpoint or "unknown"
+    path = None
+    if profiler is not None:
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}.prof")
+        response.headers["X-TryAngel-Profile"] = path
+
+    def finish_request():
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(path)
+        if start is not None:
+            metrics.REQUEST_SECONDS.observe(endpoint, time.perf_counter() - start)
+    response.call_on_close(finish_request)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/speak", methods=["POST"])
 def speak():
@@ -17,9 +84,14 @@ def speak():
     message = data.get("message")
     if not message:
         return jsonify({"error": "Message is required."}), 400
-    instance = get_instance(user_id)
-    response = instance.learner.generate_response(message)
+    with metrics.stage("instance_lookup"):
+        instance = get_instance(user_id)
+    response = instance.respond(message)
     instance.save_memory(message, response)
+    if data.get("stream"):
+        return speak_stream(instance, user_id, response)
+    if data.get("async", ASYNC_TTS_DEFAULT):
+        return speak_async(instance, user_id, message, response)
     voice_path = instance._text_to_speech(response)
     voice_filename = os.path.basename(voice_path)
     print(f"✅ Fichier vocal généré : {voice_filename}")
@@ -31,15 +103,260 @@ def speak():
         "voice_url": f"http://127.0.0.1:5000/voices/{voice_filename}"
     })
 
+def voice_job_payload(job):
+    return {
+        "job_id": job["job_id"],
+        "voice_status": job["status"],
+        "voice_error": job["error"],
+        "voice_path": f"/voices/{job['filename']}",
+        "voice_url": f"http://127.0.0.1:5000/voices/{job['filename']}",
+        "status_url": f"/voices/status/{job['job_id']}"
+    }
+
+def speak_async(instance, user_id, message, response):
+    payload = {"user_id": user_id, "message": message, "response": response}
+    try:
+        job = instance._queue_text_to_speech(response)
+    except QueueFull as e:
+        # Contre-pression : la réponse texte est servie, la voix est à redemander plus tard.
+        payload.update({"voice_status": "rejected", "voice_error": str(e)})
+        return jsonify(payload), 503, {"Retry-After": "2"}
+    payload.update(voice_job_payload(job))
+    return jsonify(payload), 200 if job["status"] == "done" else 202
+
+def speak_stream(instance, user_id, response):
+    # Corps audio/mpeg en transfert par morceaux : la lecture commence dès la première phrase
+    # synthétisée. Le texte de la réponse est dans l'en-tête X-TryAngel-Response (encodé URL).
+    # Le premier morceau est attendu ici : une synthèse en échec donne encore une erreur 500,
+    # une file de synthèse pleine un 503 avec la réponse texte, comme en asynchrone.
+    audio = instance._stream_speech(response)
+    try:
+        first = next(audio, b"")
+    except QueueFull as e:
+        return jsonify({"user_id": user_id, "response": response, "voice_status": "rejected",
+                        "voice_error": str(e)}), 503, {"Retry-After": "2"}
+
+    def body():
+        yield first
+        yield from audio
+    return Response(stream_with_context(body()), mimetype="audio/mpeg", headers={
+        "X-TryAngel-User": quote(user_id),
+        "X-TryAngel-Response": quote(response),
+        "Cache-Control": "no-store",
+    })
+
+@app.route("/speak/batch", methods=["POST"])
+def speak_batch():
+    # {"items": [{"user_id": ..., "message": ...}], "async": false}
+    # Par utilisateur : un ajout au journal et une écriture de profil pour tout le lot.
+    # Textes identiques (même voix) synthétisés une seule fois, en parallèle sur la file TTS.
+    data = request.json or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items (non-empty list) is required."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch."}), 413
+
+    results = [None] * len(items)
+    by_user = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("message"):
+            results[index] = {"index": index, "error": "Message is required."}
+            continue
+        by_user.setdefault(item.get("user_id", "utilisateur_defaut_001"), []).append(index)
+
+    # Un lot peut dépasser la capacité de la file TTS : chaque synthèse attend une place,
+    # dans la limite de BATCH_TTS_TIMEOUT pour tout le lot.
+    deadline = time.monotonic() + BATCH_TTS_TIMEOUT
+    jobs = {}
+    for user_id, indexes in by_user.items():
+        try:
+            instance = get_instance(user_id)
+            voice = instance.profile["preferred_voice"]
+            exchanges = []
+            for index in indexes:
+                message = items[index]["message"]
+                exchanges.append((message, instance.respond(message)))
+            instance.save_memories(exchanges)
+            instance.flush_profile()
+        except Exception as e:
+            for index in indexes:
+                results[index] = {"index": index, "user_id": user_id, "error": str(e)}
+            continue
+        for index, (message, response) in zip(indexes, exchanges):
+            result = results[index] = {"index": index, "user_id": user_id, "message": message, "response": response}
+            key = tts_cache.cache_key(response, "fr", voice)
+            if key not in jobs:
+                try:
+                    jobs[key] = tts_queue.submit(response, "fr", voice, wait=max(deadline - time.monotonic(), 0))
+                except QueueFull as e:
+                    jobs[key] = {"status": "rejected", "error": str(e)}
+            result["voice_key"] = key
+
+    if not data.get("async", ASYNC_TTS_DEFAULT):
+        for key, job in jobs.items():
+            if "job_id" in job and job["status"] not in ("done", "failed"):
+                jobs[key] = tts_queue.status(job["job_id"], wait=max(deadline - time.monotonic(), 0)) or job
+
+    for result in results:
+        job = jobs.get(result.pop("voice_key", None))
+        if job is None:
+            continue
+        if "job_id" in job:
+            result.update(voice_job_payload(job))
+        else:
+            result.update({"voice_status": job["status"], "voice_error": job["error"]})
+    return jsonify({
+        "results": results,
+        "users": len(by_user),
+        "syntheses": len(jobs),
+        "errors": sum(1 for r in results if r.get("error") or r.get("voice_status") in ("failed", "rejected")),
+    })
+
+@app.route("/voices/status/<job_id>", methods=["GET"])
+def voice_status(job_id):
+    # ?wait=<secondes> : attente longue jusqu'à la fin de la synthèse.
+    wait = min(request.args.get("wait", 0.0, type=float), STATUS_MAX_WAIT)
+    job = tts_queue.status(job_id, wait=wait)
+    if job is None:
+        return jsonify({"error": "Job inconnu."}), 404
+    return jsonify(voice_job_payload(job))
+
 @app.route("/voices/<filename>")
 def serve_voice(filename):
-    return send_from_directory("voices", filename)
+    voice_dir = os.path.abspath(tts_cache.voice_dir)
+    key = tts_cache.key_from_filename(filename)
+    if key is None:
+        return send_from_directory(voice_dir, filename)
+    # Nom adressé par contenu : l'empreinte sert d'ETag fort et le fichier ne change jamais.
+    response = send_from_directory(voice_dir, filename, etag=key, max_age=VOICE_CACHE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+@app.route("/voices/cache/stats", methods=["GET"])
+def voice_cache_stats():
+    return jsonify(tts_cache.stats())
+
+@app.route("/instances/stats", methods=["GET"])
+def instance_stats():
+    return jsonify(instances.stats())
+
+@app.route("/profiles/stats", methods=["GET"])
+def profile_stats():
+    return jsonify(get_profile_store().stats())
+
+def memory_bound(store, user_id, value, after):
+    # Curseur before/after (exclu) : position dans le journal (entier) ou timestamp ISO 8601.
+    # Retourne la borne de la tranche [début, fin) correspondante.
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value) + (1 if after else 0)
+    datetime.datetime.fromisoformat(value)
+    return offset_for_timestamp(store, user_id, value, strict=after)
+
+def project(entry, fields):
+    return {k: entry[k] for k in fields if k in entry} if fields else entry
 
 @app.route("/memory", methods=["GET"])
 def memory():
+    # Sans paramètre : tout le journal, en tableau JSON produit au fil de la lecture.
+    # limit/before/after : une page (curseurs exclus) ; format=ndjson : une entrée par ligne, en flux.
+    # fields=message,response : ne renvoie que ces champs.
     user_id = request.args.get("user_id", "utilisateur_defaut_001")
     instance = get_instance(user_id)
-    return jsonify(instance.memory)
+    store = instance.memory_store
+    fields = [f for f in request.args.get("fields", "").split(",") if f]
+    paginated = any(k in request.args for k in ("limit", "before", "after"))
+    try:
+        total = store.count(user_id)
+        after = memory_bound(store, user_id, request.args.get("after"), after=True)
+        before = memory_bound(store, user_id, request.args.get("before"), after=False)
+        limit = request.args.get("limit", MEMORY_PAGE_MAX if paginated else None, type=int)
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide : {e}"}), 400
+    # Par défaut la page la plus récente ; avec `after` seul, les entrées qui suivent.
+    start = 0 if after is None else min(after, total)
+    stop = total if before is None else min(before, total)
+    stop = max(stop, start)
+    if limit is not None:
+        limit = max(1, min(limit, MEMORY_PAGE_MAX) if paginated else limit)
+        if after is not None and before is None:
+            stop = min(start + limit, stop)
+        else:
+            start = max(start, stop - limit)
+
+    if request.args.get("format") == "ndjson":
+        def ndjson():
+            for offset, entry in enumerate(iter_log(store, user_id, start, stop), start):
+                yield json.dumps(dict(project(entry, fields), offset=offset), ensure_ascii=False) + "\n"
+        return Response(stream_with_context(ndjson()), mimetype="application/x-ndjson")
+
+    if not paginated:
+        def json_array():
+            yield "["
+            for offset, entry in enumerate(iter_log(store, user_id, start, stop), start):
+                yield ("," if offset > start else "") + json.dumps(project(entry, fields), ensure_ascii=False)
+            yield "]"
+        return Response(stream_with_context(json_array()), mimetype="application/json")
+
+    entries = [dict(project(entry, fields), offset=offset)
+               for offset, entry in enumerate(store.read(user_id, start, stop), start)]
+    return jsonify({
+        "user_id": user_id,
+        "total": total,
+        "entries": entries,
+        "before": start if start > 0 else None,
+        "after": stop - 1 if stop < total else None,
+    })
+
+@app.route("/memory/search", methods=["GET"])
+def memory_search():
+    user_id = request.args.get("user_id", "utilisateur_defaut_001")
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Query (q) is required."}), 400
+    try:
+        since = request.args.get("since")
+        since = datetime.datetime.fromisoformat(since) if since else None
+        cursor = request.args.get("cursor", type=int)
+        limit = request.args.get("limit", 20, type=int)
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide : {e}"}), 400
+    instance = get_instance(user_id)
+    result = instance.search_memory(query, since, cursor, limit)
+    result.update({"user_id": user_id, "q": query})
+    return jsonify(result)
+
+@app.route("/history/<name>", methods=["GET"])
+def history(name):
+    # Historique d'un utilisateur sur [since, until), périodes archivées comprises.
+    # name : feedback_history, comprehension_scores, emotion_log, memories_log ou voice_trace.
+    user_id = request.args.get("user_id", "utilisateur_defaut_001")
+    try:
+        since = request.args.get("since")
+        until = request.args.get("until")
+        for value in (since, until):
+            if value:
+                datetime.datetime.fromisoformat(value)
+        limit = request.args.get("limit", type=int)
+        entries = get_instance(user_id).learner.query(user_id, name, since, until, limit)
+    except ValueError as e:
+        return jsonify({"error": f"Paramètre invalide : {e}"}), 400
+    return jsonify({"user_id": user_id, "name": name, "entries": entries})
+
+@app.route("/history/<name>/summary", methods=["GET"])
+def history_summary(name):
+    user_id = request.args.get("user_id", "utilisateur_defaut_001")
+    try:
+        months = get_instance(user_id).learner.archive_summary(user_id, name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"user_id": user_id, "name": name, "months": months})
+
+@app.route("/retention/stats", methods=["GET"])
+def retention_stats():
+    return jsonify(retention.stats())
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,96 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import profile_stats
+from core.cohort_risk import load_frame, score_frame, verify
+from core.insf_local_learner import INSFLocalLearner
+
+# Compare le scoring d'abandon utilisateur par utilisateur et la version vectorisée,
+# sur des profils synthétiques en mémoire (les écritures disque sont exclues).
+# Le gain ne porte que sur le scoring : la construction du frame parcourt encore chaque
+# profil en Python et coûte à peu près autant que la boucle, d'où le chiffre bout en bout.
+
+
+def make_profiles(n_users: int, now: datetime.datetime, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    profiles = {}
+    for i in range(n_users):
+        history = []
+        for _ in range(rng.randint(0, 12)):
+            ts = now - datetime.timedelta(days=rng.uniform(0, 30))
+            history.append({
+                "timestamp": ts.isoformat(),
+                "voice_id": rng.choice("ABCDE"),
+                "feedback": rng.choice(["positif", "confus", "négatif", "oui", "mauvais"]),
+                "emotion": "neutre",
+                "speech_speed_sample": None,
+            })
+        history.sort(key=lambda fb: fb["timestamp"])
+        profile = {
+            "user_id": f"user_{i:06d}",
+            "trust_score": rng.randint(0, 100),
+            "feedback_history": history,
+            "comprehension_scores": [{"timestamp": now.isoformat(), "score": rng.random()} for _ in range(rng.randint(0, 6))],
+            "dropout_risk_score": rng.choice([0.1, 0.2, 0.35]),
+        }
+        profile["stats"] = profile_stats.compute_stats(profile)
+        profiles[profile["user_id"]] = profile
+    return profiles
+
+
+def bench(n_users: int) -> dict:
+    now = datetime.datetime.now()
+    profiles = make_profiles(n_users, now)
+
+    start = time.perf_counter()
+    per_user = {uid: INSFLocalLearner.compute_dropout_risk(p, p["stats"], now) for uid, p in profiles.items()}
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = load_frame(profiles)
+    frame_s = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = score_frame(frame, now)
+    score_s = time.perf_counter() - start
+
+    import pandas as pd
+    series = pd.Series(scores, index=list(profiles))
+    mismatches = verify(profiles, series, now)
+    assert all(per_user[uid] == series[uid] for uid in profiles)
+    return {
+        "users": n_users,
+        "per_user_loop_s": loop_s,
+        "frame_build_s": frame_s,
+        "vectorized_score_s": score_s,
+        "speedup_scoring": loop_s / score_s if score_s else None,
+        "speedup_end_to_end": loop_s / (frame_s + score_s),
+        "mismatches": len(mismatches),
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    results = [bench(n) for n in args.users]
+    for r in results:
+        print(f"{r['users']:>7} utilisateurs : boucle {r['per_user_loop_s'] * 1000:.1f} ms, "
+              f"vectorisé {r['vectorized_score_s'] * 1000:.1f} ms (x{r['speedup_scoring']:.1f}), "
+              f"construction du frame {r['frame_build_s'] * 1000:.1f} ms, "
+              f"bout en bout x{r['speedup_end_to_end']:.2f}, écarts {r['mismatches']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "cohort_risk", "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
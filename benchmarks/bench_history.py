@@ -0,0 +1,87 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import REPO_ROOT, write_results
+
+sys.path.insert(0, REPO_ROOT)
+
+from core.history import FEEDBACK_SCHEMA, History, json_default, last_datetime
+
+# Mémoire par événement de feedback_history : liste de dicts chargée depuis le JSON
+# contre History en colonnes (objectif : au moins 5 fois moins), et coût de la lecture
+# de la dernière date (fromisoformat contre datetime_at).
+
+
+def make_events(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    start = datetime.datetime.now() - datetime.timedelta(days=365)
+    return [{
+        "timestamp": (start + datetime.timedelta(seconds=i * 60, microseconds=rng.randrange(10 ** 6))).isoformat(),
+        "voice_id": rng.choice("ABCDE"),
+        "feedback": rng.choice(["positif", "confus", "négatif", "clair"]),
+        "emotion": rng.choice(["joyeux", "triste", "neutre", "stressé"]),
+        "speech_speed_sample": rng.choice([None, rng.uniform(110, 190)]),
+    } for i in range(n)]
+
+
+def traced_size(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def bench(n_events: int) -> dict:
+    raw = json.dumps(make_events(n_events))
+    as_list, list_bytes = traced_size(lambda: json.loads(raw))
+    # La liste décodée sert d'entrée : seul le résultat (les colonnes) est mesuré.
+    history, history_bytes = traced_size(lambda: History(FEEDBACK_SCHEMA, as_list))
+    assert json.dumps(history, default=json_default) == raw
+
+    repeat = 10000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        datetime.datetime.fromisoformat(history[-1]["timestamp"])
+    parse_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        last_datetime(history)
+    columnar_s = time.perf_counter() - start
+    return {
+        "events": n_events,
+        "list_bytes_per_event": list_bytes / n_events,
+        "history_bytes_per_event": history_bytes / n_events,
+        "memory_ratio": list_bytes / history_bytes,
+        "last_date_entry_us": parse_s / repeat * 1e6,
+        "last_date_columnar_us": columnar_s / repeat * 1e6,
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    results = [bench(n) for n in args.events]
+    for r in results:
+        print(f"{r['events']:>7} événements : liste {r['list_bytes_per_event']:.0f} o/év., colonnes "
+              f"{r['history_bytes_per_event']:.0f} o/év. (x{r['memory_ratio']:.1f}) ; dernière date "
+              f"{r['last_date_entry_us']:.2f} µs -> {r['last_date_columnar_us']:.2f} µs")
+    write_results(args.output, "history", results)
+    return 0 if all(r["memory_ratio"] >= 5 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,123 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import make_sentence, make_word, measure, prepare_environment, write_results
+
+# Micro-benchmarks des fonctions chaudes, en fonction de la longueur de l'historique
+# et du nombre d'utilisateurs : record_interaction, analyze_dropout_risk,
+# analyze_text_context, save_memory et les journaux en ajout seul.
+# Exécuté dans un répertoire temporaire, avec le moteur de stockage choisi (--storage).
+
+
+def seed_profile(learner, user_id: str, history: int, rng: random.Random):
+    from core import profile_stats
+    profile = learner.create_or_load_user_profile(user_id)
+    now = datetime.datetime.now()
+    profile["feedback_history"] = [{
+        "timestamp": (now - datetime.timedelta(minutes=history - i)).isoformat(),
+        "voice_id": rng.choice("ABCDE"),
+        "feedback": rng.choice(["positif", "confus", "négatif"]),
+        "emotion": rng.choice(["joyeux", "triste", "neutre"]),
+        "speech_speed_sample": rng.uniform(120, 180),
+    } for i in range(history)]
+    profile["comprehension_scores"] = [{"timestamp": now.isoformat(), "score": rng.random()} for _ in range(history // 4)]
+    profile["stats"] = profile_stats.compute_stats(profile)
+    learner._users_data.save(user_id, profile)
+    return profile
+
+
+def bench_history(history: int, repeat: int, rng: random.Random) -> dict:
+    from core.enhanced_tryangel import EnhancedTryAngel
+    from core.insf_local_learner import INSFLocalLearner
+    from core.memory_log import get_memory_store
+
+    learner = INSFLocalLearner()
+    user_id = f"hist_{history}"
+    seed_profile(learner, user_id, history, rng)
+    store = get_memory_store()
+    if history:
+        store.append_many(user_id, [{"timestamp": datetime.datetime.now().isoformat(),
+                                     "message": make_sentence(rng), "response": make_sentence(rng)}
+                                    for _ in range(history)])
+    journal = learner._get_journal(user_id, "emotion_log")
+    for _ in range(history):
+        journal.append({"timestamp": datetime.datetime.now().isoformat(), "emotion": "neutre"})
+    assistant = EnhancedTryAngel(user_id)
+
+    return {
+        "history": history,
+        "record_interaction": measure(lambda: learner.record_interaction(user_id, "A", "positif", "joyeux", 150.0), repeat),
+        "analyze_dropout_risk": measure(lambda: learner.analyze_dropout_risk(user_id), repeat),
+        "save_memory": measure(lambda: assistant.save_memory(make_sentence(rng), make_sentence(rng)), repeat),
+        "memory_log_append": measure(lambda: store.append(user_id, {"message": "m", "response": "r"}), repeat),
+        "emotion_log_append": measure(lambda: learner.update_emotion_timeline(user_id, "neutre"), repeat),
+        "detect_emotion_trend": measure(lambda: learner.detect_emotion_trend(user_id), repeat),
+    }
+
+
+def bench_users(n_users: int, repeat: int, rng: random.Random) -> dict:
+    from core.insf_local_learner import INSFLocalLearner
+
+    learner = INSFLocalLearner()
+    users = [f"users_{n_users}_{i}" for i in range(n_users)]
+    for user_id in users:
+        seed_profile(learner, user_id, 20, rng)
+    cycle = iter(range(10 ** 9))
+    return {
+        "users": n_users,
+        "record_interaction": measure(
+            lambda: learner.record_interaction(users[next(cycle) % n_users], "A", "positif", "joyeux", 150.0), repeat),
+        "analyze_dropout_risk": measure(lambda: learner.analyze_dropout_risk(users[next(cycle) % n_users]), repeat),
+    }
+
+
+def bench_text_context(n_keywords: int, repeat: int, rng: random.Random) -> dict:
+    from core.insf_local_learner import INSFLocalLearner
+
+    learner = INSFLocalLearner()
+    per_category = 20
+    knowledge = {f"cat_{i}": [make_word(rng) for _ in range(per_category)] for i in range(max(1, n_keywords // per_category))}
+    messages = [make_sentence(rng, 30) for _ in range(100)]
+    cycle = iter(range(10 ** 9))
+    return {
+        "keywords": n_keywords,
+        "analyze_text_context": measure(lambda: learner.analyze_text_context(messages[next(cycle) % 100], knowledge), repeat),
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks des fonctions chaudes de TryAngel.")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 1000, 10000])
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--keywords", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--workdir", default=None, help="répertoire de travail (temporaire par défaut)")
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = prepare_environment(args.storage, args.workdir)
+    rng = random.Random(7)
+
+    results = {
+        "history": [bench_history(h, args.repeat, rng) for h in args.history],
+        "users": [bench_users(u, args.repeat, rng) for u in args.users],
+        "text_context": [bench_text_context(k, args.repeat, rng) for k in args.keywords],
+    }
+    for group, rows in results.items():
+        for row in rows:
+            size_key = next(iter(row))
+            timings = ", ".join(f"{name} p50 {m['p50_us']:.0f} µs / p99 {m['p99_us']:.0f} µs"
+                                for name, m in row.items() if isinstance(m, dict))
+            print(f"{group} {size_key}={row[size_key]} : {timings}")
+    write_results(output, "hot_paths", results, storage=args.storage, repeat=args.repeat, workdir=workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
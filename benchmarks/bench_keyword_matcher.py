@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.keyword_matcher import KeywordMatcher
+
+# Micro-benchmark : boucle `kw.lower() in texte` (ancienne analyze_text_context)
+# contre un passage unique de l'automate, pour des bases de taille croissante.
+
+SYLLABLES = ["sé", "cu", "ri", "té", "mo", "de", "pa", "sse", "dos", "sier", "mé", "di", "cal", "ban", "que", "ciel", "vi", "rus"]
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def substring_loop(text: str, knowledge: dict) -> dict:
+    context = {}
+    user_text = text.lower()
+    for category, keywords in knowledge.items():
+        found = [kw for kw in keywords if kw.lower() in user_text]
+        if found:
+            context[category] = found
+    return context
+
+
+def bench(n_categories: int, per_category: int, n_messages: int = 500, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    knowledge = {f"cat_{i}": [make_word(rng) for _ in range(per_category)] for i in range(n_categories)}
+    messages = [" ".join(make_word(rng) for _ in range(rng.randint(10, 40))) for _ in range(n_messages)]
+
+    start = time.perf_counter()
+    matcher = KeywordMatcher(knowledge)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [substring_loop(m, knowledge) for m in messages]
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [matcher.match(m) for m in messages]
+    matcher_s = time.perf_counter() - start
+
+    assert expected == actual
+    return {
+        "keywords": n_categories * per_category,
+        "messages": n_messages,
+        "build_ms": build_s * 1000,
+        "loop_us_per_message": loop_s / n_messages * 1e6,
+        "matcher_us_per_message": matcher_s / n_messages * 1e6,
+        "speedup": loop_s / matcher_s,
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    results = [bench(c, k) for c, k in [(10, 10), (20, 50), (50, 100), (100, 200)]]
+    for r in results:
+        print(f"{r['keywords']:>6} mots-clés : boucle {r['loop_us_per_message']:.0f} µs, "
+              f"automate {r['matcher_us_per_message']:.0f} µs (x{r['speedup']:.1f}), construction {r['build_ms']:.1f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "keyword_matcher", "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
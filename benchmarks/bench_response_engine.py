@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.response_engine import TfidfIndex
+
+# Latence de recherche de l'index TF-IDF de generate_response sur un corpus synthétique
+# (100 000 entrées par défaut), et coût d'un ajout incrémental (un échange après save_memory).
+# Objectifs : p50 < 10 ms et p99 < 50 ms par requête à 100 000 entrées.
+
+SYLLABLES = ["sé", "cu", "ri", "té", "mo", "de", "pa", "sse", "dos", "sier", "mé", "di", "cal", "ban", "que", "ciel", "vi", "rus"]
+TARGET_P50_MS = 10.0
+TARGET_P99_MS = 50.0
+
+
+def make_vocabulary(rng: random.Random, size: int) -> list:
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def make_text(rng: random.Random, vocabulary: list) -> str:
+    # Distribution de Zipf : quelques mots très fréquents, une longue traîne de mots rares.
+    ranks = np.minimum(np.random.default_rng(rng.randrange(2 ** 32)).zipf(1.2, rng.randint(5, 25)), len(vocabulary))
+    return " ".join(vocabulary[r - 1] for r in ranks)
+
+
+def percentile(samples: list, q: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def bench(corpus_size: int, n_queries: int = 1000, n_appends: int = 1000, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, 20000)
+    corpus = [make_text(rng, vocabulary) for _ in range(corpus_size)]
+    queries = [make_text(rng, vocabulary) for _ in range(n_queries)]
+
+    index = TfidfIndex()
+    start = time.perf_counter()
+    index.add(corpus)
+    build_s = time.perf_counter() - start
+
+    search = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=3)
+        search.append(time.perf_counter() - start)
+
+    appends, mixed = [], []
+    for i in range(n_appends):
+        start = time.perf_counter()
+        index.add([queries[i % n_queries]])
+        appends.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.search(queries[(i * 7) % n_queries], k=3)
+        mixed.append(time.perf_counter() - start)
+
+    return {
+        "corpus": corpus_size,
+        "build_s": build_s,
+        "search_p50_ms": percentile(search, 50),
+        "search_p99_ms": percentile(search, 99),
+        "append_p50_ms": percentile(appends, 50),
+        "append_p99_ms": percentile(appends, 99),
+        "search_after_append_p50_ms": percentile(mixed, 50),
+        "search_after_append_p99_ms": percentile(mixed, 99),
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000", help="tailles de corpus, séparées par des virgules")
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    results = [bench(int(size)) for size in args.sizes.split(",")]
+    for r in results:
+        print(f"{r['corpus']:>7} entrées : construction {r['build_s']:.1f} s, recherche p50 {r['search_p50_ms']:.2f} ms "
+              f"p99 {r['search_p99_ms']:.2f} ms, ajout p50 {r['append_p50_ms']:.2f} ms p99 {r['append_p99_ms']:.2f} ms, "
+              f"recherche après ajout p50 {r['search_after_append_p50_ms']:.2f} ms p99 {r['search_after_append_p99_ms']:.2f} ms")
+    largest = results[-1]
+    met = largest["search_after_append_p50_ms"] <= TARGET_P50_MS and largest["search_after_append_p99_ms"] <= TARGET_P99_MS
+    print(f"Objectifs p50 < {TARGET_P50_MS:.0f} ms / p99 < {TARGET_P99_MS:.0f} ms : {'atteints' if met else 'non atteints'}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "response_engine", "targets_met": met, "results": results}, f, indent=2)
+    return 0 if met else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,86 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import measure, prepare_environment, write_results
+
+# Temps de chargement d'un profil (lecture du stockage + conversion en colonnes) selon la
+# longueur de feedback_history, avant et après une passe d'archivage (core.retention) :
+# après la passe, le coût ne dépend plus que de la fenêtre chaude.
+
+
+def seed(learner, user_id: str, events: int, rng: random.Random):
+    from core import profile_stats
+    profile = learner.create_or_load_user_profile(user_id)
+    now = datetime.datetime.now()
+    step = datetime.timedelta(days=730) / max(events, 1)
+    profile["feedback_history"] = [{
+        "timestamp": (now - step * (events - i)).isoformat(),
+        "voice_id": rng.choice("ABCDE"),
+        "feedback": rng.choice(["positif", "confus", "négatif"]),
+        "emotion": rng.choice(["joyeux", "triste", "neutre"]),
+        "speech_speed_sample": rng.uniform(120, 180),
+    } for i in range(events)]
+    profile["stats"] = profile_stats.compute_stats(profile)
+    learner._users_data.save(user_id, profile)
+
+
+def load_once(store, user_id: str):
+    with store._lock:
+        store._cache.pop(user_id, None)
+    store.storage.forget_profile(user_id)
+    store.get(user_id)
+
+
+def bench(events: int, repeat: int, rng: random.Random) -> dict:
+    from core.insf_local_learner import INSFLocalLearner
+    from core.retention import get_retention_compactor
+
+    learner = INSFLocalLearner()
+    store = learner._users_data
+    user_id = f"retention_{events}"
+    seed(learner, user_id, events, rng)
+    before = measure(load_once, repeat, store, user_id)
+    start = time.perf_counter()
+    archived = get_retention_compactor().run_pass([user_id])
+    compaction_s = time.perf_counter() - start
+    after = measure(load_once, repeat, store, user_id)
+    return {
+        "events": events,
+        "inline_after": len(store.get(user_id)["feedback_history"]),
+        "archived": archived,
+        "compaction_s": compaction_s,
+        "load_before": before,
+        "load_after": after,
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Chargement d'un profil avant et après archivage.")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workdir", default=None, help="répertoire de travail (temporaire par défaut)")
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    os.environ["TRYANGEL_RETENTION_INTERVAL"] = "0"
+    workdir = prepare_environment(args.storage, args.workdir)
+    rng = random.Random(7)
+
+    results = [bench(n, args.repeat, rng) for n in args.events]
+    for r in results:
+        print(f"{r['events']:>6} entrées -> {r['inline_after']} en ligne : chargement p50 "
+              f"{r['load_before']['p50_us'] / 1000:.1f} ms -> {r['load_after']['p50_us'] / 1000:.1f} ms "
+              f"(archivage {r['compaction_s']:.2f} s)")
+    write_results(output, "retention", results, storage=args.storage, repeat=args.repeat, workdir=workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,99 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import make_sentence, prepare_environment, summarize, write_results
+
+# Temps jusqu'au premier octet audio : synthèse de la réponse entière (chemin de /speak)
+# contre synthèse par phrases en parallèle (/speak avec "stream": true), avec le
+# synthétiseur factice dont le délai suit la longueur du texte (--fixed-delay + --char-delay
+# par caractère, pour imiter un service distant). "cold" : phrases jamais synthétisées ;
+# "common" : la moitié des phrases revient d'une réponse à l'autre (cache par phrase).
+
+
+def make_response(rng: random.Random, sentences: int, common: list) -> str:
+    parts = []
+    for i in range(sentences):
+        if common and i % 2 == 0:
+            parts.append(rng.choice(common))
+        else:
+            parts.append(make_sentence(rng, rng.randint(6, 14)).capitalize() + ".")
+    return " ".join(parts)
+
+
+def first_byte_full(cache, text: str, voice: str) -> tuple:
+    start = time.perf_counter()
+    with open(cache.get_or_create(text, "fr", voice), "rb") as f:
+        f.read(64 * 1024)
+        first = time.perf_counter() - start
+        f.read()
+    return first, time.perf_counter() - start
+
+
+def first_byte_stream(streamer, text: str, voice: str) -> tuple:
+    start = time.perf_counter()
+    audio = streamer.audio(text, "fr", voice)
+    next(audio)
+    first = time.perf_counter() - start
+    for _ in audio:
+        pass
+    return first, time.perf_counter() - start
+
+
+def bench(sentences: int, mode: str, repeat: int, rng: random.Random) -> dict:
+    from core.tts_cache import get_tts_cache
+    from core.tts_stream import get_tts_streamer
+
+    cache, streamer = get_tts_cache(), get_tts_streamer()
+    common = [make_sentence(rng, 8).capitalize() + "." for _ in range(5)] if mode == "common" else []
+    seed = rng.random()
+    results = {"sentences": sentences, "mode": mode}
+    # Mêmes textes pour les deux chemins ; une voix distincte par chemin pour ne pas partager le cache.
+    for name, run, target in (("full", first_byte_full, cache), ("stream", first_byte_stream, streamer)):
+        for sentence in common:
+            cache.get_or_create(sentence, "fr", name)
+        texts = random.Random(seed)
+        firsts, totals = [], []
+        for _ in range(repeat):
+            first, total = run(target, make_response(texts, sentences, common), name)
+            firsts.append(first)
+            totals.append(total)
+        results[f"{name}_first_byte"] = summarize(firsts)
+        results[f"{name}_total"] = summarize(totals)
+    results["first_byte_speedup"] = results["full_first_byte"]["p50_us"] / results["stream_first_byte"]["p50_us"]
+    return results
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Premier octet audio : synthèse entière contre synthèse par phrases.")
+    parser.add_argument("--sentences", type=int, nargs="+", default=[1, 3, 6])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--fixed-delay", type=float, default=0.05, help="secondes par synthèse")
+    parser.add_argument("--char-delay", type=float, default=0.002, help="secondes par caractère")
+    parser.add_argument("--workdir", default=None, help="répertoire de travail (temporaire par défaut)")
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    os.environ["TRYANGEL_TTS_ENGINE"] = "stub"
+    os.environ["TRYANGEL_STUB_TTS_DELAY"] = str(args.fixed_delay)
+    os.environ["TRYANGEL_STUB_TTS_CHAR_DELAY"] = str(args.char_delay)
+    workdir = prepare_environment("json", args.workdir)
+    rng = random.Random(7)
+
+    results = [bench(n, mode, args.repeat, rng) for mode in ("cold", "common") for n in args.sentences]
+    for r in results:
+        print(f"{r['mode']:>6}, {r['sentences']} phrase(s) : premier octet p50 "
+              f"{r['full_first_byte']['p50_us'] / 1000:.0f} ms -> {r['stream_first_byte']['p50_us'] / 1000:.0f} ms "
+              f"(x{r['first_byte_speedup']:.1f}), total {r['full_total']['p50_us'] / 1000:.0f} ms -> "
+              f"{r['stream_total']['p50_us'] / 1000:.0f} ms")
+    write_results(output, "tts_stream", results, fixed_delay=args.fixed_delay, char_delay=args.char_delay,
+                  workdir=workdir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,87 @@
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Outils partagés par les benchmarks : répertoire de travail isolé, mesures par
+# percentiles et fichiers de résultats JSON comparables d'une exécution à l'autre.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYLLABLES = ["sé", "cu", "ri", "té", "mo", "de", "pa", "sse", "dos", "sier", "mé", "di", "cal", "ban", "que", "ciel", "vi", "rus"]
+
+
+def prepare_environment(storage: str = "json", workdir: str = None) -> str:
+    # À appeler avant tout import de core.* : les modules lisent l'environnement au chargement
+    # et écrivent profils, journaux et voix dans le répertoire courant.
+    os.environ.setdefault("TRYANGEL_TTS_ENGINE", "stub")
+    os.environ["TRYANGEL_STORAGE"] = storage
+    workdir = workdir or tempfile.mkdtemp(prefix="tryangel-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    return workdir
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def make_sentence(rng: random.Random, words: int = None) -> str:
+    return " ".join(make_word(rng) for _ in range(words or rng.randint(5, 20)))
+
+
+def summarize(samples: list) -> dict:
+    # Durées en secondes -> statistiques en microsecondes.
+    ordered = sorted(samples)
+    n = len(ordered)
+
+    def pick(q):
+        return ordered[min(n - 1, int(q * n))] * 1e6
+
+    return {
+        "n": n,
+        "mean_us": sum(ordered) / n * 1e6,
+        "p50_us": pick(0.50),
+        "p95_us": pick(0.95),
+        "p99_us": pick(0.99),
+        "max_us": ordered[-1] * 1e6,
+    }
+
+
+def measure(function, repeat: int, *args) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def run_metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path: str, benchmark: str, results, **extra):
+    if not path:
+        return
+    payload = {"benchmark": benchmark, "metadata": run_metadata(), "results": results}
+    payload.update(extra)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
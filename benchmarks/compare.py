@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+
+# Compare deux fichiers de résultats (run_all.py ou un benchmark seul) et signale les
+# régressions au-delà du seuil. Durées (*_us, *_ms, *_s) : plus bas est meilleur ;
+# débits et gains (rps, speedup*) : plus haut est meilleur. Les autres nombres (et les
+# maxima, trop bruités) sont ignorés.
+
+LOWER_IS_BETTER = ("_us", "_ms", "_s")
+HIGHER_IS_BETTER = ("rps", "speedup")
+IGNORED = ("elapsed_s", "duration_s", "metadata", "max_us")
+
+
+def flatten(node, prefix: str = "") -> dict:
+    values = {}
+    if isinstance(node, dict):
+        # Les listes de paliers sont repérées par leur première clé (history=1000, users=100, ...).
+        for key, value in node.items():
+            if key in IGNORED:
+                continue
+            values.update(flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(node, list):
+        for i, item in enumerate(node):
+            label = str(i)
+            if isinstance(item, dict) and item:
+                first_key = next(iter(item))
+                if isinstance(item[first_key], (int, float, str)):
+                    label = f"{first_key}={item[first_key]}"
+            values.update(flatten(item, f"{prefix}[{label}]"))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        values[prefix] = float(node)
+    return values
+
+
+def direction(path: str) -> int:
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.startswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(base: dict, new: dict, threshold: float) -> tuple:
+    base_values, new_values = flatten(base), flatten(new)
+    regressions, improvements = [], []
+    for path in sorted(set(base_values) & set(new_values)):
+        sign = direction(path)
+        old, cur = base_values[path], new_values[path]
+        if not sign or old == 0:
+            continue
+        change = (cur - old) / abs(old)
+        if sign * change < -threshold:
+            regressions.append((path, old, cur, change))
+        elif sign * change > threshold:
+            improvements.append((path, old, cur, change))
+    return regressions, improvements
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Compare deux fichiers de résultats de benchmarks.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="écart relatif toléré (0.10 = 10 %%)")
+    args = parser.parse_args(argv)
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    regressions, improvements = compare(base, new, args.threshold)
+    for title, rows in (("Régressions", regressions), ("Améliorations", improvements)):
+        print(f"{title} ({len(rows)}) :")
+        for path, old, cur, change in rows:
+            print(f"  {path}: {old:.4g} -> {cur:.4g} ({change:+.1%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
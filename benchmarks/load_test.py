@@ -0,0 +1,139 @@
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import make_sentence, prepare_environment, summarize, write_results
+
+# Générateur de charge local : l'application Flask tourne dans ce processus sur un vrai
+# serveur HTTP (werkzeug, un thread par requête) avec le synthétiseur factice, et
+# --clients threads enchaînent des requêtes pendant --duration secondes.
+# Mélange par défaut : 70 % /speak, 20 % /memory?limit=20, 10 % /memory/search.
+
+MIX = [("speak", 0.7), ("memory_page", 0.2), ("memory_search", 0.1)]
+
+
+def start_server():
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def pick_endpoint(rng: random.Random) -> str:
+    roll = rng.random()
+    for name, share in MIX:
+        if roll < share:
+            return name
+        roll -= share
+    return MIX[-1][0]
+
+
+def client_loop(port: int, n_users: int, deadline: float, seed: int, samples: dict, errors: dict, lock: threading.Lock):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    local = {name: [] for name, _ in MIX}
+    local_errors = {name: 0 for name, _ in MIX}
+    while time.monotonic() < deadline:
+        user_id = f"load_{rng.randrange(n_users)}"
+        endpoint = pick_endpoint(rng)
+        if endpoint == "speak":
+            body = json.dumps({"user_id": user_id, "message": make_sentence(rng, rng.randint(3, 12))})
+            request = ("POST", "/speak", body, {"Content-Type": "application/json"})
+        elif endpoint == "memory_page":
+            request = ("GET", f"/memory?user_id={user_id}&limit=20", None, {})
+        else:
+            request = ("GET", f"/memory/search?user_id={user_id}&q={quote(make_sentence(rng, 1))}&limit=10", None, {})
+        start = time.perf_counter()
+        try:
+            conn.request(*request)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except Exception:
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        elapsed = time.perf_counter() - start
+        if ok:
+            local[endpoint].append(elapsed)
+        else:
+            local_errors[endpoint] += 1
+    conn.close()
+    with lock:
+        for name in local:
+            samples[name].extend(local[name])
+            errors[name] += local_errors[name]
+
+
+def run(clients: int, n_users: int, duration: float, seed: int = 7) -> dict:
+    server = start_server()
+    port = server.server_port
+    samples = {name: [] for name, _ in MIX}
+    errors = {name: 0 for name, _ in MIX}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    # Les journaux de l'application (un print par voix générée) sont écartés pendant la mesure.
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client_loop, args=(port, n_users, deadline, seed + i, samples, errors, lock))
+                   for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    server.shutdown()
+    endpoints = {name: dict(summarize(values), errors=errors[name], rps=len(values) / elapsed)
+                 for name, values in samples.items() if values}
+    total = sum(len(values) for values in samples.values())
+    return {
+        "clients": clients,
+        "users": n_users,
+        "duration_s": elapsed,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "rps": total / elapsed,
+        "endpoints": endpoints,
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge local de l'API TryAngel (synthèse factice).")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0, help="durée de chaque palier, en secondes")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--workdir", default=None, help="répertoire de travail (temporaire par défaut)")
+    parser.add_argument("--output", default=None, help="fichier JSON de résultats")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = prepare_environment(args.storage, args.workdir)
+
+    results = [run(clients, args.users, args.duration) for clients in args.clients]
+    for r in results:
+        detail = ", ".join(f"{name} p50 {m['p50_us'] / 1000:.1f} ms / p99 {m['p99_us'] / 1000:.1f} ms"
+                           for name, m in r["endpoints"].items())
+        print(f"{r['clients']:>3} clients : {r['rps']:.0f} req/s, {r['errors']} erreurs ; {detail}")
+    write_results(output, "load_test", results, storage=args.storage, users=args.users, workdir=workdir)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import run_metadata
+
+# Lance toute la suite, chaque benchmark dans son propre processus (les modules core
+# lisent l'environnement à l'import), et rassemble les résultats dans un seul fichier
+# JSON à comparer avec compare.py.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SUITES = {
+    "quick": [
+        ("hot_paths", "bench_hot_paths.py", ["--history", "0", "1000", "--users", "10", "100", "--keywords", "100", "1000", "--repeat", "100"]),
+        ("keyword_matcher", "bench_keyword_matcher.py", []),
+        ("cohort_risk", "bench_cohort_risk.py", ["--users", "10000"]),
+        ("history", "bench_history.py", ["--events", "10000"]),
+        ("tts_stream", "bench_tts_stream.py", ["--sentences", "1", "6", "--repeat", "5"]),
+        ("retention", "bench_retention.py", ["--events", "1000", "10000", "--repeat", "5"]),
+        ("response_engine", "bench_response_engine.py", ["--sizes", "1000,10000"]),
+        ("load_test", "load_test.py", ["--clients", "1", "4", "--duration", "3"]),
+    ],
+    "full": [
+        ("hot_paths", "bench_hot_paths.py", []),
+        ("hot_paths_sqlite", "bench_hot_paths.py", ["--storage", "sqlite"]),
+        ("keyword_matcher", "bench_keyword_matcher.py", []),
+        ("cohort_risk", "bench_cohort_risk.py", []),
+        ("history", "bench_history.py", []),
+        ("tts_stream", "bench_tts_stream.py", []),
+        ("retention", "bench_retention.py", []),
+        ("retention_sqlite", "bench_retention.py", ["--storage", "sqlite"]),
+        ("response_engine", "bench_response_engine.py", []),
+        ("load_test", "load_test.py", []),
+        ("load_test_sqlite", "load_test.py", ["--storage", "sqlite"]),
+    ],
+}
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Suite de benchmarks TryAngel.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--only", nargs="+", default=None, help="noms des benchmarks à lancer")
+    parser.add_argument("--results-dir", default=os.path.join(HERE, "results"))
+    parser.add_argument("--output", default=None, help="fichier JSON combiné (par défaut results/<date>.json)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    combined = {"benchmark": "suite", "suite": args.suite, "metadata": run_metadata(), "benchmarks": {}}
+    failures = []
+    for name, script, extra in SUITES[args.suite]:
+        if args.only and name not in args.only:
+            continue
+        output = os.path.join(args.results_dir, f"{stamp}-{name}.json")
+        print(f"=== {name}")
+        start = time.perf_counter()
+        code = subprocess.call([sys.executable, os.path.join(HERE, script), *extra, "--output", output])
+        elapsed = time.perf_counter() - start
+        if code != 0 or not os.path.exists(output):
+            failures.append(name)
+            combined["benchmarks"][name] = {"exit_code": code, "elapsed_s": elapsed}
+            continue
+        with open(output, encoding="utf-8") as f:
+            combined["benchmarks"][name] = dict(json.load(f), exit_code=code, elapsed_s=elapsed)
+        os.remove(output)
+
+    path = args.output or os.path.join(args.results_dir, f"{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(combined, f, indent=2, ensure_ascii=False)
+    print(f"Résultats : {path}")
+    if failures:
+        print(f"Échecs : {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,221 @@
+import gzip
+import json
+import os
+import threading
+
+from core.metrics import count_bytes
+
+# Archives froides des historiques : un segment gzip (JSONL) par utilisateur, historique
+# et mois, plus un résumé par mois calculé à l'archivage (nombre d'entrées, première et
+# dernière date, comptes par valeur des champs catégoriels, somme/min/max des champs numériques).
+#   - FileArchive : archives/<user_id>/<nom>/<AAAA-MM>.jsonl.gz et summary.json (JSONStorage) ;
+#   - SQLiteArchive : table archives de la base SQLite (SQLiteStorage).
+# L'archivage précède la suppression dans l'historique chaud : un arrêt entre les deux peut
+# archiver un lot deux fois, jamais en perdre.
+
+# nom -> (champ horodaté, champs catégoriels, champs numériques)
+ARCHIVED_FIELDS = {
+    "feedback_history": ("timestamp", ("voice_id", "feedback", "emotion"), ("speech_speed_sample",)),
+    "comprehension_scores": ("timestamp", (), ("score",)),
+    "emotion_log": ("timestamp", ("emotion",), ()),
+    "memories_log": ("date", ("type",), ()),
+    "voice_trace": ("timestamp", ("emotion", "voice_id", "result"), ()),
+}
+
+
+def _time_key(value) -> str:
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def empty_rollup() -> dict:
+    return {"count": 0, "first": None, "last": None, "counts": {}, "numeric": {}}
+
+
+def update_rollup(rollup: dict, name: str, entry: dict):
+    time_field, categorical, numeric = ARCHIVED_FIELDS[name]
+    key = str(entry.get(time_field, ""))
+    rollup["count"] += 1
+    if rollup["first"] is None or key < rollup["first"]:
+        rollup["first"] = key
+    if rollup["last"] is None or key > rollup["last"]:
+        rollup["last"] = key
+    for field in categorical:
+        value = entry.get(field)
+        if isinstance(value, str):
+            tally = rollup["counts"].setdefault(field, {})
+            tally[value] = tally.get(value, 0) + 1
+    for field in numeric:
+        value = entry.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            agg = rollup["numeric"].get(field)
+            if agg is None:
+                rollup["numeric"][field] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                agg["count"] += 1
+                agg["sum"] += value
+                agg["min"] = min(agg["min"], value)
+                agg["max"] = max(agg["max"], value)
+
+
+def group_by_month(name: str, entries: list) -> dict:
+    # {"AAAA-MM": [entrées]}, dans l'ordre d'arrivée.
+    time_field = ARCHIVED_FIELDS[name][0]
+    months = {}
+    for entry in entries:
+        months.setdefault(str(entry.get(time_field, ""))[:7], []).append(entry)
+    return months
+
+
+def _encode_lines(entries: list) -> bytes:
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+
+
+def _decode_lines(data: bytes) -> list:
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+def _months_in_range(months, since: str, until: str) -> list:
+    return [m for m in sorted(months)
+            if (since is None or m >= since[:7]) and (until is None or m <= until[:7])]
+
+
+def _filter_range(name: str, entries: list, since: str, until: str) -> list:
+    time_field = ARCHIVED_FIELDS[name][0]
+    return [e for e in entries
+            if (since is None or str(e.get(time_field, "")) >= since)
+            and (until is None or str(e.get(time_field, "")) < until)]
+
+
+class FileArchive:
+    _ARCHIVE_DIR = "archives"
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or self._ARCHIVE_DIR
+        self._lock = threading.Lock()
+
+    def _dir(self, user_id: str, name: str) -> str:
+        return os.path.join(self.base_dir, user_id, name)
+
+    def _segment_path(self, user_id: str, name: str, month: str) -> str:
+        return os.path.join(self._dir(user_id, name), f"{month}.jsonl.gz")
+
+    def summary(self, user_id: str, name: str) -> dict:
+        try:
+            with open(os.path.join(self._dir(user_id, name), "summary.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_summary(self, user_id: str, name: str, summary: dict):
+        path = os.path.join(self._dir(user_id, name), "summary.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def append(self, user_id: str, name: str, entries: list) -> int:
+        # Chaque lot s'ajoute au segment du mois comme un nouveau membre gzip (un fichier
+        # gzip peut en contenir plusieurs à la suite) ; le résumé est réécrit ensuite.
+        with self._lock:
+            summary = self.summary(user_id, name)
+            months = group_by_month(name, entries)
+            if not months:
+                return 0
+            os.makedirs(self._dir(user_id, name), exist_ok=True)
+            for month, batch in months.items():
+                data = gzip.compress(_encode_lines(batch))
+                with open(self._segment_path(user_id, name, month), "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                count_bytes("archive", len(data))
+                rollup = summary.setdefault(month, empty_rollup())
+                for entry in batch:
+                    update_rollup(rollup, name, entry)
+            self._write_summary(user_id, name, summary)
+            return sum(len(batch) for batch in months.values())
+
+    def read_segment(self, user_id: str, name: str, month: str) -> bytes:
+        # Lignes JSONL du segment d'un mois, décompressées (tous les membres gzip).
+        try:
+            with gzip.open(self._segment_path(user_id, name, month), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    def user_ids(self) -> list:
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(d for d in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, d)))
+
+    def read(self, user_id: str, name: str, since=None, until=None) -> list:
+        since, until = _time_key(since), _time_key(until)
+        entries = []
+        for month in _months_in_range(self.summary(user_id, name), since, until):
+            try:
+                with gzip.open(self._segment_path(user_id, name, month), "rb") as f:
+                    entries.extend(_decode_lines(f.read()))
+            except FileNotFoundError:
+                continue
+        return _filter_range(name, entries, since, until)
+
+
+class SQLiteArchive:
+    # Un segment par ligne (user_id, nom, mois) : le lot archivé est fusionné au segment
+    # existant, recompressé et écrit dans la même transaction que le résumé.
+    def __init__(self, storage):
+        self.storage = storage
+        storage.transaction([(
+            "CREATE TABLE IF NOT EXISTS archives (user_id TEXT NOT NULL, name TEXT NOT NULL, month TEXT NOT NULL, "
+            "entries INTEGER NOT NULL, data BLOB NOT NULL, summary TEXT NOT NULL, PRIMARY KEY (user_id, name, month))",
+            (), False,
+        )])
+
+    def summary(self, user_id: str, name: str) -> dict:
+        rows = self.storage.query("SELECT month, summary FROM archives WHERE user_id = ? AND name = ? ORDER BY month",
+                                  (user_id, name))
+        return {month: json.loads(summary) for month, summary in rows}
+
+    def append(self, user_id: str, name: str, entries: list) -> int:
+        storage = self.storage
+        with storage._lock:
+            summary = self.summary(user_id, name)
+            months = group_by_month(name, entries)
+            operations = []
+            for month, batch in months.items():
+                rows = storage.query("SELECT data FROM archives WHERE user_id = ? AND name = ? AND month = ?",
+                                     (user_id, name, month))
+                existing = _decode_lines(gzip.decompress(rows[0][0])) if rows else []
+                rollup = summary.get(month) or empty_rollup()
+                for entry in batch:
+                    update_rollup(rollup, name, entry)
+                data = gzip.compress(_encode_lines(existing + batch))
+                count_bytes("archive", len(data))
+                operations.append((
+                    "INSERT INTO archives (user_id, name, month, entries, data, summary) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(user_id, name, month) DO UPDATE SET entries = excluded.entries, "
+                    "data = excluded.data, summary = excluded.summary",
+                    (user_id, name, month, rollup["count"], data, json.dumps(rollup, ensure_ascii=False)),
+                    False,
+                ))
+            if operations:
+                storage.transaction(operations)
+            return sum(len(batch) for batch in months.values())
+
+    def read(self, user_id: str, name: str, since=None, until=None) -> list:
+        since, until = _time_key(since), _time_key(until)
+        sql, params = "SELECT data FROM archives WHERE user_id = ? AND name = ?", [user_id, name]
+        if since is not None:
+            sql += " AND month >= ?"
+            params.append(since[:7])
+        if until is not None:
+            sql += " AND month <= ?"
+            params.append(until[:7])
+        entries = []
+        for (data,) in self.storage.query(sql + " ORDER BY month", tuple(params)):
+            entries.extend(_decode_lines(gzip.decompress(data)))
+        return _filter_range(name, entries, since, until)
@@ -0,0 +1,139 @@
+import argparse
+import datetime
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from core import profile_stats
+from core.insf_local_learner import INSFLocalLearner
+from core.profile_store import ProfileStore, get_profile_store
+
+# Score de risque d'abandon pour toute la cohorte : mêmes règles que
+# INSFLocalLearner.compute_dropout_risk, appliquées colonne par colonne.
+# Les termes sont ajoutés dans le même ordre que la version par utilisateur,
+# ce qui donne des flottants identiques bit à bit.
+
+
+_FRAME_COLUMNS = ["prev_risk", "trust_score", "feedback_total", "feedback_negative",
+                  "comprehension_sum", "comprehension_count"]
+
+
+def load_frame(profiles: dict) -> pd.DataFrame:
+    # Un seul tuple par profil, converti d'un bloc en matrice float64 : pas de liste par
+    # colonne ni d'inférence de type par pandas. Les entiers (≤ 2**53) restent exacts.
+    rows, last_timestamps = [], []
+    for profile in profiles.values():
+        stats = profile.get("stats") or profile_stats.compute_stats(profile)
+        history = profile["feedback_history"]
+        rows.append((profile.get("dropout_risk_score", 0.1), profile["trust_score"],
+                     stats["feedback_total"], stats["feedback_negative"],
+                     stats["comprehension_sum"], stats["comprehension_count"]))
+        last_timestamps.append(history[-1]["timestamp"] if history else None)
+    values = np.array(rows, dtype="float64").reshape(len(rows), len(_FRAME_COLUMNS))
+    frame = pd.DataFrame(values, index=pd.Index(list(profiles), name="user_id"), columns=_FRAME_COLUMNS, copy=False)
+    frame["last_timestamp"] = pd.to_datetime(pd.Series(last_timestamps, index=frame.index, dtype=object),
+                                             format="ISO8601")
+    return frame
+
+
+def score_frame(frame: pd.DataFrame, now: datetime.datetime) -> np.ndarray:
+    trust = frame["trust_score"].to_numpy()
+    total = frame["feedback_total"].to_numpy()
+    negative = frame["feedback_negative"].to_numpy()
+    comp_sum = frame["comprehension_sum"].to_numpy()
+    comp_count = frame["comprehension_count"].to_numpy()
+
+    risk = frame["prev_risk"].to_numpy(dtype="float64", copy=True)
+    risk += np.where(trust < 30, 0.3, np.where(trust < 50, 0.15, 0.0))
+
+    days = (pd.Timestamp(now) - frame["last_timestamp"]).dt.days
+    has_last = days.notna().to_numpy()
+    days = days.fillna(0).to_numpy(dtype="int64")
+    inactivity = np.where(days > 14, 0.25, np.where(days > 7, 0.1, 0.0))
+    risk += np.where(total < 3, 0.2, np.where(has_last, inactivity, 0.0))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        neg_ratio = np.where(total > 0, negative / np.maximum(total, 1), 0.0)
+        avg_comp = np.where(comp_count > 0, comp_sum / np.maximum(comp_count, 1), 0.0)
+    risk += np.where(total > 0, np.where(neg_ratio > 0.6, 0.3, np.where(neg_ratio > 0.4, 0.15, 0.0)), 0.0)
+    risk += np.where((comp_count > 3) & (avg_comp < 0.4), 0.2, 0.0)
+    return np.clip(risk, 0.0, 1.0)
+
+
+def load_profiles(store: ProfileStore) -> dict:
+    profiles = {}
+    for user_id in store.user_ids():
+        profile = store.get(user_id)
+        if profile is not None:
+            profiles[user_id] = profile
+    return profiles
+
+
+def verify(profiles: dict, scores: pd.Series, now: datetime.datetime) -> list:
+    # Compare au calcul par utilisateur ; retourne les user_id en désaccord.
+    mismatches = []
+    for user_id, profile in profiles.items():
+        stats = profile.get("stats") or profile_stats.compute_stats(profile)
+        if INSFLocalLearner.compute_dropout_risk(profile, stats, now) != scores[user_id]:
+            mismatches.append(user_id)
+    return mismatches
+
+
+def score_profiles(profiles: dict, now: datetime.datetime) -> pd.Series:
+    if not profiles:
+        return pd.Series(dtype="float64")
+    return pd.Series(score_frame(load_frame(profiles), now), index=list(profiles))
+
+
+def write_scores(store: ProfileStore, profiles: dict, scores: pd.Series, now: datetime.datetime):
+    # Une seule passe d'écriture, après le calcul de toute la cohorte.
+    last_update = now.isoformat()
+    for user_id, profile in profiles.items():
+        profile["dropout_risk_score"] = float(scores[user_id])
+        profile["last_update_date"] = last_update
+    store.save_many(list(profiles.items()))
+
+
+def score_cohort(store: ProfileStore = None, now: datetime.datetime = None, write: bool = True) -> pd.Series:
+    store = get_profile_store() if store is None else store
+    now = now or datetime.datetime.now()
+    profiles = load_profiles(store)
+    scores = score_profiles(profiles, now)
+    if write:
+        write_scores(store, profiles, scores, now)
+    return scores
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Score de risque d'abandon pour tous les profils.")
+    parser.add_argument("--dry-run", action="store_true", help="calcule sans réécrire les profils")
+    parser.add_argument("--check", action="store_true", help="compare au calcul utilisateur par utilisateur")
+    args = parser.parse_args(argv)
+
+    store = get_profile_store()
+    now = datetime.datetime.now()
+    start = time.perf_counter()
+    profiles = load_profiles(store)
+    if not profiles:
+        print("Aucun profil trouvé.")
+        return 0
+    scores = score_profiles(profiles, now)
+    elapsed = time.perf_counter() - start
+    print(f"{len(scores)} profils notés en {elapsed:.2f} s ; risque moyen {scores.mean():.3f}, "
+          f"{int((scores > 0.6).sum())} au-dessus de 0.6.")
+    if args.check:
+        mismatches = verify(profiles, scores, now)
+        if mismatches:
+            print(f"{len(mismatches)} écarts avec le calcul par utilisateur : {', '.join(mismatches[:10])}")
+            return 1
+        print("Résultats identiques au calcul par utilisateur.")
+    if not args.dry_run:
+        write_scores(store, profiles, scores, now)
+        print("Profils mis à jour.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
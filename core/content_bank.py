@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+
+class ContentBank:
+    # Banque de contenus {catégorie: [textes]} chargée une seule fois : tous les textes
+    # sont à plat dans une liste, chaque catégorie est une tranche [début, fin).
+    # Une entrée peut être {"text": ..., "weight": ...} pour un tirage pondéré.
+    # Le fichier est rechargé si sa date de modification change (vérifiée au plus
+    # une fois par _RELOAD_CHECK_INTERVAL secondes) ; s'il devient illisible ou mal formé, le contenu
+    # déjà chargé continue de servir.
+    _RELOAD_CHECK_INTERVAL = 1.0
+    _MAX_USER_CURSORS = 10000
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self._mtime = None
+        self._checked = 0.0
+        self._items = []
+        self._cumulative = None
+        self._offsets = {}
+        self._cursors = OrderedDict()
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._reload_if_changed(force=True)
+
+    def _reload_if_changed(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked < self._RELOAD_CHECK_INTERVAL:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                bank = json.load(f)
+        except (OSError, ValueError) as e:
+            # Fichier supprimé ou en cours de réécriture : on garde le contenu déjà chargé.
+            if force:
+                raise
+            print(f"Erreur lors du rechargement de {self.path}: {e}")
+            return
+        try:
+            items, offsets, cumulative = self._parse(bank)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            # Entrée mal formée (dict sans "text", poids non numérique...) : même chose,
+            # et le fichier n'est plus relu tant qu'il n'a pas changé.
+            if force:
+                raise
+            print(f"Erreur lors du rechargement de {self.path}: entrée invalide ({e!r})")
+            self._mtime = mtime
+            return
+        self._items, self._offsets, self._cumulative = items, offsets, cumulative
+        self._cursors.clear()
+        self._mtime = mtime
+        self.version += 1
+
+    @staticmethod
+    def _parse(bank: dict) -> tuple:
+        items, weights, offsets = [], array("d"), {}
+        for category, entries in bank.items():
+            start = len(items)
+            for entry in entries:
+                if isinstance(entry, dict):
+                    items.append(entry["text"])
+                    weights.append(float(entry.get("weight", 1.0)))
+                else:
+                    items.append(entry)
+                    weights.append(1.0)
+            offsets[category.lower()] = (start, len(items))
+        cumulative = None
+        if any(w != 1.0 for w in weights):
+            cumulative = array("d")
+            total = 0.0
+            for w in weights:
+                total += w
+                cumulative.append(total)
+        return items, offsets, cumulative
+
+    def categories(self) -> list:
+        return list(self._offsets)
+
+    def entries(self) -> list:
+        # [(catégorie, texte)] dans l'ordre du fichier.
+        with self._lock:
+            self._reload_if_changed()
+            return [(category, self._items[i]) for category, (start, end) in self._offsets.items()
+                    for i in range(start, end)]
+
+    def count(self, category: str = "any") -> int:
+        start, end = self._bounds(category)
+        return end - start
+
+    def _bounds(self, category: str) -> tuple:
+        if category == "any":
+            return 0, len(self._items)
+        return self._offsets.get(category.lower(), (0, 0))
+
+    def _weighted_index(self, start: int, end: int) -> int:
+        cumulative = self._cumulative
+        low = cumulative[start - 1] if start else 0.0
+        target = low + self._random.random() * (cumulative[end - 1] - low)
+        return min(bisect_right(cumulative, target, start, end), end - 1)
+
+    def _no_repeat_index(self, user_id: str, category: str, start: int, end: int) -> int:
+        # Parcours d'une permutation (départ, pas premier avec n) : pas de répétition
+        # avant d'avoir tout servi, sans liste à construire ni à mémoriser.
+        n = end - start
+        key = (user_id, category)
+        cursor = self._cursors.get(key)
+        if cursor is None or cursor[2] >= n:
+            step = 1
+            if n > 2:
+                step = self._random.randrange(1, n)
+                while math.gcd(step, n) != 1:
+                    step = self._random.randrange(1, n)
+            cursor = [self._random.randrange(n), step, 0]
+            self._cursors[key] = cursor
+        self._cursors.move_to_end(key)
+        while len(self._cursors) > self._MAX_USER_CURSORS:
+            self._cursors.popitem(last=False)
+        index = start + (cursor[0] + cursor[2] * cursor[1]) % n
+        cursor[2] += 1
+        return index
+
+    def choose(self, category: str = "any", user_id: str = None) -> str:
+        # Avec user_id, aucun texte n'est répété pour cet utilisateur avant épuisement de la catégorie.
+        with self._lock:
+            self._reload_if_changed()
+            start, end = self._bounds(category)
+            if start == end:
+                return None
+            if user_id is not None:
+                index = self._no_repeat_index(user_id, category.lower(), start, end)
+            elif self._cumulative is not None:
+                index = self._weighted_index(start, end)
+            else:
+                index = self._random.randrange(start, end)
+            return self._items[index]
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_content_bank(path: str) -> ContentBank:
+    with _banks_lock:
+        bank = _banks.get(path)
+        if bank is None:
+            bank = _banks[path] = ContentBank(path)
+        return bank
@@ -1,48 +1,89 @@
 import os
-import time
-import json
 import datetime
-from gtts import gTTS
 from playsound import playsound
 from core.insf_local_learner import INSFLocalLearner
+from core.memory_log import get_memory_store
+from core.memory_search import get_memory_search
+from core.metrics import timed
+from core.tts_cache import get_tts_cache
+from core.tts_jobs import get_tts_queue
+from core.tts_stream import get_tts_streamer
 
 class EnhancedTryAngel:
     def __init__(self, user_id='utilisateur_defaut_001'):
         self.user_id = user_id
         self.learner = INSFLocalLearner()
-        self.profile = self.learner.create_or_load_user_profile(user_id)
+        self.learner.create_or_load_user_profile(user_id)
         self.voice_dir = 'voices'
-        self.memory_file = 'tryangel_memory_log.json'
+        self.memory_store = get_memory_store()
+        self.memory_search = get_memory_search(self.memory_store)
+        self.tts_cache = get_tts_cache()
         os.makedirs(self.voice_dir, exist_ok=True)
-        self._load_memory()
 
-    def _load_memory(self):
-        if os.path.exists(self.memory_file):
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                self.memory = json.load(f)
-        else:
-            self.memory = []
+    @property
+    def profile(self):
+        # Toujours relu depuis le cache partagé : le profil a pu en être évincé puis rechargé.
+        return self.learner.create_or_load_user_profile(self.user_id)
 
+    @property
+    def memory(self):
+        return self.memory_store.read(self.user_id)
+
+    @timed('save_memory')
     def save_memory(self, message, response):
         entry = {
             'timestamp': datetime.datetime.now().isoformat(),
             'message': message,
             'response': response
         }
-        self.memory.append(entry)
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            json.dump(self.memory, f, indent=2)
+        seq = self.memory_store.append(self.user_id, entry)
+        self.learner.index_exchange(self.user_id, seq, message)
+        self.memory_search.add(self.user_id, seq, entry)
+
+    @timed('save_memory')
+    def save_memories(self, exchanges):
+        # Un seul ajout au journal pour plusieurs (message, réponse) : utilisé par /speak/batch.
+        timestamp = datetime.datetime.now().isoformat()
+        entries = [{'timestamp': timestamp, 'message': m, 'response': r} for m, r in exchanges]
+        first_seq = self.memory_store.append_many(self.user_id, entries)
+        for seq, entry in enumerate(entries, first_seq):
+            self.learner.index_exchange(self.user_id, seq, entry['message'])
+            self.memory_search.add(self.user_id, seq, entry)
+
+    def flush_profile(self):
+        self.learner.flush_user(self.user_id)
+
+    def respond(self, message):
+        return self.learner.generate_response(message, self.user_id)
+
+    @timed('tts')
+    def _text_to_speech(self, text, lang='fr'):
+        # Fichier mis en cache par (texte, langue, voix) : une réponse identique n'est synthétisée qu'une fois.
+        return self.tts_cache.get_or_create(text, lang, self.profile['preferred_voice'])
+
+    def _queue_text_to_speech(self, text, lang='fr'):
+        # Variante non bloquante : renvoie le job de synthèse (peut lever QueueFull).
+        return get_tts_queue().submit(text, lang, self.profile['preferred_voice'])
+
+    def _stream_speech(self, text, lang='fr'):
+        # Variante par phrases : octets du mp3 au fil des synthèses, la première phrase d'abord.
+        return get_tts_streamer().audio(text, lang, self.profile['preferred_voice'])
+
+    def search_memory(self, query, since=None, cursor=None, limit=20):
+        return self.memory_search.search(self.user_id, query, since, cursor, limit)
+
+    def close(self):
+        self.learner.release_user(self.user_id)
+        self.memory_search.release_user(self.user_id)
 
     def speak(self, text):
         print(f'TryAngel: {text}')
-        filename = os.path.join(self.voice_dir, f"response_{int(time.time())}.mp3")
-        tts = gTTS(text=text, lang='fr')
-        tts.save(filename)
+        # Lecture phrase par phrase : la suite se synthétise pendant que la première est jouée.
         try:
-            playsound(filename)
+            for _, filename in get_tts_streamer().chunks(text, 'fr', self.profile['preferred_voice']):
+                playsound(filename)
         except Exception as e:
             print(f'[Erreur audio] {e}')
-        os.remove(filename)
         self.learner.record_voice_context(self.user_id, self.profile['last_emotion'], self.profile['preferred_voice'], 'positif')
 
     def ask_feedback(self):
@@ -61,7 +102,7 @@ class EnhancedTryAngel:
             if not user_input.strip():
                 self.speak('Je n’ai rien compris. Répète, s’il te plaît.')
                 continue
-            response = f"Je reçois : {user_input[:80]}. Je le retiens pour m’en souvenir."
+            response = self.respond(user_input)
             self.save_memory(user_input, response)
             self.speak(response)
             self.ask_feedback()
@@ -0,0 +1,261 @@
+import datetime
+import math
+import threading
+from array import array
+
+# Historiques du profil (feedback_history, comprehension_scores) en colonnes : horodatages
+# en microsecondes depuis 1970 (heure locale naïve, comme les isoformat() d'origine),
+# chaînes répétitives remplacées par des codes d'une table partagée, nombres en float64.
+# Une entrée coûte quelques dizaines d'octets au lieu d'un dict de plusieurs centaines.
+# Les entrées qui ne se reconstruisent pas à l'identique (clé en plus ou en moins,
+# horodatage non canonique, entier au lieu d'un flottant...) sont gardées telles quelles
+# à part : la conversion vers le schéma JSON est toujours exacte.
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_MISSING = object()
+_NAN = float("nan")
+
+
+class Vocabulary:
+    # Table d'internement partagée par tous les profils : chaîne <-> code entier.
+    _MAX_SIZE = 65536
+
+    def __init__(self):
+        self._codes = {}
+        self._values = []
+        self._lock = threading.Lock()
+
+    def code(self, value: str) -> int:
+        # None si la table est pleine (l'entrée est alors gardée telle quelle).
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    if len(self._values) >= self._MAX_SIZE:
+                        return None
+                    code = len(self._values)
+                    self._values.append(value)
+                    self._codes[value] = code
+        return code
+
+    def value(self, code: int) -> str:
+        return self._values[code]
+
+
+class HistorySchema:
+    def __init__(self, fields: tuple, categorical: tuple, numeric: tuple, time_field: str = "timestamp"):
+        self.fields = fields
+        self.time_field = time_field
+        self.categorical = categorical
+        self.numeric = numeric
+        self.vocabulary = Vocabulary()
+
+
+FEEDBACK_SCHEMA = HistorySchema(
+    fields=("timestamp", "voice_id", "feedback", "emotion", "speech_speed_sample"),
+    categorical=("voice_id", "feedback", "emotion"),
+    numeric=("speech_speed_sample",),
+)
+COMPREHENSION_SCHEMA = HistorySchema(fields=("timestamp", "score"), categorical=(), numeric=("score",))
+SCHEMAS = {
+    "feedback_history": FEEDBACK_SCHEMA,
+    "comprehension_scores": COMPREHENSION_SCHEMA,
+}
+
+
+def _to_micros(dt: datetime.datetime) -> int:
+    return (dt - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(micros: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(microseconds=micros)
+
+
+class History:
+    # Séquence d'entrées (dicts) au stockage en colonnes ; s'utilise comme la liste d'origine
+    # (len, index, tranches, itération, append), et datetime_at() évite de reparser les dates.
+    # Le verrou garde les colonnes alignées quand l'archivage retire des entrées en tête
+    # pendant qu'une requête en ajoute en fin.
+    __slots__ = ("schema", "_times", "_codes", "_numbers", "_overrides", "_lock")
+
+    def __init__(self, schema: HistorySchema, entries=()):
+        self.schema = schema
+        self._times = array("q")
+        self._codes = [array("I") for _ in schema.categorical]
+        self._numbers = [array("d") for _ in schema.numeric]
+        self._overrides = None  # {position: entrée d'origine} pour les entrées hors schéma
+        self._lock = threading.Lock()
+        self.extend(entries)
+
+    def append(self, entry: dict):
+        schema = self.schema
+        fits = len(entry) == len(schema.fields)
+        timestamp = entry.get(schema.time_field, _MISSING)
+        micros = None
+        if isinstance(timestamp, str):
+            try:
+                dt = datetime.datetime.fromisoformat(timestamp)
+                if dt.tzinfo is not None:
+                    fits = False
+                    dt = dt.replace(tzinfo=None)
+                micros = _to_micros(dt)
+                fits = fits and _from_micros(micros).isoformat() == timestamp
+            except ValueError:
+                pass
+        if micros is None:
+            fits = False
+            micros = self._times[-1] if self._times else 0
+
+        codes = []
+        for name in schema.categorical:
+            value = entry.get(name, _MISSING)
+            code = schema.vocabulary.code(value) if type(value) is str else None
+            if code is None:
+                fits = False
+                code = 0
+            codes.append(code)
+        numbers = []
+        for name in schema.numeric:
+            value = entry.get(name, _MISSING)
+            if value is None:
+                numbers.append(_NAN)
+            elif type(value) is float and not math.isnan(value):
+                numbers.append(value)
+            else:
+                fits = False
+                numbers.append(float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else _NAN)
+
+        with self._lock:
+            index = len(self._times)
+            self._times.append(micros)
+            for column, code in zip(self._codes, codes):
+                column.append(code)
+            for column, number in zip(self._numbers, numbers):
+                column.append(number)
+            if not fits:
+                if self._overrides is None:
+                    self._overrides = {}
+                self._overrides[index] = dict(entry)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def _build(self, index: int) -> dict:
+        # À appeler verrou pris.
+        if self._overrides and index in self._overrides:
+            return dict(self._overrides[index])
+        schema = self.schema
+        values = {schema.time_field: _from_micros(self._times[index]).isoformat()}
+        vocabulary = schema.vocabulary
+        for name, column in zip(schema.categorical, self._codes):
+            values[name] = vocabulary.value(column[index])
+        for name, column in zip(schema.numeric, self._numbers):
+            number = column[index]
+            values[name] = None if math.isnan(number) else number
+        return {name: values[name] for name in schema.fields}
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __getitem__(self, index):
+        with self._lock:
+            size = len(self._times)
+            if isinstance(index, slice):
+                return [self._build(i) for i in range(*index.indices(size))]
+            if index < 0:
+                index += size
+            if not 0 <= index < size:
+                raise IndexError("history index out of range")
+            return self._build(index)
+
+    def __delitem__(self, index):
+        # Utilisé pour retirer les entrées les plus anciennes (tranches contiguës).
+        if not isinstance(index, slice):
+            index = slice(index, index + 1 if index != -1 else None)
+        with self._lock:
+            start, stop, step = index.indices(len(self._times))
+            if step != 1:
+                raise ValueError("only contiguous slices can be deleted")
+            stop = max(start, stop)
+            for column in [self._times] + self._codes + self._numbers:
+                del column[start:stop]
+            if self._overrides:
+                removed = stop - start
+                self._overrides = {i if i < start else i - removed: entry
+                                   for i, entry in self._overrides.items() if not start <= i < stop} or None
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (History, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"History({len(self)} entrées)"
+
+    def to_list(self) -> list:
+        # Copie cohérente même si des entrées sont retirées ou ajoutées en parallèle.
+        with self._lock:
+            return [self._build(i) for i in range(len(self._times))]
+
+    def datetime_at(self, index: int) -> datetime.datetime:
+        # Comme fromisoformat(self[index]["timestamp"]), sans analyser de chaîne
+        # (les entrées gardées telles quelles passent par fromisoformat, erreurs comprises).
+        with self._lock:
+            if index < 0:
+                index += len(self)
+            if self._overrides and index in self._overrides:
+                timestamp = self._overrides[index][self.schema.time_field]
+            else:
+                return _from_micros(self._times[index])
+        return datetime.datetime.fromisoformat(timestamp)
+
+    def numbers(self, name: str) -> array:
+        return self._numbers[self.schema.numeric.index(name)]
+
+    def epoch_micros(self) -> array:
+        return self._times
+
+
+def last_datetime(history) -> datetime.datetime:
+    # Date de la dernière entrée, pour une History comme pour une liste de dicts.
+    if isinstance(history, History):
+        return history.datetime_at(-1)
+    return datetime.datetime.fromisoformat(history[-1]["timestamp"])
+
+
+def compact_profile(profile: dict) -> dict:
+    # Convertit sur place les historiques du profil (listes de dicts) en History.
+    for field, schema in SCHEMAS.items():
+        history = profile.get(field)
+        if isinstance(history, list):
+            profile[field] = History(schema, history)
+    return profile
+
+
+def _snapshot(value):
+    # dict(value) et list(value) copient en une seule opération (sous le GIL) : pas
+    # d'erreur si un autre thread ajoute une clé pendant la copie.
+    if isinstance(value, dict):
+        return {key: _snapshot(item) for key, item in dict(value).items()}
+    if isinstance(value, list):
+        return [_snapshot(item) for item in list(value)]
+    return value
+
+
+def snapshot_profile(profile: dict) -> dict:
+    # Copie d'un profil à écrire hors du verrou du cache. Les History sont partagées :
+    # elles se sérialisent sous leur propre verrou, et SQLiteStorage les repère par identité.
+    return _snapshot(profile)
+
+
+def json_default(value):
+    # Pour json.dump(..., default=json_default) : une History s'écrit comme la liste d'origine.
+    if isinstance(value, History):
+        return value.to_list()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -1,55 +1,166 @@
-
-import json
 import os
 import datetime
 import random  # Pour des suggestions initiales et des simulations simples
+from core.content_bank import get_content_bank
+from core.history import last_datetime
+from core.journal import Journal
+from core import keyword_matcher
+from core.metrics import timed
+from core.profile_store import ProfileStore, get_profile_store
+from core import profile_stats
+from core.response_engine import get_response_engine
 
 class INSFLocalLearner:
-    _PROFILES_DIR = "user_profiles"
-
-    def __init__(self):
-        self._users_data = {}
-        if not os.path.exists(self._PROFILES_DIR):
-            os.makedirs(self._PROFILES_DIR)
-        self._load_all_profiles()
-
-    def _get_profile_path(self, user_id: str) -> str:
-        return os.path.join(self._PROFILES_DIR, f"{user_id}_profile.json")
-
-    def _load_all_profiles(self):
-        for filename in os.listdir(self._PROFILES_DIR):
-            if filename.endswith("_profile.json"):
-                user_id = filename.replace("_profile.json", "")
-                try:
-                    with open(self._get_profile_path(user_id), 'r', encoding='utf-8') as f:
-                        self._users_data[user_id] = json.load(f)
-                except Exception as e:
-                    print(f"Erreur lors du chargement du profil {user_id}: {e}")
-
-    def _save_user_profile(self, user_id: str):
-        if user_id not in self._users_data:
-            print(f"Profil utilisateur {user_id} non trouvé en mémoire.")
-            return
-        profile_path = self._get_profile_path(user_id)
+    _LOG_NAMES = ["emotion_log", "memories_log", "voice_trace"]
+    _HISTORY_FIELDS = ["feedback_history", "comprehension_scores"]
+    _DIFFICULT_EMOTIONS = ["triste", "frustré", "fatigué", "angoissé", "stressé", "confus"]
+    _MIN_RESPONSE_SCORE = float(os.environ.get("TRYANGEL_RESPONSE_MIN_SCORE", "0.15"))
+
+    def __init__(self, profile_store: ProfileStore = None):
+        # Les profils sont chargés à la demande depuis le cache partagé du processus ;
+        # profils et journaux passent par le même moteur de stockage (JSON ou SQLite).
+        # ProfileStore définit __len__ : un cache vide est faux, d'où le test explicite.
+        self._users_data = get_profile_store() if profile_store is None else profile_store
+        self._storage = self._users_data.storage
+
+    def _save_user_profile(self, user_id: str, profile: dict = None):
+        # Écriture différée et regroupée par ProfileStore.
+        if profile is None:
+            profile = self._users_data.get(user_id)
+            if profile is None:
+                print(f"Profil utilisateur {user_id} non trouvé en mémoire.")
+                return
+        self._users_data.mark_dirty(user_id, profile)
+
+    def _get_journal(self, user_id: str, name: str, path: str = None) -> Journal:
+        # Journal JSONL ou table SQLite selon le moteur ; un `path` explicite désigne toujours un fichier.
+        return self._storage.event_log(user_id, name, path)
+
+    def release_user(self, user_id: str):
+        # Appelé quand l'instance d'un utilisateur est évincée : écrit son profil s'il a été
+        # modifié et libère ses journaux ouverts.
+        self.flush_user(user_id)
+        self._storage.release_user(user_id)
+        self._responses().release_user(user_id)
+
+    def flush_user(self, user_id: str):
+        # Écrit tout de suite le profil s'il a des modifications en attente.
+        self._users_data.flush(user_id)
+
+    def _responses(self):
+        return get_response_engine(self._storage.conversation_log())
+
+    def index_exchange(self, user_id: str, seq: int, message: str):
+        # Appelé par save_memory : l'échange devient retrouvable sans relire le journal.
+        self._responses().add_exchange(user_id, seq, message)
+
+    @timed("generate_response")
+    def generate_response(self, message: str, user_id: str = None) -> str:
+        # Plus proche voisin dans la base de connaissances, les banques de contenus et les
+        # échanges passés de l'utilisateur, ajusté selon son émotion et ses retours vocaux.
         try:
-            with open(profile_path, 'w', encoding='utf-8') as f:
-                json.dump(self._users_data[user_id], f, indent=4)
-        except IOError as e:
-            print(f"Erreur lors de la sauvegarde du profil {user_id}: {e}")
+            hits = self._responses().search(message, user_id, min_score=self._MIN_RESPONSE_SCORE)
+        except Exception as e:
+            print(f"Erreur de recherche de réponse : {e}")
+            hits = []
+        answer = self._answer_from_hit(hits[0], user_id) if hits else None
+        if not answer:
+            answer = f"Je reçois : {message[:80]}. Je le retiens pour m’en souvenir."
+
+        profile = self._users_data.get(user_id) if user_id is not None else None
+        if profile is None:
+            return answer
+        if self._prefers_short_answers(user_id, profile):
+            answer = answer.split(". ")[0].rstrip(".") + "."
+        emotion = profile.get("last_emotion", "neutre").lower()
+        if emotion in self._DIFFICULT_EMOTIONS and not (hits and hits[0]["source"] == "reassurance"):
+            answer = f"{self.say_reassurance(emotion, user_id=user_id)} {answer}"
+        return answer
+
+    def _answer_from_hit(self, hit: dict, user_id: str) -> str:
+        if hit["source"] == "exchange":
+            # Question déjà posée : on redonne la réponse faite alors, pas la question.
+            return hit.get("response")
+        if hit["source"] == "knowledge":
+            bank = self._responses().bank_for_category(hit["category"])
+            if bank is not None:
+                return bank.choose(hit["category"], user_id)
+            return f"Tu me parles de {hit['category']}. Dis-m’en un peu plus ?"
+        return hit["text"]
+
+    def _prefers_short_answers(self, user_id: str, profile: dict) -> bool:
+        # Retours vocaux majoritairement négatifs : réponse réduite à sa première phrase.
+        voice_results = self._stats(user_id, profile)["voice_results"]
+        positive = sum(tally.get("positif", 0) for tally in voice_results.values())
+        negative = sum(tally.get("négatif", 0) for tally in voice_results.values())
+        return negative > positive and negative >= 3
+
+    def query_log(self, user_id: str, name: str, since=None, until=None, limit: int = None) -> list:
+        # name : "emotion_log", "memories_log" ou "voice_trace" ; since/until en datetime ou ISO 8601.
+        # Les périodes déjà archivées (core.retention) sont relues dans les segments compressés.
+        if name not in self._LOG_NAMES:
+            raise ValueError(f"Journal inconnu : {name}")
+        entries = self._storage.archive_store().read(user_id, name, since, until)
+        if limit is not None and len(entries) >= limit:
+            return entries[:limit]
+        remaining = None if limit is None else limit - len(entries)
+        return entries + self._get_journal(user_id, name).range(since, until, remaining)
+
+    def query_history(self, user_id: str, field: str, since=None, until=None, limit: int = None) -> list:
+        # field : "feedback_history" ou "comprehension_scores", archives comprises.
+        if field not in self._HISTORY_FIELDS:
+            raise ValueError(f"Historique inconnu : {field}")
+        since = since.isoformat() if hasattr(since, "isoformat") else since
+        until = until.isoformat() if hasattr(until, "isoformat") else until
+        entries = self._storage.archive_store().read(user_id, field, since, until)
+        profile = self._users_data.get(user_id)
+        if profile is not None:
+            entries += [e for e in profile.get(field, [])
+                        if (since is None or e["timestamp"] >= since) and (until is None or e["timestamp"] < until)]
+        return entries if limit is None else entries[:limit]
+
+    def query(self, user_id: str, name: str, since=None, until=None, limit: int = None) -> list:
+        # Journal (query_log) ou historique du profil (query_history) selon le nom.
+        if name in self._HISTORY_FIELDS:
+            return self.query_history(user_id, name, since, until, limit)
+        return self.query_log(user_id, name, since, until, limit)
+
+    def archive_summary(self, user_id: str, name: str) -> dict:
+        # Résumés mensuels des entrées archivées : {"AAAA-MM": {count, first, last, counts, numeric}}.
+        if name not in self._LOG_NAMES + self._HISTORY_FIELDS:
+            raise ValueError(f"Historique inconnu : {name}")
+        return self._storage.archive_store().summary(user_id, name)
+
+    def _stats(self, user_id: str, profile: dict) -> dict:
+        # Les profils antérieurs aux compteurs sont reconstruits une fois, au premier accès.
+        stats = profile.get("stats")
+        if stats is None:
+            stats = profile["stats"] = profile_stats.compute_stats(profile, self._read_voice_trace(user_id))
+        return stats
+
+    def _read_voice_trace(self, user_id: str) -> list:
+        journal = self._get_journal(user_id, "voice_trace")
+        return journal.read_all() if journal.exists() else []
+
+    def rebuild_stats(self, user_id: str) -> dict:
+        profile = self._users_data.get(user_id)
+        if profile is None:
+            return None
+        profile["stats"] = profile_stats.compute_stats(profile, self._read_voice_trace(user_id))
+        self._save_user_profile(user_id, profile)
+        return profile["stats"]
+
+    def check_stats(self, user_id: str) -> list:
+        profile = self._users_data.get(user_id)
+        if profile is None:
+            return ["profil introuvable"]
+        return profile_stats.check_stats(profile, self._read_voice_trace(user_id))
 
+    @timed("profile_load")
     def create_or_load_user_profile(self, user_id: str) -> dict:
-        if user_id in self._users_data:
-            return self._users_data[user_id]
-
-        profile_path = self._get_profile_path(user_id)
-        if os.path.exists(profile_path):
-            try:
-                with open(profile_path, 'r', encoding='utf-8') as f:
-                    profile = json.load(f)
-                    self._users_data[user_id] = profile
-                    return profile
-            except Exception:
-                pass
+        profile = self._users_data.get(user_id)
+        if profile is not None:
+            return profile
 
         default_profile = {
             "user_id": user_id,
@@ -63,10 +174,11 @@ class INSFLocalLearner:
             "creation_date": datetime.datetime.now().isoformat(),
             "last_update_date": datetime.datetime.now().isoformat()
         }
-        self._users_data[user_id] = default_profile
-        self._save_user_profile(user_id)
+        self._stats(user_id, default_profile)
+        self._save_user_profile(user_id, default_profile)
         return default_profile
 
+    @timed("record_interaction")
     def record_interaction(self, user_id: str, voice_id: str, feedback: str, emotion: str, speech_speed_sample: float = None):
         if user_id not in self._users_data:
             return
@@ -78,7 +190,10 @@ class INSFLocalLearner:
             "emotion": emotion,
             "speech_speed_sample": speech_speed_sample
         }
+        # Compteurs initialisés avant l'ajout pour ne pas compter l'entrée deux fois.
+        stats = self._stats(user_id, profile)
         profile["feedback_history"].append(interaction)
+        profile_stats.record_feedback(stats, feedback, speech_speed_sample)
         profile["last_emotion"] = emotion
         profile["last_update_date"] = datetime.datetime.now().isoformat()
         if feedback.lower() in ["positif", "clair", "excellent", "oui"]:
@@ -86,34 +201,36 @@ class INSFLocalLearner:
         elif feedback.lower() in ["négatif", "confus", "mauvais", "non"]:
             profile["trust_score"] = max(0, profile["trust_score"] - 5)
         if speech_speed_sample is not None:
-            n_samples = len([inter for inter in profile["feedback_history"] if inter.get("speech_speed_sample") is not None])
+            n_samples = stats["speed_samples"]
             if n_samples > 1:
                 profile["speech_speed_avg"] = ((profile["speech_speed_avg"] * (n_samples - 1)) + speech_speed_sample) / n_samples
             else:
                 profile["speech_speed_avg"] = speech_speed_sample
-        self._save_user_profile(user_id)
+        self._save_user_profile(user_id, profile)
 
-    def calculate_comprehension_score(self, text: str, expected_keywords: list[str]) -> float:
+    def calculate_comprehension_score(self, text: str, expected_keywords: list[str], word_boundary: bool = False, fold_accents: bool = False) -> float:
         if not text or not expected_keywords:
             return 0.0
-        text_lower = text.lower()
-        found_keywords = sum(1 for kw in expected_keywords if kw.lower() in text_lower)
+        matcher = keyword_matcher.get_keyword_list_matcher(expected_keywords, word_boundary, fold_accents)
+        found_keywords = len(matcher.find_ids(text))
         return found_keywords / len(expected_keywords)
 
     def add_comprehension_score_to_profile(self, user_id: str, score: float):
         if user_id not in self._users_data:
             return
         profile = self._users_data[user_id]
+        stats = self._stats(user_id, profile)
         profile["comprehension_scores"].append({
             "timestamp": datetime.datetime.now().isoformat(),
             "score": score
         })
+        profile_stats.record_comprehension(stats, score)
         if score < 0.3 and profile["trust_score"] > 10:
             profile["trust_score"] = max(0, profile["trust_score"] - 3)
         elif score > 0.7 and profile["trust_score"] < 95:
             profile["trust_score"] = min(100, profile["trust_score"] + 1)
         profile["last_update_date"] = datetime.datetime.now().isoformat()
-        self._save_user_profile(user_id)
+        self._save_user_profile(user_id, profile)
 
     def suggest_voice_adjustment(self, user_id: str) -> dict:
         if user_id not in self._users_data:
@@ -129,121 +246,79 @@ class INSFLocalLearner:
                 suggestion["reason"] = f"Score de confiance faible et {len(neg_feedbacks)} feedbacks négatifs."
         return suggestion
 
-    def analyze_dropout_risk(self, user_id: str) -> float:
+    @timed("analyze_dropout_risk")
+    def analyze_dropout_risk(self, user_id: str, now: datetime.datetime = None) -> float:
         if user_id not in self._users_data:
             return 0.9
         profile = self._users_data[user_id]
+        now = now or datetime.datetime.now()
+        profile["dropout_risk_score"] = self.compute_dropout_risk(profile, self._stats(user_id, profile), now)
+        profile["last_update_date"] = now.isoformat()
+        self._save_user_profile(user_id, profile)
+        return profile["dropout_risk_score"]
+
+    @staticmethod
+    def compute_dropout_risk(profile: dict, stats: dict, now: datetime.datetime) -> float:
+        # Règles de risque d'abandon ; core.cohort_risk en applique la version vectorisée.
         risk_score = profile.get("dropout_risk_score", 0.1)
         if profile["trust_score"] < 30:
             risk_score += 0.3
         elif profile["trust_score"] < 50:
             risk_score += 0.15
-        num_interactions = len(profile["feedback_history"])
+        num_interactions = stats["feedback_total"]
         if num_interactions < 3:
             risk_score += 0.2
         else:
             if profile["feedback_history"]:
-                last_date = datetime.datetime.fromisoformat(profile["feedback_history"][-1]["timestamp"])
-                days_inactive = (datetime.datetime.now() - last_date).days
+                last_date = last_datetime(profile["feedback_history"])
+                days_inactive = (now - last_date).days
                 if days_inactive > 14:
                     risk_score += 0.25
                 elif days_inactive > 7:
                     risk_score += 0.1
-        neg_feedbacks = sum(1 for fb in profile["feedback_history"] if fb["feedback"].lower() in ["négatif", "confus", "mauvais"])
+        neg_feedbacks = stats["feedback_negative"]
         if num_interactions > 0:
             neg_ratio = neg_feedbacks / num_interactions
             if neg_ratio > 0.6:
                 risk_score += 0.3
             elif neg_ratio > 0.4:
                 risk_score += 0.15
-        if profile["comprehension_scores"]:
-            avg_comp = sum(cs["score"] for cs in profile["comprehension_scores"]) / len(profile["comprehension_scores"])
-            if avg_comp < 0.4 and len(profile["comprehension_scores"]) > 3:
+        if stats["comprehension_count"]:
+            avg_comp = stats["comprehension_sum"] / stats["comprehension_count"]
+            if avg_comp < 0.4 and stats["comprehension_count"] > 3:
                 risk_score += 0.2
-        profile["dropout_risk_score"] = min(max(risk_score, 0.0), 1.0)
-        profile["last_update_date"] = datetime.datetime.now().isoformat()
-        self._save_user_profile(user_id)
-        return profile["dropout_risk_score"]
+        return min(max(risk_score, 0.0), 1.0)
 
     def load_knowledge_base(self, path: str = "insf_knowledge_base.json") -> dict:
+        # Base partagée et mise en cache : ne pas la modifier sur place.
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return keyword_matcher.load_knowledge_base(path)
         except Exception as e:
             print(f"Erreur de chargement de la base de connaissances: {e}")
             return {}
 
-    def analyze_text_context(self, user_input: str, knowledge: dict) -> dict:
-        context = {}
-        user_text = user_input.lower()
-        for category, keywords in knowledge.items():
-            found = [kw for kw in keywords if kw.lower() in user_text]
-            if found:
-                context[category] = found
-        return context
-
-if __name__ == "__main__":
-    learner = INSFLocalLearner()
-    print("=== TEST DU MOTEUR INSF ===")
-
-    # Création de profils
-    user1 = "test_utilisateur_001"
-    profile = learner.create_or_load_user_profile(user1)
-    print("Profil créé :", profile)
-
-    # Interaction simulée
-    learner.record_interaction(user1, "A", "positif", "joyeux", 160.0)
-    learner.record_interaction(user1, "A", "confus", "triste", 150.0)
-
-    # Score de compréhension
-    sample_text = "Je pense que c'est un dossier médical et confidentiel"
-    expected = ["médical", "confidentiel", "fichier"]
-    score = learner.calculate_comprehension_score(sample_text, expected)
-    learner.add_comprehension_score_to_profile(user1, score)
-    print(f"Score compréhension : {score:.2f}")
-
-    # Suggestion de voix
-    suggestion = learner.suggest_voice_adjustment(user1)
-    print("Suggestion de voix :", suggestion)
-
-    # Analyse de contexte avec base
-    kb = learner.load_knowledge_base()
-    context = learner.analyze_text_context(sample_text, kb)
-    print("Contexte détecté :", context)
-
-    # Risque d'abandon
-    risk = learner.analyze_dropout_risk(user1)
-    print(f"Risque d'abandon : {risk:.2f}")
+    def analyze_text_context(self, user_input: str, knowledge: dict, word_boundary: bool = False, fold_accents: bool = False) -> dict:
+        return keyword_matcher.get_matcher(knowledge, word_boundary, fold_accents).match(user_input)
 
     def update_emotion_timeline(self, user_id: str, emotion: str):
         if user_id not in self._users_data:
             return
-        emotion_log_path = os.path.join(self._PROFILES_DIR, f"{user_id}_emotion_log.json")
         entry = {
             "timestamp": datetime.datetime.now().isoformat(),
             "emotion": emotion
         }
-        log = []
-        if os.path.exists(emotion_log_path):
-            try:
-                with open(emotion_log_path, "r", encoding="utf-8") as f:
-                    log = json.load(f)
-            except Exception:
-                pass
-        log.append(entry)
-        with open(emotion_log_path, "w", encoding="utf-8") as f:
-            json.dump(log, f, indent=4)
+        self._get_journal(user_id, "emotion_log").append(entry)
 
     def detect_emotion_trend(self, user_id: str, window: int = 5) -> str:
-        emotion_log_path = os.path.join(self._PROFILES_DIR, f"{user_id}_emotion_log.json")
-        if not os.path.exists(emotion_log_path):
+        journal = self._get_journal(user_id, "emotion_log")
+        if not journal.exists():
             return "Aucune tendance détectée."
         try:
-            with open(emotion_log_path, "r", encoding="utf-8") as f:
-                log = json.load(f)
+            recent = journal.tail(window)
         except Exception:
             return "Erreur de lecture du journal émotionnel."
-        recent = log[-window:]
+        if not recent:
+            return "Aucune tendance détectée."
         emotions = [e["emotion"] for e in recent]
         if emotions.count("triste") >= 3:
             return "Tu sembles souvent triste dernièrement. Est-ce que je peux t’accompagner davantage ?"
@@ -262,7 +337,7 @@ if __name__ == "__main__":
             return "Je n’ai pas encore assez d’interactions pour analyser ton rythme."
 
         try:
-            last_interaction_date = datetime.datetime.fromisoformat(profile["feedback_history"][-1]["timestamp"])
+            last_interaction_date = last_datetime(profile["feedback_history"])
             days_since_last = (datetime.datetime.now() - last_interaction_date).days
 
             if days_since_last > threshold_days:
@@ -298,122 +373,88 @@ if __name__ == "__main__":
 
         return "Voix standard – adaptée à une humeur neutre et une heure classique."
 
-    def tell_random_joke(self, category: str = "any", path: str = "humour_bank.json") -> str:
+    def tell_random_joke(self, category: str = "any", path: str = "humour_bank.json", user_id: str = None) -> str:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                jokes = json.load(f)
+            jokes = get_content_bank(path)
         except Exception as e:
             return f"Erreur de chargement des blagues : {e}"
 
-        if category.lower() == "any":
-            all_jokes = sum(jokes.values(), [])
-            return random.choice(all_jokes) if all_jokes else "Aucune blague trouvée."
-
-        selected = jokes.get(category.lower())
-        if not selected:
+        joke = jokes.choose(category.lower(), user_id)
+        if joke is None:
+            if category.lower() == "any":
+                return "Aucune blague trouvée."
             return f"Aucune blague dans la catégorie '{category}'. Essaie 'soft', 'nerdy' ou 'grandma_friendly'."
-        return random.choice(selected)
+        return joke
 
-    def say_reassurance(self, context: str, path: str = "reassurance_bank.json") -> str:
+    def say_reassurance(self, context: str, path: str = "reassurance_bank.json", user_id: str = None) -> str:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                bank = json.load(f)
+            bank = get_content_bank(path)
         except Exception as e:
             return f"Erreur de chargement de la base de réassurance : {e}"
 
-        context = context.lower()
-        if context in bank:
-            return random.choice(bank[context])
-        else:
-            return "Je suis là si tu as besoin. Tu n’es pas seul."
+        phrase = bank.choose(context.lower(), user_id) if context.lower() != "any" else None
+        return phrase or "Je suis là si tu as besoin. Tu n’es pas seul."
 
-    def teach_cyber_tip(self, topic: str = "any", path: str = "cybersecurity_bank.json") -> str:
+    def teach_cyber_tip(self, topic: str = "any", path: str = "cybersecurity_bank.json", user_id: str = None) -> str:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                bank = json.load(f)
+            bank = get_content_bank(path)
         except Exception as e:
             return f"Erreur de chargement des conseils de cybersécurité : {e}"
 
-        if topic.lower() == "any":
-            all_tips = sum(bank.values(), [])
-            return random.choice(all_tips) if all_tips else "Aucun conseil disponible."
-
-        tips = bank.get(topic.lower())
-        if not tips:
+        tip = bank.choose(topic.lower(), user_id)
+        if tip is None:
+            if topic.lower() == "any":
+                return "Aucun conseil disponible."
             return f"Aucun conseil dans la catégorie '{topic}'. Essaie 'passwords', 'phishing', 'updates' ou 'devices'."
-        return random.choice(tips)
+        return tip
 
     def record_memory(self, user_id: str, event_type: str, event_description: str, path: str = None):
-        if path is None:
-            path = os.path.join(self._PROFILES_DIR, f"{user_id}_memories_log.json")
-
         memory = {
             "date": datetime.datetime.now().isoformat(),
             "type": event_type,
             "event": event_description
         }
-
-        log = []
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    log = json.load(f)
-            except Exception:
-                pass
-
-        log.append(memory)
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(log, f, indent=4)
+        self._get_journal(user_id, "memories_log", path).append(memory)
 
     def recall_memories(self, user_id: str, path: str = None, max_entries: int = 5) -> list:
-        if path is None:
-            path = os.path.join(self._PROFILES_DIR, f"{user_id}_memories_log.json")
-
-        if not os.path.exists(path):
+        journal = self._get_journal(user_id, "memories_log", path)
+        if not journal.exists():
             return ["Aucun souvenir enregistré pour le moment."]
 
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                log = json.load(f)
-                return [f"{entry['date'][:10]} – {entry['event']}" for entry in log[-max_entries:]]
+            return [f"{entry['date'][:10]} – {entry['event']}" for entry in journal.tail(max_entries)]
         except Exception as e:
             return [f"Erreur de lecture des souvenirs : {e}"]
 
     def record_voice_context(self, user_id: str, emotion: str, voice_id: str, result: str, path: str = None):
-        if path is None:
-            path = os.path.join(self._PROFILES_DIR, f"{user_id}_voice_trace.json")
-
         entry = {
             "timestamp": datetime.datetime.now().isoformat(),
             "emotion": emotion.lower(),
             "voice_id": voice_id,
             "result": result.lower()
         }
-
-        log = []
-        if os.path.exists(path):
-            try:
-                with open(path, "r", encoding="utf-8") as f:
-                    log = json.load(f)
-            except Exception:
-                pass
-
-        log.append(entry)
-
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(log, f, indent=4)
+        journal = self._get_journal(user_id, "voice_trace", path)
+        profile = self._users_data.get(user_id) if path is None else None
+        if profile is not None:
+            # Compteurs initialisés avant l'ajout pour ne pas compter l'entrée deux fois.
+            stats = self._stats(user_id, profile)
+        journal.append(entry)
+        if profile is not None:
+            profile_stats.record_voice_result(stats, voice_id, entry["result"])
+            self._save_user_profile(user_id, profile)
 
     def summarize_voice_memory(self, user_id: str, path: str = None) -> dict:
-        if path is None:
-            path = os.path.join(self._PROFILES_DIR, f"{user_id}_voice_trace.json")
-
-        if not os.path.exists(path):
+        journal = self._get_journal(user_id, "voice_trace", path)
+        if not journal.exists():
             return {"message": "Aucune donnée vocale enregistrée."}
 
+        profile = self._users_data.get(user_id) if path is None else None
+        if profile is not None:
+            voice_results = self._stats(user_id, profile)["voice_results"]
+            return {voice: dict(tally) for voice, tally in voice_results.items()}
+
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                log = json.load(f)
+            log = journal.read_all()
         except Exception as e:
             return {"error": f"Erreur de lecture : {e}"}
 
@@ -446,5 +487,36 @@ if __name__ == "__main__":
 
 if __name__ == "__main__":
     learner = INSFLocalLearner()
+    print("=== TEST DU MOTEUR INSF ===")
+
+    # Création de profils
+    user1 = "test_utilisateur_001"
+    profile = learner.create_or_load_user_profile(user1)
+    print("Profil créé :", profile)
+
+    # Interaction simulée
+    learner.record_interaction(user1, "A", "positif", "joyeux", 160.0)
+    learner.record_interaction(user1, "A", "confus", "triste", 150.0)
+
+    # Score de compréhension
+    sample_text = "Je pense que c'est un dossier médical et confidentiel"
+    expected = ["médical", "confidentiel", "fichier"]
+    score = learner.calculate_comprehension_score(sample_text, expected)
+    learner.add_comprehension_score_to_profile(user1, score)
+    print(f"Score compréhension : {score:.2f}")
+
+    # Suggestion de voix
+    suggestion = learner.suggest_voice_adjustment(user1)
+    print("Suggestion de voix :", suggestion)
+
+    # Analyse de contexte avec base
+    kb = learner.load_knowledge_base()
+    context = learner.analyze_text_context(sample_text, kb)
+    print("Contexte détecté :", context)
+
+    # Risque d'abandon
+    risk = learner.analyze_dropout_risk(user1)
+    print(f"Risque d'abandon : {risk:.2f}")
+
     print("Activation d’iAngel avec voix Sol...")
     learner.play_voice_clip("Sol")
@@ -0,0 +1,125 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class InstanceRegistry:
+    # Instances EnhancedTryAngel par utilisateur, bornées en nombre (LRU) et en durée
+    # d'inactivité (TTL). Une instance évincée est fermée : son état est écrit sur disque.
+    # Tant que le registre n'est pas vide, un minuteur appelle expire() toutes les
+    # _EXPIRE_INTERVAL secondes : une instance inactive est fermée même sans nouvel accès.
+    _MAX_SIZE = int(os.environ.get("TRYANGEL_MAX_INSTANCES", "512"))
+    _TTL = float(os.environ.get("TRYANGEL_INSTANCE_TTL", "1800"))
+    _EXPIRE_INTERVAL = float(os.environ.get("TRYANGEL_INSTANCE_EXPIRE_INTERVAL", "60"))
+
+    def __init__(self, factory, max_size: int = None, ttl: float = None, expire_interval: float = None):
+        self.factory = factory
+        self.max_size = max_size or self._MAX_SIZE
+        self.ttl = self._TTL if ttl is None else ttl
+        self.expire_interval = self._EXPIRE_INTERVAL if expire_interval is None else expire_interval
+        self._entries = OrderedDict()  # user_id -> [instance, dernier accès]
+        self._lock = threading.Lock()
+        self._expire_timer = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        atexit.register(self.close_all)
+
+    def get(self, user_id: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] <= self.ttl:
+                entry[1] = now
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Construction hors verrou : elle peut lire le disque.
+        instance = self.factory(user_id=user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] <= self.ttl:
+                # Un autre thread l'a créée entre-temps : on garde la sienne.
+                entry[1] = now
+                self._entries.move_to_end(user_id)
+                return entry[0]
+            stale = self._entries.pop(user_id, None)
+            self._entries[user_id] = [instance, now]
+            evicted = self._collect_evictions(now)
+            if stale is not None:
+                evicted.append(stale[0])
+                self.evictions += 1
+            self._schedule_expire()
+        for old in evicted:
+            self._close(old)
+        return instance
+
+    def _collect_evictions(self, now: float) -> list:
+        evicted = []
+        while self._entries:
+            user_id, (instance, last_access) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_size and now - last_access <= self.ttl:
+                break
+            del self._entries[user_id]
+            evicted.append(instance)
+            self.evictions += 1
+        return evicted
+
+    def _close(self, instance):
+        try:
+            instance.close()
+        except Exception as e:
+            print(f"Erreur lors de la fermeture de l'instance {getattr(instance, 'user_id', '?')}: {e}")
+
+    def _schedule_expire(self):
+        # Appelé sous self._lock.
+        if self._expire_timer is None and self._entries:
+            self._expire_timer = threading.Timer(self.expire_interval, self._timed_expire)
+            self._expire_timer.daemon = True
+            self._expire_timer.start()
+
+    def _timed_expire(self):
+        with self._lock:
+            self._expire_timer = None
+        try:
+            self.expire()
+        except Exception as e:
+            print(f"Erreur lors de l'expiration des instances : {e}")
+        with self._lock:
+            self._schedule_expire()
+
+    def expire(self) -> int:
+        with self._lock:
+            evicted = self._collect_evictions(time.monotonic())
+        for instance in evicted:
+            self._close(instance)
+        return len(evicted)
+
+    def close_all(self):
+        with self._lock:
+            instances = [entry[0] for entry in self._entries.values()]
+            self._entries.clear()
+            if self._expire_timer is not None:
+                self._expire_timer.cancel()
+                self._expire_timer = None
+        for instance in instances:
+            self._close(instance)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,427 @@
+import atexit
+import datetime
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from core.metrics import count_bytes
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou inter-processus indisponible
+    fcntl = None
+
+
+class Journal:
+    # Journal JSONL en ajout seul (une entrée par ligne). Chaque ajout est une seule
+    # écriture O_APPEND ; les fsync sont regroupés (_FSYNC_EVERY ajouts ou _FSYNC_INTERVAL s).
+    # Un minuteur fait le fsync en attente si aucun ajout ne suit dans l'intervalle.
+    # Le compactage réécrit le fichier dans un temporaire puis le renomme atomiquement.
+    # Entre workers, un verrou <fichier>.lock est pris en partage pour chaque ajout et en
+    # exclusif pour chaque réécriture ; un ajout qui trouve le fichier remplacé (autre inode)
+    # rouvre son descripteur au lieu d'écrire dans l'ancien fichier.
+    # Les _RING_SIZE dernières entrées sont gardées en mémoire pour tail(), et un index
+    # clairsemé (un horodatage tous les _INDEX_STRIDE enregistrements) sert aux requêtes par période.
+    _FSYNC_EVERY = int(os.environ.get("TRYANGEL_JOURNAL_FSYNC_EVERY", "32"))
+    _FSYNC_INTERVAL = float(os.environ.get("TRYANGEL_JOURNAL_FSYNC_INTERVAL", "1.0"))
+    _RING_SIZE = 64
+    _INDEX_STRIDE = 64
+    _READ_CHUNK = 8192
+
+    def __init__(self, path: str, legacy_path: str = None, time_field: str = "timestamp"):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.time_field = time_field
+        self._lock = threading.RLock()
+        self._file = None
+        self._lock_file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self.needs_compaction = False
+        # Taille du fichier couverte par l'anneau et l'index ; tout écart (autre processus,
+        # compactage) les invalide et ils sont reconstruits à la demande.
+        self._size = None
+        self._inode = None
+        self._ring = None
+        self._index_keys = None
+        self._index_offsets = None
+        self._index_count = 0
+        self._migrate_legacy()
+        self._repair_tail()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _migrate_legacy(self):
+        # Reprise unique de l'ancien fichier JSON (tableau réécrit à chaque ajout).
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"Erreur lors de la migration du journal {self.legacy_path}: {e}")
+            return
+        self._flock(True)
+        try:
+            if not os.path.exists(self.legacy_path):
+                return
+            self._rewrite(legacy + self._read_entries())
+            os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        finally:
+            self._funlock()
+
+    def _repair_tail(self):
+        # Une écriture interrompue laisse une dernière ligne sans retour à la ligne : on la coupe.
+        try:
+            with open(self.path, "rb+") as f:
+                size = f.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b"\n":
+                    return
+                pos = size
+                while pos > 0:
+                    step = min(4096, pos)
+                    pos -= step
+                    f.seek(pos)
+                    chunk = f.read(step)
+                    cut = chunk.rfind(b"\n")
+                    if cut != -1:
+                        f.truncate(pos + cut + 1)
+                        return
+                f.truncate(0)
+        except FileNotFoundError:
+            pass
+
+    def _flock(self, exclusive: bool):
+        if fcntl is None:
+            return
+        if self._lock_file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._lock_file = open(self.path + ".lock", "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _funlock(self):
+        if fcntl is not None and self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _open(self):
+        # À appeler sous le verrou de fichier : une réécriture ne peut pas remplacer le
+        # fichier entre la vérification de l'inode et l'écriture.
+        if self._file is not None:
+            try:
+                inode = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode != os.fstat(self._file.fileno()).st_ino:
+                self._close_file()
+                self._invalidate()
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "ab", buffering=0)
+        return self._file
+
+    def append(self, entry: dict):
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._flock(False)
+            try:
+                f = self._open()
+                f.write(line)
+                count_bytes("journal", len(line))
+                end = f.tell()
+                self._track_append(entry, end - len(line), end)
+                self._unsynced += 1
+                due = self._unsynced >= self._FSYNC_EVERY or time.monotonic() - self._last_sync >= self._FSYNC_INTERVAL
+                if due:
+                    self._sync()
+                elif self._sync_timer is None:
+                    self._sync_timer = threading.Timer(self._FSYNC_INTERVAL, self._timed_sync)
+                    self._sync_timer.daemon = True
+                    self._sync_timer.start()
+            finally:
+                self._funlock()
+            if due:
+                # Compactage périodique, seulement si une lecture a rencontré des lignes illisibles.
+                self.maybe_compact()
+
+    def _track_append(self, entry: dict, offset: int, end: int):
+        if self._size != offset:
+            self._invalidate()
+            return
+        if self._ring is not None:
+            self._ring.append(entry)
+        if self._index_keys is not None:
+            if self._index_count % self._INDEX_STRIDE == 0:
+                self._index_keys.append(str(entry.get(self.time_field, "")))
+                self._index_offsets.append(offset)
+            self._index_count += 1
+        self._size = end
+
+    def _invalidate(self):
+        self._size = None
+        self._ring = None
+        self._index_keys = None
+        self._index_offsets = None
+        self._index_count = 0
+
+    def _check_fresh(self):
+        try:
+            stat = os.stat(self.path)
+            size, inode = stat.st_size, stat.st_ino
+        except OSError:
+            size, inode = 0, None
+        if size != self._size or inode != self._inode:
+            self._invalidate()
+            self._size = size
+            self._inode = inode
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _timed_sync(self):
+        with self._lock:
+            self._sync_timer = None
+            try:
+                self._sync()
+            except OSError as e:
+                print(f"Erreur lors de la synchronisation du journal {self.path}: {e}")
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def _read_entries(self) -> list:
+        entries = []
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        self.needs_compaction = True
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def read_all(self) -> list:
+        with self._lock:
+            return self._read_entries()
+
+    def _parse_lines(self, lines: list) -> list:
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                self.needs_compaction = True
+        return entries
+
+    def _read_tail_lines(self, n: int) -> list:
+        # Lecture à rebours depuis la fin : coût proportionnel à n, pas à l'historique.
+        if n <= 0 or not self._size:
+            return []
+        with open(self.path, "rb") as f:
+            pos = self._size
+            buffer = b""
+            while pos > 0 and buffer.count(b"\n") <= n:
+                step = min(self._READ_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                buffer = f.read(step) + buffer
+        lines = buffer.split(b"\n")[:-1]
+        if pos > 0:
+            lines = lines[1:]
+        return lines[-n:]
+
+    def tail(self, n: int) -> list:
+        with self._lock:
+            self._check_fresh()
+            if n > self._RING_SIZE:
+                return self._parse_lines(self._read_tail_lines(n))
+            if self._ring is None:
+                self._ring = deque(self._parse_lines(self._read_tail_lines(self._RING_SIZE)), maxlen=self._RING_SIZE)
+            if n <= 0:
+                return []
+            return list(self._ring)[-n:]
+
+    def _build_index(self):
+        keys, offsets = [], []
+        count = 0
+        offset = 0
+        with open(self.path, "rb") as f:
+            while offset < self._size:
+                line = f.readline()
+                if not line:
+                    break
+                if count % self._INDEX_STRIDE == 0:
+                    try:
+                        key = str(json.loads(line).get(self.time_field, ""))
+                    except ValueError:
+                        key = keys[-1] if keys else ""
+                    keys.append(key)
+                    offsets.append(offset)
+                count += 1
+                offset += len(line)
+        self._index_keys = keys
+        self._index_offsets = offsets
+        self._index_count = count
+
+    @staticmethod
+    def _as_key(value) -> str:
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return value
+
+    def range(self, since=None, until=None, limit: int = None) -> list:
+        # Entrées telles que since <= horodatage < until, dans l'ordre d'écriture.
+        since = self._as_key(since)
+        until = self._as_key(until)
+        with self._lock:
+            self._check_fresh()
+            if not self._size:
+                return []
+            if self._index_keys is None:
+                self._build_index()
+            block = 0
+            if since is not None:
+                block = max(0, bisect_left(self._index_keys, since) - 1)
+            results = []
+            with open(self.path, "rb") as f:
+                f.seek(self._index_offsets[block] if self._index_offsets else 0)
+                offset = f.tell()
+                while offset < self._size:
+                    line = f.readline()
+                    if not line:
+                        break
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        self.needs_compaction = True
+                        continue
+                    key = str(entry.get(self.time_field, ""))
+                    if since is not None and key < since:
+                        continue
+                    if until is not None and key >= until:
+                        break
+                    results.append(entry)
+                    if limit is not None and len(results) >= limit:
+                        break
+            return results
+
+    def _rewrite(self, entries: list):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            for entry in entries:
+                f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._invalidate()
+
+    def compact(self):
+        # Supprime les lignes illisibles ; le descripteur est rouvert sur le nouveau fichier.
+        with self._lock:
+            self._flock(True)
+            try:
+                self._close_file()
+                self._rewrite(self._read_entries())
+                self.needs_compaction = False
+            finally:
+                self._funlock()
+
+    def remove_head(self, n: int) -> int:
+        # Retire les n premières entrées (archivées ailleurs) ; les lignes illisibles
+        # rencontrées avant la n-ième entrée partent avec elles. Retourne le nombre retiré.
+        if n <= 0:
+            return 0
+        with self._lock:
+            self._flock(True)
+            try:
+                self._close_file()
+                removed = 0
+                try:
+                    with open(self.path, "rb") as f:
+                        for line in f:
+                            try:
+                                json.loads(line)
+                            except ValueError:
+                                continue
+                            removed += 1
+                            if removed == n:
+                                break
+                        rest = f.read()
+                except FileNotFoundError:
+                    return 0
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(rest)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._invalidate()
+                return removed
+            finally:
+                self._funlock()
+
+    def maybe_compact(self):
+        if self.needs_compaction:
+            self.compact()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            self._close_file()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path: str, legacy_path: str = None, time_field: str = "timestamp") -> Journal:
+    # Une seule instance par fichier dans le processus, pour partager verrou et descripteur.
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = Journal(path, legacy_path, time_field)
+        return journal
+
+
+def release_journal(path: str):
+    # Ferme et oublie un journal (éviction d'un utilisateur inactif) ; rouvert à la demande.
+    with _journals_lock:
+        journal = _journals.pop(path, None)
+    if journal is not None:
+        journal.maybe_compact()
+        journal.close()
+
+
+def flush_all_journals():
+    with _journals_lock:
+        journals = list(_journals.values())
+    for journal in journals:
+        journal.flush()
+        journal.maybe_compact()
+
+
+atexit.register(flush_all_journals)
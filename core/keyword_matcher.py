@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from core.text_normalize import fold_accents
+
+
+class KeywordMatcher:
+    # Automate d'Aho-Corasick sur les mots-clés d'une base {catégorie: [mots-clés]} :
+    # un seul passage sur le texte, quel que soit le nombre de mots-clés.
+    # Par défaut le résultat est identique à `kw.lower() in text.lower()` ;
+    # word_boundary n'accepte que des mots entiers, fold ignore les accents.
+    def __init__(self, knowledge: dict, word_boundary: bool = False, fold: bool = False):
+        self.word_boundary = word_boundary
+        self.fold = fold
+        self._categories = []
+        self._always = set()
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        kid = 0
+        for category, keywords in knowledge.items():
+            entries = []
+            for kw in keywords:
+                entries.append((kid, kw))
+                normalized = self._normalize(kw)
+                if normalized:
+                    self._insert(normalized, kid)
+                else:
+                    self._always.add(kid)
+                kid += 1
+            self._categories.append((category, entries))
+        self._link()
+
+    def _normalize(self, text: str) -> str:
+        return fold_accents(text) if self.fold else text.lower()
+
+    def _insert(self, keyword: str, kid: int):
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + ((kid, len(keyword)),)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _is_boundary(self, text: str, start: int, end: int) -> bool:
+        return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+    def find_ids(self, text: str) -> set:
+        text = self._normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(self._always)
+        node = 0
+        for pos, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                for kid, length in out[node]:
+                    if not self.word_boundary or self._is_boundary(text, pos + 1 - length, pos + 1):
+                        found.add(kid)
+        return found
+
+    def match(self, text: str) -> dict:
+        found = self.find_ids(text)
+        context = {}
+        if not found:
+            return context
+        for category, entries in self._categories:
+            hits = [kw for kid, kw in entries if kid in found]
+            if hits:
+                context[category] = hits
+        return context
+
+
+_MATCHERS_MAX = 256
+_matchers = OrderedDict()
+_list_matchers = OrderedDict()
+_knowledge_files = {}
+_lock = threading.Lock()
+
+
+def get_matcher(knowledge: dict, word_boundary: bool = False, fold: bool = False) -> KeywordMatcher:
+    # Un automate par version de la base ; l'empreinte (taille) détecte les dictionnaires modifiés sur place.
+    fingerprint = (len(knowledge), sum(len(v) for v in knowledge.values()))
+    key = (id(knowledge), word_boundary, fold)
+    with _lock:
+        cached = _matchers.get(key)
+        if cached is not None and cached[0] is knowledge and cached[1] == fingerprint:
+            _matchers.move_to_end(key)
+            return cached[2]
+    matcher = KeywordMatcher(knowledge, word_boundary, fold)
+    with _lock:
+        # La base est conservée dans l'entrée pour que son id ne soit pas réutilisé.
+        _matchers[key] = (knowledge, fingerprint, matcher)
+        _matchers.move_to_end(key)
+        while len(_matchers) > _MATCHERS_MAX:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def get_keyword_list_matcher(keywords: list, word_boundary: bool = False, fold: bool = False) -> KeywordMatcher:
+    key = (tuple(keywords), word_boundary, fold)
+    with _lock:
+        matcher = _list_matchers.get(key)
+        if matcher is not None:
+            _list_matchers.move_to_end(key)
+            return matcher
+    matcher = KeywordMatcher({"keywords": list(keywords)}, word_boundary, fold)
+    with _lock:
+        _list_matchers[key] = matcher
+        while len(_list_matchers) > _MATCHERS_MAX:
+            _list_matchers.popitem(last=False)
+    return matcher
+
+
+def load_knowledge_base(path: str) -> dict:
+    # Relu uniquement si la date de modification du fichier a changé.
+    mtime = os.path.getmtime(path)
+    with _lock:
+        cached = _knowledge_files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        knowledge = json.load(f)
+    with _lock:
+        _knowledge_files[path] = (mtime, knowledge)
+    return knowledge
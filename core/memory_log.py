@@ -0,0 +1,189 @@
+import json
+import os
+import struct
+import threading
+from array import array
+from core.metrics import count_bytes
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou inter-processus indisponible
+    fcntl = None
+
+
+class MemoryLogStore:
+    # Journal de conversation par utilisateur, en ajout seul :
+    #   memory_logs/<user_id>/segment_000000.jsonl  (une entrée JSON par ligne)
+    #   memory_logs/<user_id>/index.bin             (offset 64 bits de chaque entrée dans son segment)
+    # L'entrée n°i se trouve dans le segment i // _SEGMENT_MAX_ENTRIES.
+    _LOG_DIR = "memory_logs"
+    _SEGMENT_MAX_ENTRIES = 5000
+    _LEGACY_FILE = "tryangel_memory_log.json"
+    _DEFAULT_USER = "utilisateur_defaut_001"
+
+    def __init__(self, base_dir: str = None):
+        self.base_dir = base_dir or self._LOG_DIR
+        os.makedirs(self.base_dir, exist_ok=True)
+        self._indexes = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.base_dir, user_id)
+
+    def _index_path(self, user_id: str) -> str:
+        return os.path.join(self._user_dir(user_id), "index.bin")
+
+    def _segment_path(self, user_id: str, segment: int) -> str:
+        return os.path.join(self._user_dir(user_id), f"segment_{segment:06d}.jsonl")
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(user_id)
+            if lock is None:
+                lock = self._locks[user_id] = threading.Lock()
+            return lock
+
+    def _refresh_index(self, user_id: str) -> array:
+        # Ne lit que la partie de l'index écrite depuis le dernier passage (autres workers compris).
+        # À appeler sous _user_lock : l'écrivain étend l'index en mémoire après avoir écrit le fichier.
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = self._indexes[user_id] = array("Q")
+        index_path = self._index_path(user_id)
+        try:
+            size = os.path.getsize(index_path)
+        except OSError:
+            return index
+        known = len(index) * 8
+        usable = size - size % 8
+        if usable > known:
+            with open(index_path, "rb") as f:
+                f.seek(known)
+                data = f.read(usable - known)
+            index.extend(struct.unpack(f"<{len(data) // 8}Q", data))
+        return index
+
+    def append(self, user_id: str, entry: dict) -> int:
+        return self.append_many(user_id, [entry])
+
+    def append_many(self, user_id: str, entries: list) -> int:
+        # Retourne le numéro de séquence de la première entrée ajoutée.
+        os.makedirs(self._user_dir(user_id), exist_ok=True)
+        with self._user_lock(user_id):
+            with open(self._index_path(user_id), "ab") as index_file:
+                if fcntl is not None:
+                    fcntl.flock(index_file, fcntl.LOCK_EX)
+                try:
+                    # Une écriture interrompue peut laisser un offset partiel en fin d'index.
+                    size = index_file.seek(0, os.SEEK_END)
+                    if size % 8:
+                        index_file.truncate(size - size % 8)
+                    index = self._refresh_index(user_id)
+                    first_seq = len(index)
+                    offsets = []
+                    seq = first_seq
+                    pos = 0
+                    while pos < len(entries):
+                        segment = seq // self._SEGMENT_MAX_ENTRIES
+                        room = self._SEGMENT_MAX_ENTRIES - seq % self._SEGMENT_MAX_ENTRIES
+                        chunk = entries[pos:pos + room]
+                        with open(self._segment_path(user_id, segment), "ab") as seg_file:
+                            offset = seg_file.seek(0, os.SEEK_END)
+                            lines = []
+                            for entry in chunk:
+                                line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+                                offsets.append(offset)
+                                offset += len(line)
+                                lines.append(line)
+                            data = b"".join(lines)
+                            seg_file.write(data)
+                            count_bytes("conversation_log", len(data))
+                        seq += len(chunk)
+                        pos += len(chunk)
+                    index_file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+                    count_bytes("conversation_index", 8 * len(offsets))
+                    index_file.flush()
+                    index.extend(offsets)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(index_file, fcntl.LOCK_UN)
+        return first_seq
+
+    def count(self, user_id: str) -> int:
+        with self._user_lock(user_id):
+            return len(self._refresh_index(user_id))
+
+    def read(self, user_id: str, start: int = 0, stop: int = None) -> list:
+        with self._user_lock(user_id):
+            index = self._refresh_index(user_id)
+            total = len(index)
+        start, stop, _ = slice(start, stop).indices(total)
+        entries = []
+        seq = start
+        while seq < stop:
+            segment = seq // self._SEGMENT_MAX_ENTRIES
+            segment_stop = min(stop, (segment + 1) * self._SEGMENT_MAX_ENTRIES)
+            with open(self._segment_path(user_id, segment), "rb") as f:
+                for i in range(seq, segment_stop):
+                    if f.tell() != index[i]:
+                        f.seek(index[i])
+                    entries.append(json.loads(f.readline()))
+            seq = segment_stop
+        return entries
+
+    def migrate_legacy_log(self, path: str = None, default_user: str = None) -> int:
+        # Migration unique de l'ancien fichier partagé tryangel_memory_log.json.
+        path = path or self._LEGACY_FILE
+        default_user = default_user or self._DEFAULT_USER
+        lock_path = os.path.join(self.base_dir, ".migration.lock")
+        with open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not os.path.exists(path):
+                    return 0
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        legacy = json.load(f)
+                except Exception as e:
+                    print(f"Erreur lors de la migration du journal {path}: {e}")
+                    return 0
+                by_user = {}
+                for entry in legacy:
+                    by_user.setdefault(entry.get("user_id", default_user), []).append(entry)
+                for user_id, entries in by_user.items():
+                    self.append_many(user_id, entries)
+                os.replace(path, path + ".migrated")
+                print(f"Journal {path} migré : {len(legacy)} entrées.")
+                return len(legacy)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def iter_log(store, user_id: str, start: int = 0, stop: int = None, chunk_size: int = 500):
+    # Parcours par tranches : jamais plus de chunk_size entrées en mémoire (MemoryLogStore ou SQLite).
+    stop = store.count(user_id) if stop is None else stop
+    for chunk_start in range(start, stop, chunk_size):
+        yield from store.read(user_id, chunk_start, min(chunk_start + chunk_size, stop))
+
+
+def offset_for_timestamp(store, user_id: str, when: str, strict: bool = False) -> int:
+    # Première entrée dont le timestamp est >= when (> when si strict), par dichotomie :
+    # les entrées sont ajoutées dans l'ordre chronologique. Timestamps ISO 8601 comparés comme chaînes.
+    low, high = 0, store.count(user_id)
+    while low < high:
+        middle = (low + high) // 2
+        timestamp = store.read(user_id, middle, middle + 1)[0].get("timestamp", "")
+        if timestamp < when or (strict and timestamp == when):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def get_memory_store():
+    # Journal de conversation du moteur de stockage courant (MemoryLogStore en mode JSON).
+    from core.storage import get_storage
+    return get_storage().conversation_log()
@@ -0,0 +1,135 @@
+import datetime
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from core.text_normalize import tokenize
+
+
+class UserMemoryIndex:
+    # Index inversé des échanges d'un utilisateur : mot (sans accents) -> numéros
+    # d'échange croissants. L'échange n°i est la ligne i du journal de conversation,
+    # ce qui permet de relire directement les résultats.
+    def __init__(self):
+        self.postings = {}
+        self.timestamps = array("d")  # horodatage (epoch) de chaque échange, pour `since`
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add(self, entry: dict):
+        seq = len(self.timestamps)
+        text = f"{entry.get('message') or ''} {entry.get('response') or ''}"
+        for token in set(tokenize(text)):
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = array("I")
+            postings.append(seq)
+        try:
+            timestamp = datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            timestamp = self.timestamps[-1] if self.timestamps else 0.0
+        self.timestamps.append(timestamp)
+
+    def search(self, tokens: list, since: float = None, before: int = None, limit: int = 20) -> tuple:
+        # Échanges contenant tous les mots, du plus récent au plus ancien, à partir du
+        # curseur `before` (exclu). Retourne (numéros, curseur suivant ou None).
+        lists = []
+        for token in set(tokens):
+            postings = self.postings.get(token)
+            if postings is None:
+                return [], None
+            lists.append(postings)
+        if not lists:
+            return [], None
+        lists.sort(key=len)
+        rarest, others = lists[0], lists[1:]
+        position = bisect_left(rarest, len(self) if before is None else before)
+        found = []
+        while position > 0:
+            position -= 1
+            seq = rarest[position]
+            # Horodatages croissants : au-delà de `since`, plus rien ne peut correspondre.
+            if since is not None and self.timestamps[seq] < since:
+                return found, None
+            if all(self._contains(postings, seq) for postings in others):
+                if len(found) == limit:
+                    return found, found[-1]
+                found.append(seq)
+        return found, None
+
+    @staticmethod
+    def _contains(postings: array, seq: int) -> bool:
+        i = bisect_left(postings, seq)
+        return i < len(postings) and postings[i] == seq
+
+
+class MemorySearch:
+    # Index inversés par utilisateur sur le journal de conversation, tenus à jour par
+    # save_memory et rattrapés via count() pour les échanges écrits par d'autres workers.
+    # Chaque index a son propre verrou : le journal n'est jamais relu sous le verrou global.
+    _MAX_USERS = int(os.environ.get("TRYANGEL_MEMORY_SEARCH_USERS", "256"))
+    MAX_LIMIT = 100
+
+    def __init__(self, conversation_log):
+        self.conversation_log = conversation_log
+        self._users = OrderedDict()  # user_id -> (UserMemoryIndex, verrou de l'utilisateur)
+        self._lock = threading.Lock()
+
+    def _index(self, user_id: str) -> tuple:
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                user = self._users[user_id] = (UserMemoryIndex(), threading.Lock())
+            self._users.move_to_end(user_id)
+            while len(self._users) > self._MAX_USERS:
+                self._users.popitem(last=False)
+        index, user_lock = user
+        total = self.conversation_log.count(user_id)
+        if total > len(index):
+            with user_lock:
+                if total > len(index):
+                    for entry in self.conversation_log.read(user_id, len(index), total):
+                        index.add(entry)
+        return user
+
+    def add(self, user_id: str, seq: int, entry: dict):
+        # Appelé après l'ajout de l'échange n°seq ; ignoré si l'index n'est pas (encore) en mémoire.
+        with self._lock:
+            user = self._users.get(user_id)
+        if user is None:
+            return
+        index, user_lock = user
+        with user_lock:
+            if len(index) == seq:
+                index.add(entry)
+
+    def release_user(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def search(self, user_id: str, query: str, since: datetime.datetime = None,
+               cursor: int = None, limit: int = 20) -> dict:
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        index, user_lock = self._index(user_id)
+        with user_lock:
+            seqs, next_cursor = index.search(tokenize(query), since.timestamp() if since else None, cursor, limit)
+        results = []
+        for seq in seqs:
+            entry = self.conversation_log.read(user_id, seq, seq + 1)[0]
+            results.append(dict(entry, seq=seq))
+        return {"results": results, "next_cursor": next_cursor}
+
+
+_searches = {}
+_searches_lock = threading.Lock()
+
+
+def get_memory_search(conversation_log) -> MemorySearch:
+    with _searches_lock:
+        search = _searches.get(id(conversation_log))
+        if search is None:
+            search = _searches[id(conversation_log)] = MemorySearch(conversation_log)
+        return search
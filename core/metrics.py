@@ -0,0 +1,176 @@
+import contextlib
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Métriques en mémoire exportées au format texte Prometheus par /metrics.
+# TRYANGEL_METRICS=0 désactive tout : timed() rend la fonction telle quelle et
+# stage() un contexte vide partagé, sans aucun appel d'horloge.
+ENABLED = os.environ.get("TRYANGEL_METRICS", "1") == "1"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(label: str, value: str, extra: str = "") -> str:
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'{{{label}="{escaped}"{extra}}}'
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _metrics.append(self)
+
+    def inc(self, label_value: str, amount: float = 1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value: str) -> float:
+        return self._values.get(label_value, 0)
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.label, k)} {v}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # valeur du label -> [comptes par seau (+Inf en dernier), somme]
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _metrics.append(self)
+
+    def observe(self, label_value: str, seconds: float):
+        slot = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += seconds
+
+    def snapshot(self, label_value: str) -> dict:
+        with self._lock:
+            counts, total = self._series.get(label_value, [[0] * (len(self.buckets) + 1), 0.0])
+            return {"count": sum(counts), "sum": total}
+
+    def render(self) -> list:
+        with self._lock:
+            series = sorted((k, list(counts), total) for k, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for value, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f',le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label, value, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label, value)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label, value)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("tryangel_stage_seconds", "Durée des étapes de traitement.", "stage")
+REQUEST_SECONDS = Histogram("tryangel_request_seconds", "Durée des requêtes HTTP par route.", "endpoint")
+BYTES_WRITTEN = Counter("tryangel_file_bytes_written_total", "Octets écrits sur disque.", "kind")
+
+
+def register_collector(collector):
+    # collector() -> [(nom, type, aide, {valeur de label ou None: valeur})], lu seulement à l'export.
+    with _registry_lock:
+        _collectors.append(collector)
+
+
+def stats_collector(prefix: str, stats, counters: tuple = ()):
+    # Expose un dictionnaire stats() existant : les clés de `counters` en compteurs, les autres
+    # valeurs numériques en jauges.
+    def collect():
+        values = stats()
+        families = []
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            kind = "counter" if key in counters else "gauge"
+            name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+            families.append((name, kind, f"{prefix} {key}", {None: value}))
+        return families
+    register_collector(collect)
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics, collectors = list(_metrics), list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines += metric.render()
+    for collector in collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            print(f"Erreur de collecte des métriques : {e}")
+            continue
+        for name, kind, help_text, samples in families:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name} {v}" if k is None else f"{name}{_format_labels('key', k)} {v}" for k, v in samples.items()]
+    return "\n".join(lines) + "\n"
+
+
+def count_bytes(kind: str, amount: int):
+    if ENABLED:
+        BYTES_WRITTEN.inc(kind, amount)
+
+
+class _StageTimer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_DISABLED = contextlib.nullcontext()
+
+
+def stage(name: str):
+    # with stage("tts"): ...
+    return _StageTimer(name) if ENABLED else _DISABLED
+
+
+def timed(name: str):
+    # Décorateur : chronomètre chaque appel sous l'étape `name`.
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
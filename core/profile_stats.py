@@ -0,0 +1,99 @@
+import copy
+import math
+import sys
+
+# Compteurs cumulés conservés dans profile["stats"], mis à jour en O(1) à chaque événement
+# pour éviter de rescanner feedback_history, comprehension_scores et la trace vocale.
+NEGATIVE_FEEDBACKS = ["négatif", "confus", "mauvais"]
+VOICE_RESULTS = ["positif", "négatif"]
+
+
+def empty_stats() -> dict:
+    return {
+        "speed_samples": 0,
+        "speed_sum": 0,
+        "feedback_total": 0,
+        "feedback_negative": 0,
+        "comprehension_sum": 0,
+        "comprehension_count": 0,
+        "voice_results": {},
+    }
+
+
+def record_feedback(stats: dict, feedback: str, speech_speed_sample: float = None):
+    stats["feedback_total"] += 1
+    if feedback.lower() in NEGATIVE_FEEDBACKS:
+        stats["feedback_negative"] += 1
+    if speech_speed_sample is not None:
+        stats["speed_samples"] += 1
+        stats["speed_sum"] += speech_speed_sample
+
+
+def record_comprehension(stats: dict, score: float):
+    stats["comprehension_count"] += 1
+    stats["comprehension_sum"] += score
+
+
+def record_voice_result(stats: dict, voice_id: str, result: str):
+    tally = stats["voice_results"].setdefault(voice_id, {r: 0 for r in VOICE_RESULTS})
+    if result in tally:
+        tally[result] += 1
+
+
+def compute_stats(profile: dict, voice_trace: list = ()) -> dict:
+    # Recalcul complet, utilisé pour reconstruire ou vérifier les compteurs. Les entrées
+    # archivées (core.retention) n'y sont plus : leur part est dans profile["archived_stats"].
+    stats = copy.deepcopy(profile.get("archived_stats")) or empty_stats()
+    for interaction in profile.get("feedback_history", []):
+        record_feedback(stats, interaction["feedback"], interaction.get("speech_speed_sample"))
+    for cs in profile.get("comprehension_scores", []):
+        record_comprehension(stats, cs["score"])
+    for entry in voice_trace:
+        record_voice_result(stats, entry["voice_id"], entry["result"])
+    return stats
+
+
+def check_stats(profile: dict, voice_trace: list = ()) -> list:
+    # Retourne la liste des écarts entre les compteurs stockés et un scan complet.
+    expected = compute_stats(profile, voice_trace)
+    stored = profile.get("stats")
+    if stored is None:
+        return ["stats absentes"]
+    mismatches = []
+    for key, value in expected.items():
+        actual = stored.get(key)
+        if isinstance(value, float) or isinstance(actual, float):
+            same = actual is not None and math.isclose(actual, value, rel_tol=1e-9, abs_tol=1e-9)
+        else:
+            same = actual == value
+        if not same:
+            mismatches.append(f"{key}: stocké={actual!r} attendu={value!r}")
+    return mismatches
+
+
+def main(argv: list) -> int:
+    from core.insf_local_learner import INSFLocalLearner
+
+    if not argv or argv[0] not in ("rebuild", "check"):
+        print("Usage : python -m core.profile_stats rebuild|check [user_id ...]")
+        return 2
+    command, user_ids = argv[0], argv[1:]
+    learner = INSFLocalLearner()
+    user_ids = user_ids or learner._users_data.user_ids()
+    failures = 0
+    for user_id in user_ids:
+        if command == "rebuild":
+            if learner.rebuild_stats(user_id) is None:
+                print(f"{user_id} : profil introuvable")
+                failures += 1
+            continue
+        mismatches = learner.check_stats(user_id)
+        if mismatches:
+            failures += 1
+            print(f"{user_id} : {'; '.join(mismatches)}")
+    print(f"{len(user_ids)} profils traités, {failures} en erreur.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,297 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from core.history import compact_profile, snapshot_profile
+from core.metrics import timed
+from core.storage import get_storage
+
+
+class ProfileStore:
+    # Cache LRU des profils, partagé par tout le processus : un profil n'est lu
+    # dans le stockage qu'au premier accès, et seuls les _MAX_CACHED plus récents restent en mémoire.
+    # Écriture différée : mark_dirty() note le profil modifié et un thread d'arrière-plan
+    # regroupe les écritures par utilisateur (au plus tard après _FLUSH_INTERVAL secondes
+    # ou _FLUSH_EVERY modifications). Les profils modifiés sont écrits avant d'être évincés,
+    # et à l'arrêt du processus. Ce qui est écrit est une copie prise sous le verrou du cache
+    # (snapshot_profile) : la sérialisation ne parcourt jamais un profil en cours de modification.
+    # Aucune entrée/sortie sous ce verrou : lectures et écritures se font après l'avoir relâché.
+    # Les copies sont numérotées et écrites l'une après l'autre (_write_lock), une copie plus ancienne
+    # que la dernière écrite est ignorée ; tant qu'une écriture est en cours, un profil sorti
+    # du cache est repris tel quel (_writing) plutôt que relu dans un stockage pas encore à jour.
+    _MAX_CACHED = int(os.environ.get("TRYANGEL_PROFILE_CACHE_SIZE", "1024"))
+    _WRITE_BEHIND = os.environ.get("TRYANGEL_PROFILE_WRITE_BEHIND", "1") == "1"
+    _FLUSH_INTERVAL = float(os.environ.get("TRYANGEL_PROFILE_FLUSH_INTERVAL", "2.0"))
+    _FLUSH_EVERY = int(os.environ.get("TRYANGEL_PROFILE_FLUSH_EVERY", "20"))
+
+    def __init__(self, storage=None, max_cached: int = None, write_behind: bool = None,
+                 flush_interval: float = None, flush_every: int = None):
+        self.storage = storage or get_storage()
+        self.max_cached = max_cached or self._MAX_CACHED
+        self.write_behind = self._WRITE_BEHIND if write_behind is None else write_behind
+        self.flush_interval = self._FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.flush_every = flush_every or self._FLUSH_EVERY
+        self._cache = OrderedDict()
+        self._dirty = {}  # user_id -> [profil, première modification non écrite, nombre de modifications]
+        self._writing = {}  # user_id -> [profil, nombre de copies en attente d'écriture]
+        self._written = {}  # user_id -> numéro de la dernière copie écrite (tant que d'autres attendent)
+        self._loading = {}  # user_id -> Event levé quand la lecture en cours est terminée
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.events = 0
+        self.writes = 0
+        atexit.register(self.close)
+
+    def _snapshot(self, user_id: str, profile: dict) -> tuple:
+        # Appelé sous self._lock : copie numérotée, comptée comme écriture en attente.
+        self._seq += 1
+        pending = self._writing.setdefault(user_id, [profile, 0])
+        pending[0] = profile
+        pending[1] += 1
+        return user_id, snapshot_profile(profile), self._seq
+
+    def _remember(self, user_id: str, profile: dict) -> tuple:
+        # Appelé sous self._lock. Historiques convertis en colonnes (core.history) dès leur entrée
+        # dans le cache. Renvoie (copies des évincés modifiés, évincés) pour _release().
+        compact_profile(profile)
+        self._cache[user_id] = profile
+        self._cache.move_to_end(user_id)
+        snapshots, evicted = [], []
+        while len(self._cache) > self.max_cached:
+            evicted_id, old = self._cache.popitem(last=False)
+            if self._dirty.pop(evicted_id, None) is not None:
+                snapshots.append(self._snapshot(evicted_id, old))
+            evicted.append(evicted_id)
+            self.evictions += 1
+        return snapshots, evicted
+
+    def _release(self, remembered: tuple):
+        # Hors du verrou : écrit les évincés modifiés, puis oublie ceux qui ne sont pas revenus.
+        snapshots, evicted = remembered
+        if snapshots:
+            self._write(snapshots)
+        if evicted:
+            with self._lock:
+                for uid in evicted:
+                    if uid not in self._cache and uid not in self._writing:
+                        self.storage.forget_profile(uid)
+
+    def get(self, user_id: str) -> dict:
+        while True:
+            with self._lock:
+                profile = self._cache.get(user_id)
+                if profile is not None:
+                    self._cache.move_to_end(user_id)
+                    self.hits += 1
+                    return profile
+                self.misses += 1
+                pending = self._writing.get(user_id)
+                if pending is not None:
+                    # Sorti du cache, écriture pas encore terminée : le stockage peut être en retard.
+                    profile = pending[0]
+                    remembered = self._remember(user_id, profile)
+                    break
+                # Une seule lecture par utilisateur : les autres threads attendent son résultat.
+                loading = self._loading.get(user_id)
+                if loading is None:
+                    loading = self._loading[user_id] = threading.Event()
+                    break
+            loading.wait()
+        if pending is not None:
+            self._release(remembered)
+            return profile
+        loaded = None
+        try:
+            loaded = self.storage.load_profile(user_id)
+        except Exception as e:
+            print(f"Erreur lors du chargement du profil {user_id}: {e}")
+        with self._lock:
+            del self._loading[user_id]
+            profile = self._cache.get(user_id)
+            if profile is None and loaded is not None:
+                profile = loaded
+                remembered = self._remember(user_id, profile)
+            else:
+                # Créé par put()/save() pendant la lecture : cette version gagne.
+                loaded = None
+        loading.set()
+        if loaded is not None:
+            self._release(remembered)
+        return profile
+
+    def put(self, user_id: str, profile: dict):
+        with self._lock:
+            remembered = self._remember(user_id, profile)
+        self._release(remembered)
+
+    @timed("profile_write")
+    def _write(self, snapshots: list) -> bool:
+        # snapshots : [(user_id, copie, numéro)] pris par _snapshot().
+        with self._write_lock:
+            latest = {}
+            for uid, snapshot, seq in snapshots:
+                if seq > self._written.get(uid, 0) and seq > latest.get(uid, (0,))[0]:
+                    latest[uid] = (seq, snapshot)
+            items = [(uid, snapshot) for uid, (_, snapshot) in latest.items()]
+            ok = True
+            if items:
+                try:
+                    self.storage.save_profiles(items)
+                except Exception as e:
+                    print(f"Erreur lors de la sauvegarde des profils {', '.join(uid for uid, _ in items)}: {e}")
+                    ok = False
+            with self._lock:
+                if ok:
+                    self.writes += len(items)
+                for uid, _, seq in snapshots:
+                    if ok:
+                        self._written[uid] = max(seq, self._written.get(uid, 0))
+                    pending = self._writing[uid]
+                    pending[1] -= 1
+                    if not pending[1]:
+                        del self._writing[uid]
+                        self._written.pop(uid, None)
+        return ok
+
+    def save(self, user_id: str, profile: dict = None):
+        # Écriture immédiate (le profil n'est plus considéré comme modifié).
+        remembered = ([], [])
+        with self._lock:
+            if profile is None:
+                profile = self._cache.get(user_id)
+            else:
+                remembered = self._remember(user_id, profile)
+            self._dirty.pop(user_id, None)
+            snapshot = self._snapshot(user_id, profile) if profile is not None else None
+        self._release(remembered)
+        if snapshot is None:
+            print(f"Profil utilisateur {user_id} non trouvé en mémoire.")
+            return
+        self._write([snapshot])
+
+    def mark_dirty(self, user_id: str, profile: dict):
+        if not self.write_behind or self._closed:
+            with self._lock:
+                self.events += 1
+            self.save(user_id, profile)
+            return
+        with self._lock:
+            remembered = self._remember(user_id, profile)
+            self.events += 1
+            entry = self._dirty.get(user_id)
+            if entry is None:
+                entry = self._dirty[user_id] = [profile, time.monotonic(), 0]
+            entry[0] = profile
+            entry[2] += 1
+            urgent = entry[2] >= self.flush_every
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="profile-flusher", daemon=True)
+                self._flusher.start()
+        self._release(remembered)
+        if urgent:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval / 2)
+            self._wakeup.clear()
+            self.flush(due_only=True)
+
+    def flush(self, user_id: str = None, due_only: bool = False) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if user_id is not None:
+                entry = self._dirty.pop(user_id, None)
+                due = [(user_id, entry)] if entry is not None else []
+            else:
+                due = [(uid, entry) for uid, entry in self._dirty.items()
+                       if not due_only or entry[2] >= self.flush_every or now - entry[1] >= self.flush_interval]
+                for uid, _ in due:
+                    del self._dirty[uid]
+            snapshots = [self._snapshot(uid, entry[0]) for uid, entry in due]
+        if not due:
+            return 0
+        if not self._write(snapshots):
+            with self._lock:
+                # Échec : les profils restent à écrire, sauf s'ils ont été modifiés entre-temps.
+                for uid, entry in due:
+                    self._dirty.setdefault(uid, entry)
+            return 0
+        return len(due)
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self.flush()
+
+    def save_many(self, items: list):
+        # Sauvegarde groupée (une transaction avec SQLite, un seul sync disque avec JSON).
+        snapshots, evicted = [], []
+        with self._lock:
+            for user_id, profile in items:
+                remembered = self._remember(user_id, profile)
+                snapshots.extend(remembered[0])
+                evicted.extend(remembered[1])
+                self._dirty.pop(user_id, None)
+            snapshots.extend(self._snapshot(user_id, profile) for user_id, profile in items)
+        self._release((snapshots, evicted))
+
+    def cached_ids(self) -> list:
+        with self._lock:
+            return list(self._cache)
+
+    def user_ids(self) -> list:
+        # Parcours complet : réservé aux outils hors ligne (reconstruction, scoring par lot).
+        return self.storage.profile_ids()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "max_cached": self.max_cached,
+                "dirty": len(self._dirty),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "events": self.events,
+                "writes": self.writes,
+                "writes_saved": max(self.events - self.writes, 0),
+                "write_amplification_saved": self.events / self.writes if self.writes else 0.0,
+            }
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+    def __getitem__(self, user_id: str) -> dict:
+        profile = self.get(user_id)
+        if profile is None:
+            raise KeyError(user_id)
+        return profile
+
+    def __setitem__(self, user_id: str, profile: dict):
+        self.put(user_id, profile)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ProfileStore()
+        return _default_store
@@ -0,0 +1,305 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+from core import keyword_matcher
+from core.content_bank import get_content_bank
+from core.text_normalize import STOP_WORDS, fold_accents
+
+_NO_KNOWLEDGE = {}
+
+
+class TfidfIndex:
+    # Index TF-IDF incrémental (schéma lnc.ltc) : les documents sont pondérés par
+    # 1 + log(tf) puis normalisés, l'IDF n'est appliqué qu'à la requête. Ajouter un
+    # document ne modifie donc aucun vecteur existant, seulement les fréquences documentaires.
+    # Les termes sont hachés comme dans HashingVectorizer (pas de vocabulaire à reconstruire).
+    # Les lignes récentes restent dans des listes de postings ; par paquets de _CHUNK_ROWS
+    # elles sont scellées en blocs CSC, fusionnés par tailles doubles : une requête ne lit
+    # que les colonnes de ses propres termes, dans O(log n) blocs.
+    _N_FEATURES = 2 ** 20
+    _CHUNK_ROWS = 1024
+    _MAX_CACHED_TERMS = 100000
+
+    def __init__(self, n_features: int = None):
+        self.n_features = n_features or self._N_FEATURES
+        self._vectorizer = HashingVectorizer(
+            n_features=self.n_features,
+            preprocessor=fold_accents,
+            stop_words=STOP_WORDS,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,
+        )
+        self._analyzer = self._vectorizer.build_analyzer()
+        self._features = {}
+        self._blocks = []      # matrices CSC scellées
+        self._postings = {}    # lignes non scellées : colonne -> [(ligne relative, poids)]
+        self._pending = []     # mêmes lignes, [(colonnes, poids)] en attendant d'être scellées
+        self._df = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _feature(self, term: str) -> int:
+        # Même calcul que le hachage de HashingVectorizer (murmurhash3 32 bits, graine 0).
+        feature = self._features.get(term)
+        if feature is None:
+            h = murmurhash3_32(term, 0)
+            feature = (2147483647 - (self.n_features - 1)) % self.n_features if h == -2147483648 else abs(h) % self.n_features
+            if len(self._features) < self._MAX_CACHED_TERMS:
+                self._features[term] = feature
+        return feature
+
+    def _vectorize_one(self, text: str) -> tuple:
+        # Chemin rapide pour une ligne : (colonnes triées, poids normalisés).
+        counts = {}
+        for term in self._analyzer(text):
+            feature = self._feature(term)
+            counts[feature] = counts.get(feature, 0) + 1
+        if not counts:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        columns = np.fromiter(sorted(counts), dtype=np.int32, count=len(counts))
+        weights = 1.0 + np.log(np.array([counts[c] for c in columns.tolist()], dtype=np.float32))
+        return columns, weights / np.sqrt((weights * weights).sum())
+
+    def _vectorize(self, texts: list) -> sp.csr_matrix:
+        matrix = self._vectorizer.transform(texts)
+        matrix.data = 1.0 + np.log(matrix.data)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.csr_matrix(sp.diags(1.0 / norms) @ matrix, dtype=np.float32)
+
+    def add(self, texts: list) -> int:
+        # Retourne le numéro de la première ligne ajoutée (les lignes sont numérotées dans l'ordre d'ajout).
+        if len(texts) >= self._CHUNK_ROWS:
+            matrix = self._vectorize(texts)
+            rows = None
+            features, counts = np.unique(matrix.indices, return_counts=True)
+            df_updates = zip(features.tolist(), counts.tolist())
+        else:
+            rows = [self._vectorize_one(text) for text in texts]
+            df_updates = [(c, 1) for columns, _ in rows for c in columns.tolist()]
+        with self._lock:
+            first = self._size
+            df = self._df
+            for feature, count in df_updates:
+                df[feature] = df.get(feature, 0) + count
+            if rows is None:
+                self._seal()
+                self._append_block(matrix.tocsc())
+            else:
+                for columns, weights in rows:
+                    row = len(self._pending)
+                    for c, w in zip(columns.tolist(), weights.tolist()):
+                        self._postings.setdefault(c, []).append((row, w))
+                    self._pending.append((columns, weights))
+                if len(self._pending) >= self._CHUNK_ROWS:
+                    self._seal()
+            self._size += len(texts)
+            return first
+
+    def _seal(self):
+        if not self._pending:
+            return
+        indptr = np.zeros(len(self._pending) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(columns) for columns, _ in self._pending])
+        indices = np.concatenate([columns for columns, _ in self._pending])
+        data = np.concatenate([weights for _, weights in self._pending])
+        block = sp.csr_matrix((data, indices, indptr), shape=(len(self._pending), self.n_features))
+        self._pending, self._postings = [], {}
+        self._append_block(block.tocsc())
+
+    def _append_block(self, block: sp.csc_matrix):
+        self._blocks.append(block)
+        while len(self._blocks) > 1 and self._blocks[-1].shape[0] >= self._blocks[-2].shape[0]:
+            last = self._blocks.pop()
+            self._blocks[-1] = sp.vstack([self._blocks[-1], last], format="csc")
+
+    def search(self, text: str, k: int = 5, min_score: float = 0.0) -> list:
+        # Retourne [(score, ligne)] par score décroissant.
+        columns, weights = self._vectorize_one(text)
+        if not len(columns):
+            return []
+        with self._lock:
+            if not self._size:
+                return []
+            n = self._size
+            idf = np.array([math.log((1 + n) / (1 + self._df.get(c, 0))) + 1.0 for c in columns.tolist()],
+                           dtype=np.float32)
+            weights = weights * idf
+            weights /= np.sqrt((weights * weights).sum())
+            parts = [block[:, columns] @ weights for block in self._blocks]
+            if self._pending:
+                pending = np.zeros(len(self._pending), dtype=np.float32)
+                for c, w in zip(columns.tolist(), weights.tolist()):
+                    for row, value in self._postings.get(c, ()):
+                        pending[row] += value * w
+                parts.append(pending)
+        scores = np.concatenate(parts)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), int(i)) for i in top if scores[i] > min_score]
+
+
+class ResponseEngine:
+    # Recherche du plus proche voisin pour generate_response :
+    # - un index partagé sur la base de connaissances et les banques de contenus,
+    #   reconstruit quand l'un des fichiers change ;
+    # - un index par utilisateur sur ses échanges passés (ligne i = échange n°i du
+    #   journal de conversation), complété au fil des save_memory et rattrapé via
+    #   count() pour les échanges écrits par d'autres workers. Chaque index a son propre
+    #   verrou : le rattrapage d'un utilisateur ne bloque pas les autres.
+    # Un échange passé ressemble presque toujours parfaitement à la question répétée : son
+    # score est multiplié par _EXCHANGE_WEIGHT pour qu'une vraie réponse de la base l'emporte.
+    _MAX_USER_INDEXES = int(os.environ.get("TRYANGEL_RESPONSE_USER_INDEXES", "256"))
+    _EXCHANGE_WEIGHT = float(os.environ.get("TRYANGEL_RESPONSE_EXCHANGE_WEIGHT", "0.5"))
+    KNOWLEDGE_PATH = "insf_knowledge_base.json"
+    BANK_PATHS = {
+        "humour": "humour_bank.json",
+        "reassurance": "reassurance_bank.json",
+        "cyber": "cybersecurity_bank.json",
+    }
+    # Mots ajoutés aux entrées de chaque banque pour qu'une demande générique les retrouve.
+    BANK_TERMS = {
+        "humour": "blague humour rigoler",
+        "reassurance": "peur inquiet rassure",
+        "cyber": "conseil securite informatique",
+    }
+
+    def __init__(self, conversation_log, knowledge_path: str = None, bank_paths: dict = None):
+        self.conversation_log = conversation_log
+        self.knowledge_path = knowledge_path or self.KNOWLEDGE_PATH
+        self.bank_paths = bank_paths if bank_paths is not None else dict(self.BANK_PATHS)
+        self._shared = None
+        self._shared_docs = []
+        self._shared_knowledge = None
+        self._shared_sources = None
+        self._users = OrderedDict()  # user_id -> (TfidfIndex, verrou de l'utilisateur)
+        self._lock = threading.Lock()
+
+    def _load_sources(self) -> tuple:
+        try:
+            knowledge = keyword_matcher.load_knowledge_base(self.knowledge_path)
+        except Exception:
+            knowledge = _NO_KNOWLEDGE
+        banks = {}
+        for label, path in self.bank_paths.items():
+            try:
+                banks[label] = get_content_bank(path)
+            except Exception:
+                continue
+        return knowledge, banks
+
+    def _shared_index(self) -> tuple:
+        knowledge, banks = self._load_sources()
+        # load_knowledge_base renvoie le même objet tant que le fichier n'a pas changé.
+        versions = tuple((label, id(bank), bank.version) for label, bank in banks.items())
+        with self._lock:
+            if knowledge is not self._shared_knowledge or versions != self._shared_sources:
+                texts, docs = [], []
+                for category, keywords in knowledge.items():
+                    texts.append(" ".join([category] + list(keywords)))
+                    docs.append({"source": "knowledge", "category": category})
+                for label, bank in banks.items():
+                    for category, text in bank.entries():
+                        texts.append(f"{self.BANK_TERMS.get(label, '')} {category} {text}")
+                        docs.append({"source": label, "category": category, "text": text})
+                index = TfidfIndex()
+                if texts:
+                    index.add(texts)
+                self._shared, self._shared_docs = index, docs
+                self._shared_knowledge, self._shared_sources = knowledge, versions
+            return self._shared, self._shared_docs, banks
+
+    def _user_index(self, user_id: str) -> TfidfIndex:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._users[user_id] = (TfidfIndex(), threading.Lock())
+            self._users.move_to_end(user_id)
+            while len(self._users) > self._MAX_USER_INDEXES:
+                self._users.popitem(last=False)
+        index, user_lock = entry
+        total = self.conversation_log.count(user_id)
+        if total > len(index):
+            self._catch_up(user_id, index, user_lock, total)
+        return index
+
+    def _catch_up(self, user_id: str, index: TfidfIndex, user_lock: threading.Lock, total: int):
+        # Lecture du journal sous le seul verrou de l'utilisateur.
+        with user_lock:
+            indexed = len(index)
+            if total <= indexed:
+                return
+            entries = self.conversation_log.read(user_id, indexed, total)
+            index.add([entry.get("message") or "" for entry in entries])
+
+    def add_exchange(self, user_id: str, seq: int, message: str):
+        # Appelé après l'ajout de l'échange n°seq ; ignoré si l'index n'est pas (encore) en mémoire.
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is None:
+            return
+        index, user_lock = entry
+        with user_lock:
+            if len(index) == seq:
+                index.add([message or ""])
+
+    def release_user(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def search(self, message: str, user_id: str = None, k: int = 3, min_score: float = 0.0) -> list:
+        # Retourne les meilleurs voisins, toutes sources confondues, par score décroissant.
+        shared, docs, banks = self._shared_index()
+        hits = [dict(docs[row], score=score) for score, row in shared.search(message, k, min_score)]
+        if user_id is not None:
+            for score, row in self._user_index(user_id).search(message, k, min_score):
+                score *= self._EXCHANGE_WEIGHT
+                if score <= min_score:
+                    continue
+                # Seules les lignes trouvées sont relues (accès direct par l'index du journal).
+                entry = self.conversation_log.read(user_id, row, row + 1)[0]
+                hits.append({"source": "exchange", "seq": row, "score": score,
+                             "message": entry.get("message"), "response": entry.get("response"),
+                             "timestamp": entry.get("timestamp")})
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return hits[:k]
+
+    def bank_for_category(self, category: str):
+        # Banque dont une catégorie porte le nom d'une catégorie de la base de connaissances.
+        _, _, banks = self._shared_index()
+        for label, bank in banks.items():
+            if bank.count(category):
+                return bank
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "shared_documents": len(self._shared) if self._shared is not None else 0,
+                "user_indexes": len(self._users),
+                "user_documents": sum(len(index) for index, _ in self._users.values()),
+            }
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_response_engine(conversation_log) -> ResponseEngine:
+    with _engines_lock:
+        engine = _engines.get(id(conversation_log))
+        if engine is None:
+            engine = _engines[id(conversation_log)] = ResponseEngine(conversation_log)
+        return engine
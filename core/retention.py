@@ -0,0 +1,217 @@
+import argparse
+import datetime
+import os
+import sys
+import threading
+import time
+
+from core import profile_stats
+from core.archive import ARCHIVED_FIELDS
+from core.history import History
+from core.profile_store import ProfileStore, get_profile_store
+
+try:
+    import fcntl
+except ImportError:  # Windows : verrou inter-processus indisponible
+    fcntl = None
+
+# Rétention par paliers : les historiques du profil (feedback_history, comprehension_scores)
+# et les journaux (émotions, souvenirs, trace vocale) gardent en ligne une fenêtre chaude,
+# et les entrées plus anciennes partent dans les archives mensuelles compressées (core.archive).
+# Une entrée est archivée si elle a plus de _HOT_DAYS jours, ou si l'historique dépasse
+# _HOT_MAX entrées ; les _HOT_MIN dernières restent toujours en ligne (analyses récentes).
+# Les compteurs cumulés de profile["stats"] ne changent pas ; la part des entrées archivées
+# est gardée dans profile["archived_stats"] pour que profile_stats.check_stats reste juste.
+# Le compacteur d'arrière-plan repasse toutes les _INTERVAL secondes sur les profils en cache
+# (TRYANGEL_RETENTION_INTERVAL=0 le désactive) ; `python -m core.retention run --all` traite
+# tous les utilisateurs. Un fichier verrou évite deux passes simultanées entre workers.
+
+HISTORY_FIELDS = ["feedback_history", "comprehension_scores"]
+LOG_NAMES = ["emotion_log", "memories_log", "voice_trace"]
+
+
+class RetentionCompactor:
+    _HOT_DAYS = float(os.environ.get("TRYANGEL_RETENTION_HOT_DAYS", "90"))
+    _HOT_MAX = int(os.environ.get("TRYANGEL_RETENTION_HOT_MAX", "2000"))
+    _HOT_MIN = int(os.environ.get("TRYANGEL_RETENTION_HOT_MIN", "50"))
+    _INTERVAL = float(os.environ.get("TRYANGEL_RETENTION_INTERVAL", "3600"))
+    _LOCK_PATH = os.environ.get("TRYANGEL_RETENTION_LOCK", "retention.lock")
+
+    def __init__(self, profile_store: ProfileStore = None, hot_days: float = None, hot_max: int = None,
+                 hot_min: int = None, interval: float = None):
+        self.profiles = get_profile_store() if profile_store is None else profile_store
+        self.storage = self.profiles.storage
+        self.hot_days = self._HOT_DAYS if hot_days is None else hot_days
+        self.hot_max = hot_max or self._HOT_MAX
+        self.hot_min = self._HOT_MIN if hot_min is None else hot_min
+        self.interval = self._INTERVAL if interval is None else interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self.passes = 0
+        self.users_compacted = 0
+        self.archived = {name: 0 for name in HISTORY_FIELDS + LOG_NAMES}
+        self.last_pass_seconds = 0.0
+
+    def _archivable(self, size: int, is_old) -> int:
+        # Nombre d'entrées à archiver en tête d'un historique de `size` entrées.
+        over = max(0, size - self.hot_max)
+        old = 0
+        while old < size - self.hot_min and is_old(old):
+            old += 1
+        return max(over, old)
+
+    def compact_user(self, user_id: str, now: datetime.datetime = None) -> dict:
+        # Retourne {nom: nombre d'entrées archivées}.
+        cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=self.hot_days)
+        cutoff_key = cutoff.isoformat()
+        archive = self.storage.archive_store()
+        was_cached = user_id in self.profiles.cached_ids()
+        profile = self.profiles.get(user_id)
+        done = {}
+        if profile is not None:
+            archived_stats = profile.setdefault("archived_stats", profile_stats.empty_stats())
+            for field in HISTORY_FIELDS:
+                history = profile.get(field) or []
+                if isinstance(history, History):
+                    is_old = lambda i: history.datetime_at(i) < cutoff
+                else:
+                    time_field = ARCHIVED_FIELDS[field][0]
+                    is_old = lambda i: str(history[i].get(time_field, "")) < cutoff_key
+                n = self._archivable(len(history), is_old)
+                if not n:
+                    continue
+                entries = history[:n]
+                archive.append(user_id, field, entries)
+                for entry in entries:
+                    if field == "feedback_history":
+                        profile_stats.record_feedback(archived_stats, entry["feedback"], entry.get("speech_speed_sample"))
+                    else:
+                        profile_stats.record_comprehension(archived_stats, entry["score"])
+                self.storage.trim_history(user_id, profile, field, n)
+                done[field] = n
+
+        for name in LOG_NAMES:
+            log = self.storage.event_log(user_id, name)
+            if not log.exists():
+                continue
+            entries = log.read_all()
+            time_field = ARCHIVED_FIELDS[name][0]
+            n = self._archivable(len(entries), lambda i: str(entries[i].get(time_field, "")) < cutoff_key)
+            if not n:
+                continue
+            archive.append(user_id, name, entries[:n])
+            if name == "voice_trace" and profile is not None:
+                for entry in entries[:n]:
+                    profile_stats.record_voice_result(archived_stats, entry["voice_id"], entry["result"])
+            log.remove_head(n)
+            done[name] = n
+
+        if profile is not None and done:
+            self.profiles.mark_dirty(user_id, profile)
+            self.profiles.flush(user_id)
+        if not was_cached:
+            self.storage.release_user(user_id)
+        with self._lock:
+            for name, n in done.items():
+                self.archived[name] += n
+            if done:
+                self.users_compacted += 1
+        return done
+
+    def run_pass(self, user_ids: list = None, now: datetime.datetime = None) -> dict:
+        # Une passe sur user_ids (par défaut les profils en cache) ; None si une autre passe
+        # tient déjà le verrou.
+        lock_file = open(self._LOCK_PATH, "a")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+            start = time.perf_counter()
+            totals = {}
+            for user_id in (self.profiles.cached_ids() if user_ids is None else user_ids):
+                try:
+                    for name, n in self.compact_user(user_id, now).items():
+                        totals[name] = totals.get(name, 0) + n
+                except Exception as e:
+                    print(f"Erreur d'archivage pour {user_id}: {e}")
+            with self._lock:
+                self.passes += 1
+                self.last_pass_seconds = time.perf_counter() - start
+            return totals
+        finally:
+            lock_file.close()
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="retention-compactor", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            self.run_pass()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            values = {
+                "hot_days": self.hot_days,
+                "hot_max": self.hot_max,
+                "hot_min": self.hot_min,
+                "interval": self.interval,
+                "passes": self.passes,
+                "users_compacted": self.users_compacted,
+                "last_pass_seconds": self.last_pass_seconds,
+            }
+            values.update({f"archived_{name}": n for name, n in self.archived.items()})
+            return values
+
+
+_default_compactor = None
+_default_compactor_lock = threading.Lock()
+
+
+def get_retention_compactor() -> RetentionCompactor:
+    global _default_compactor
+    with _default_compactor_lock:
+        if _default_compactor is None:
+            _default_compactor = RetentionCompactor()
+        return _default_compactor
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Archivage des historiques TryAngel.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="archive les entrées hors de la fenêtre chaude")
+    run.add_argument("user_ids", nargs="*")
+    run.add_argument("--all", action="store_true", help="tous les profils du stockage")
+    summary = sub.add_parser("summary", help="résumés mensuels archivés d'un historique")
+    summary.add_argument("user_id")
+    summary.add_argument("name", choices=HISTORY_FIELDS + LOG_NAMES)
+    args = parser.parse_args(argv)
+
+    compactor = get_retention_compactor()
+    if args.command == "summary":
+        for month, rollup in sorted(compactor.storage.archive_store().summary(args.user_id, args.name).items()):
+            print(f"{month} : {rollup['count']} entrées ({rollup['first']} -> {rollup['last']})")
+        return 0
+    user_ids = compactor.profiles.user_ids() if args.all else args.user_ids
+    if not user_ids:
+        parser.error("indiquer des user_id ou --all")
+    start = time.perf_counter()
+    totals = compactor.run_pass(user_ids)
+    if totals is None:
+        print("Une autre passe d'archivage est en cours.")
+        return 1
+    detail = ", ".join(f"{name} {n}" for name, n in sorted(totals.items())) or "rien à archiver"
+    print(f"{len(user_ids)} utilisateurs traités en {time.perf_counter() - start:.2f} s : {detail}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
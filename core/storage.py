@@ -0,0 +1,701 @@
+import argparse
+import atexit
+import datetime
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from core.archive import ARCHIVED_FIELDS, FileArchive, SQLiteArchive
+from core.history import compact_profile, json_default
+from core.journal import get_journal, release_journal
+from core.memory_log import MemoryLogStore
+from core.metrics import count_bytes
+
+# Moteurs de stockage interchangeables derrière ProfileStore, INSFLocalLearner et EnhancedTryAngel :
+#   - JSONStorage : fichiers JSON/JSONL sous user_profiles/ et memory_logs/ (développement) ;
+#   - SQLiteStorage : une base SQLite en mode WAL, partageable entre workers gunicorn.
+# Choix par TRYANGEL_STORAGE=json|sqlite (chemin de la base : TRYANGEL_DB_PATH).
+
+# journal -> (table, champ horodaté, colonnes)
+EVENT_TABLES = {
+    "emotion_log": ("emotions", "timestamp", ["timestamp", "emotion"]),
+    "memories_log": ("memories", "date", ["date", "type", "event"]),
+    "voice_trace": ("voice_traces", "timestamp", ["timestamp", "emotion", "voice_id", "result"]),
+}
+# historique du profil -> (table, colonnes)
+HISTORY_TABLES = {
+    "feedback_history": ("feedback", ["timestamp", "voice_id", "feedback", "emotion", "speech_speed_sample"]),
+    "comprehension_scores": ("comprehension_scores", ["timestamp", "score"]),
+}
+CONVERSATION_COLUMNS = ["timestamp", "message", "response"]
+REAL_COLUMNS = ("score", "speech_speed_sample")
+# Champs du profil fusionnés par différence quand un autre worker a écrit le même profil entre-temps.
+ADDITIVE_FIELDS = ["trust_score", "stats", "archived_stats"]
+_MISSING = object()
+
+
+class JSONStorage:
+    _PROFILES_DIR = "user_profiles"
+
+    def __init__(self, profiles_dir: str = None, memory_dir: str = None, archive_dir: str = None):
+        self.profiles_dir = profiles_dir or self._PROFILES_DIR
+        self.memory_dir = memory_dir
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        self._conversations = None
+        self._archive = FileArchive(archive_dir)
+        self._lock = threading.Lock()
+
+    def _get_profile_path(self, user_id: str) -> str:
+        return os.path.join(self.profiles_dir, f"{user_id}_profile.json")
+
+    def load_profile(self, user_id: str) -> dict:
+        profile_path = self._get_profile_path(user_id)
+        if not os.path.exists(profile_path):
+            return None
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_profile(self, user_id: str, profile: dict):
+        # Fichier temporaire puis renommage atomique : jamais de profil à moitié écrit.
+        profile_path = self._get_profile_path(user_id)
+        tmp_path = f"{profile_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, indent=4, default=json_default)
+                f.flush()
+                os.fsync(f.fileno())
+                count_bytes("profile", f.tell())
+            os.replace(tmp_path, profile_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save_profiles(self, items: list):
+        # Écriture groupée : tous les temporaires, un seul sync, puis les renommages.
+        # Sans os.sync (Windows), on retombe sur un fsync par fichier avant renommage.
+        bulk_sync = hasattr(os, "sync")
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        written = []
+        try:
+            for user_id, profile in items:
+                profile_path = self._get_profile_path(user_id)
+                with open(profile_path + suffix, 'w', encoding='utf-8') as f:
+                    written.append(profile_path)
+                    json.dump(profile, f, indent=4, default=json_default)
+                    f.flush()
+                    if not bulk_sync:
+                        os.fsync(f.fileno())
+                    count_bytes("profile", f.tell())
+            if bulk_sync and written:
+                os.sync()
+            while written:
+                profile_path = written.pop()
+                os.replace(profile_path + suffix, profile_path)
+            if bulk_sync:
+                # Les renommages eux-mêmes : un fsync du répertoire.
+                fd = os.open(self.profiles_dir, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        finally:
+            for profile_path in written:
+                if os.path.exists(profile_path + suffix):
+                    os.remove(profile_path + suffix)
+
+    def profile_ids(self) -> list:
+        suffix = "_profile.json"
+        return sorted(f[:-len(suffix)] for f in os.listdir(self.profiles_dir) if f.endswith(suffix))
+
+    def event_log(self, user_id: str, name: str, path: str = None):
+        # L'ancien fichier .json du même nom est repris à la première ouverture.
+        if path is None:
+            path = os.path.join(self.profiles_dir, f"{user_id}_{name}.json")
+        time_field = EVENT_TABLES[name][1] if name in EVENT_TABLES else "timestamp"
+        if path.endswith(".json"):
+            return get_journal(path + "l", legacy_path=path, time_field=time_field)
+        return get_journal(path, time_field=time_field)
+
+    def release_user(self, user_id: str):
+        for name in EVENT_TABLES:
+            release_journal(os.path.join(self.profiles_dir, f"{user_id}_{name}.jsonl"))
+
+    def forget_profile(self, user_id: str):
+        pass
+
+    def conversation_log(self) -> MemoryLogStore:
+        with self._lock:
+            if self._conversations is None:
+                self._conversations = MemoryLogStore(self.memory_dir)
+                self._conversations.migrate_legacy_log()
+            return self._conversations
+
+    def archive_store(self) -> FileArchive:
+        return self._archive
+
+    def trim_history(self, user_id: str, profile: dict, field: str, n: int):
+        # Le fichier du profil est réécrit en entier à la prochaine sauvegarde.
+        del profile[field][:n]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _encode(entry: dict, columns: list) -> list:
+    extra = {k: v for k, v in entry.items() if k not in columns}
+    return [entry.get(c) for c in columns] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+
+def _row_key(values: list, columns: list) -> tuple:
+    # Ligne comparable entre une entrée encodée et la même relue en base (REAL -> float).
+    return tuple(float(v) if c in REAL_COLUMNS and v is not None else v
+                 for c, v in zip(columns + ["extra"], values))
+
+
+def _decode(row, columns: list) -> dict:
+    entry = dict(zip(columns, row))
+    if row[len(columns)]:
+        entry.update(json.loads(row[len(columns)]))
+    return entry
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _merge_value(base, mine, theirs, additive: bool):
+    # Fusion à trois : base = version lue ou écrite en dernier par ce worker.
+    if mine == base:
+        return theirs
+    if theirs == base:
+        return mine
+    if isinstance(mine, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = {}
+        for key in list(mine) + [k for k in theirs if k not in mine]:
+            value = _merge_value(base.get(key, _MISSING), mine.get(key, _MISSING), theirs.get(key, _MISSING), additive)
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    if additive and _is_number(mine) and _is_number(theirs):
+        # Compteurs : les incréments des deux workers s'ajoutent.
+        return theirs + mine - (base if _is_number(base) else 0)
+    return mine
+
+
+def merge_profile_data(base: dict, mine: dict, theirs: dict) -> dict:
+    # Champs non additifs : la valeur de ce worker s'il l'a modifiée, sinon celle déjà en base.
+    merged = _merge_value(base, mine, theirs, False)
+    for field in ADDITIVE_FIELDS:
+        value = _merge_value(base.get(field, _MISSING), mine.get(field, _MISSING), theirs.get(field, _MISSING), True)
+        if value is not _MISSING:
+            merged[field] = value
+    if _is_number(merged.get("trust_score")):
+        merged["trust_score"] = max(0, min(100, merged["trust_score"]))
+    stats = merged.get("stats")
+    if isinstance(stats, dict) and stats.get("speed_samples"):
+        merged["speech_speed_avg"] = stats["speed_sum"] / stats["speed_samples"]
+    return merged
+
+
+class SQLiteStorage:
+    # Ajouts aux journaux mis en file et écrits par lots, dans une seule transaction, dès que
+    # _BATCH_SIZE écritures sont en attente, au plus tard _BATCH_INTERVAL secondes après la
+    # première (minuterie), et avant toute lecture.
+    # Les historiques du profil (feedback, compréhension) vivent dans leurs propres tables :
+    # une sauvegarde n'insère que les entrées nouvelles depuis le dernier chargement ou la dernière sauvegarde.
+    # Chaque profil porte un numéro de version : si un autre worker l'a réécrit depuis notre
+    # dernière lecture, la sauvegarde relit la ligne dans la même transaction (BEGIN IMMEDIATE)
+    # et fusionne au lieu d'écraser (merge_profile_data).
+    _DB_PATH = "tryangel.db"
+    _BATCH_SIZE = int(os.environ.get("TRYANGEL_DB_BATCH_SIZE", "64"))
+    _BATCH_INTERVAL = float(os.environ.get("TRYANGEL_DB_BATCH_INTERVAL", "0.5"))
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or self._DB_PATH
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._lock = threading.RLock()
+        self._pending = []
+        self._flush_timer = None
+        # user_id -> (version, données lues ou écrites en dernier, {champ d'historique: (History, nombre d'entrées en base)})
+        self._persisted = {}
+        self._conversations = SQLiteConversationLog(self)
+        self._create_schema()
+        self._archive = SQLiteArchive(self)
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            statements = [
+                "CREATE TABLE IF NOT EXISTS profiles (user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at TEXT, "
+                "version INTEGER NOT NULL DEFAULT 0)",
+                "CREATE TABLE IF NOT EXISTS conversations (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+                "seq INTEGER NOT NULL, timestamp TEXT, message TEXT, response TEXT, extra TEXT, UNIQUE (user_id, seq))",
+            ]
+            for table, time_field, columns in EVENT_TABLES.values():
+                statements.append(self._table_ddl(table, columns))
+                statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_id)")
+                statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_time ON {table} (user_id, {time_field})")
+            for table, columns in HISTORY_TABLES.values():
+                statements.append(self._table_ddl(table, columns))
+                statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_id)")
+                statements.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_time ON {table} (user_id, timestamp)")
+            self._conn.execute("BEGIN")
+            for statement in statements:
+                self._conn.execute(statement)
+            if "version" not in [row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")]:
+                # Base créée avant le versionnage des profils.
+                self._conn.execute("ALTER TABLE profiles ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _table_ddl(table: str, columns: list) -> str:
+        cols = ", ".join(f"{c} {'REAL' if c in REAL_COLUMNS else 'TEXT'}" for c in columns)
+        return f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, {cols}, extra TEXT)"
+
+    def transaction(self, operations: list, then=None):
+        # operations : liste de (sql, paramètres, many) ; many=True passe par executemany.
+        # then() est appelé dans la transaction et retourne d'autres opérations à exécuter.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._execute(operations)
+                if then is not None:
+                    self._execute(then())
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _execute(self, operations: list):
+        for sql, params, many in operations:
+            if many:
+                self._conn.executemany(sql, params)
+            else:
+                self._conn.execute(sql, params)
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            self._flush_pending()
+            return self._conn.execute(sql, params).fetchall()
+
+    def enqueue(self, sql: str, params: list):
+        with self._lock:
+            self._pending.append((sql, params, False))
+            if len(self._pending) >= self._BATCH_SIZE:
+                self._flush_pending()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self._BATCH_INTERVAL, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._flush_timer = None
+            try:
+                self._flush_pending()
+            except Exception as e:
+                print(f"Erreur lors de l'écriture des journaux en attente : {e}")
+
+    def _flush_pending(self):
+        if self._pending:
+            operations, self._pending = self._pending, []
+            try:
+                self.transaction(operations)
+            except Exception:
+                # Gardés pour la prochaine tentative.
+                self._pending = operations + self._pending
+                raise
+
+    def flush(self):
+        with self._lock:
+            self._flush_pending()
+
+    # --- profils ---
+
+    def load_profile(self, user_id: str) -> dict:
+        with self._lock:
+            rows = self.query("SELECT data, version FROM profiles WHERE user_id = ?", (user_id,))
+            if not rows:
+                return None
+            data, version = rows[0]
+            profile = json.loads(data)
+            for field, (table, columns) in HISTORY_TABLES.items():
+                profile[field] = [
+                    _decode(row, columns)
+                    for row in self.query(f"SELECT {', '.join(columns)}, extra FROM {table} WHERE user_id = ? ORDER BY id", (user_id,))
+                ]
+            # Historiques repérés par identité : ProfileStore sauvegarde des copies du profil
+            # qui partagent les mêmes objets History.
+            compact_profile(profile)
+            self._mark_persisted(user_id, profile, version, json.loads(data))
+            return profile
+
+    def _mark_persisted(self, user_id: str, profile: dict, version: int, data: dict, counts: dict = None):
+        # counts : entrées effectivement écrites par champ (d'autres ont pu s'ajouter depuis).
+        self._persisted[user_id] = (version, data, {
+            field: (profile.get(field), len(profile.get(field) or []) if counts is None else counts[field])
+            for field in HISTORY_TABLES
+        })
+
+    def _persisted_count(self, user_id: str, profile: dict, field: str) -> int:
+        known = self._persisted.get(user_id)
+        if known is not None and known[2][field][0] is profile.get(field):
+            return known[2][field][1]
+        # Profil inconnu (nouveau, ou copie évincée du cache) : on se repère au dernier horodatage en base.
+        table = HISTORY_TABLES[field][0]
+        last = self._conn.execute(f"SELECT MAX(timestamp) FROM {table} WHERE user_id = ?", (user_id,)).fetchone()[0]
+        history = profile.get(field, [])
+        if last is None:
+            return 0
+        count = len(history)
+        while count and str(history[count - 1].get("timestamp", "")) > last:
+            count -= 1
+        return count
+
+    def _profile_operations(self, user_id: str, profile: dict, data: dict, version: int, counts: dict = None) -> list:
+        # data : champs du profil hors historiques, tels qu'ils doivent être écrits ;
+        # counts reçoit le nombre d'entrées de chaque historique couvert par ces opérations.
+        operations = [(
+            "INSERT INTO profiles (user_id, data, updated_at, version) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at, "
+            "version = excluded.version",
+            (user_id, json.dumps(data, ensure_ascii=False), datetime.datetime.now().isoformat(), version),
+            False,
+        )]
+        for field, (table, columns) in HISTORY_TABLES.items():
+            history = profile.get(field, [])
+            end = len(history)
+            new_entries = history[self._persisted_count(user_id, profile, field):end]
+            if counts is not None:
+                counts[field] = end
+            if new_entries:
+                placeholders = ", ".join("?" * (len(columns) + 2))
+                operations.append((
+                    f"INSERT INTO {table} (user_id, {', '.join(columns)}, extra) VALUES ({placeholders})",
+                    [[user_id] + _encode(entry, columns) for entry in new_entries],
+                    True,
+                ))
+        return operations
+
+    def save_profile(self, user_id: str, profile: dict):
+        self.save_profiles([(user_id, profile)])
+
+    def _save_operations(self, items: list, saved: list) -> list:
+        # Appelé dans la transaction : la version en base ne peut plus changer avant le COMMIT.
+        operations = []
+        for user_id, profile in items:
+            data = json.loads(json.dumps({k: v for k, v in profile.items() if k not in HISTORY_TABLES},
+                                         ensure_ascii=False))
+            row = self._conn.execute("SELECT data, version FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+            known = self._persisted.get(user_id)
+            stored, version = data, 1
+            if row is not None:
+                version = row[1] + 1
+                if known is not None and known[0] != row[1]:
+                    stored = merge_profile_data(known[1], data, json.loads(row[0]))
+            counts = {}
+            operations.extend(self._profile_operations(user_id, profile, stored, version, counts))
+            # Après une fusion, la base diffère de notre vue : la prochaine sauvegarde fusionne aussi.
+            saved.append((user_id, profile, version if stored is data else None, data, counts))
+        return operations
+
+    def save_profiles(self, items: list):
+        with self._lock:
+            # Les ajouts en attente partent dans la même transaction que les profils.
+            operations, self._pending = self._pending, []
+            saved = []
+            self.transaction(operations, lambda: self._save_operations(items, saved))
+            for user_id, profile, version, data, counts in saved:
+                # La base de la prochaine fusion est ce que ce worker a voulu écrire : ses
+                # modifications suivantes s'ajoutent à celles des autres workers déjà en base.
+                self._mark_persisted(user_id, profile, version, data, counts)
+
+    def profile_ids(self) -> list:
+        return [row[0] for row in self.query("SELECT user_id FROM profiles ORDER BY user_id")]
+
+    def trim_history(self, user_id: str, profile: dict, field: str, n: int):
+        # Retire les n plus anciennes entrées d'un historique, en mémoire et en base. Seules les
+        # lignes identiques à ces entrées sont supprimées : un autre worker a pu insérer les
+        # siennes entre-temps, et elles ne sont pas archivées.
+        table, columns = HISTORY_TABLES[field]
+        with self._lock:
+            if self._persisted_count(user_id, profile, field) < n:
+                self.save_profiles([(user_id, profile)])
+            history = profile[field]
+            entries = history[:n]
+            if entries:
+                wanted = {}
+                for entry in entries:
+                    key = _row_key(_encode(entry, columns), columns)
+                    wanted[key] = wanted.get(key, 0) + 1
+                last = max(str(entry.get("timestamp", "")) for entry in entries)
+                ids = []
+                rows = self.query(f"SELECT id, {', '.join(columns)}, extra FROM {table} "
+                                  "WHERE user_id = ? AND timestamp <= ? ORDER BY id", (user_id, last))
+                for row in rows:
+                    key = _row_key(list(row[1:]), columns)
+                    if wanted.get(key):
+                        wanted[key] -= 1
+                        ids.append((row[0],))
+                self.transaction([(f"DELETE FROM {table} WHERE id = ?", ids, True)])
+            del history[:n]
+            known = self._persisted.get(user_id)
+            if known is not None and known[2][field][0] is history:
+                known[2][field] = (history, known[2][field][1] - n)
+
+    # --- journaux et conversations ---
+
+    def event_log(self, user_id: str, name: str, path: str = None):
+        if path is not None:
+            # Un chemin explicite désigne toujours un fichier, comme avec JSONStorage.
+            time_field = EVENT_TABLES[name][1] if name in EVENT_TABLES else "timestamp"
+            if path.endswith(".json"):
+                return get_journal(path + "l", legacy_path=path, time_field=time_field)
+            return get_journal(path, time_field=time_field)
+        return SQLiteEventLog(self, name, user_id)
+
+    def release_user(self, user_id: str):
+        self.flush()
+
+    def forget_profile(self, user_id: str):
+        # Le profil a quitté le cache : inutile de garder une référence vers lui.
+        with self._lock:
+            self._persisted.pop(user_id, None)
+
+    def conversation_log(self):
+        return self._conversations
+
+    def archive_store(self) -> SQLiteArchive:
+        return self._archive
+
+    def close(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._flush_pending()
+            self._conn.close()
+
+
+class SQLiteEventLog:
+    # Même interface que Journal pour emotion_log, memories_log et voice_trace.
+    needs_compaction = False
+
+    def __init__(self, storage: SQLiteStorage, name: str, user_id: str):
+        self.storage = storage
+        self.user_id = user_id
+        self.table, self.time_field, self.columns = EVENT_TABLES[name]
+        self._select = f"SELECT {', '.join(self.columns)}, extra FROM {self.table} WHERE user_id = ?"
+
+    def exists(self) -> bool:
+        return bool(self.storage.query(f"SELECT 1 FROM {self.table} WHERE user_id = ? LIMIT 1", (self.user_id,)))
+
+    def append(self, entry: dict):
+        placeholders = ", ".join("?" * (len(self.columns) + 2))
+        self.storage.enqueue(
+            f"INSERT INTO {self.table} (user_id, {', '.join(self.columns)}, extra) VALUES ({placeholders})",
+            [self.user_id] + _encode(entry, self.columns),
+        )
+
+    def read_all(self) -> list:
+        return [_decode(row, self.columns) for row in self.storage.query(self._select + " ORDER BY id", (self.user_id,))]
+
+    def tail(self, n: int) -> list:
+        if n <= 0:
+            return []
+        rows = self.storage.query(self._select + " ORDER BY id DESC LIMIT ?", (self.user_id, n))
+        return [_decode(row, self.columns) for row in reversed(rows)]
+
+    def range(self, since=None, until=None, limit: int = None) -> list:
+        sql, params = self._select, [self.user_id]
+        if since is not None:
+            sql += f" AND {self.time_field} >= ?"
+            params.append(since.isoformat() if hasattr(since, "isoformat") else since)
+        if until is not None:
+            sql += f" AND {self.time_field} < ?"
+            params.append(until.isoformat() if hasattr(until, "isoformat") else until)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [_decode(row, self.columns) for row in self.storage.query(sql, tuple(params))]
+
+    def flush(self):
+        self.storage.flush()
+
+    def remove_head(self, n: int) -> int:
+        if n <= 0:
+            return 0
+        with self.storage._lock:
+            self.storage.flush()
+            self.storage.transaction([(
+                f"DELETE FROM {self.table} WHERE id IN (SELECT id FROM {self.table} WHERE user_id = ? ORDER BY id LIMIT ?)",
+                (self.user_id, n), False,
+            )])
+            return self.storage._conn.execute("SELECT changes()").fetchone()[0]
+
+    def compact(self):
+        pass
+
+    def maybe_compact(self):
+        pass
+
+    def close(self):
+        self.storage.flush()
+
+
+class SQLiteConversationLog:
+    # Même interface que MemoryLogStore ; seq est le rang de l'entrée pour l'utilisateur.
+    def __init__(self, storage: SQLiteStorage):
+        self.storage = storage
+
+    def append(self, user_id: str, entry: dict) -> int:
+        return self.append_many(user_id, [entry])
+
+    def append_many(self, user_id: str, entries: list) -> int:
+        storage = self.storage
+        with storage._lock:
+            storage._flush_pending()
+            storage._conn.execute("BEGIN IMMEDIATE")
+            try:
+                first_seq = self._count(user_id)
+                storage._conn.executemany(
+                    "INSERT INTO conversations (user_id, seq, timestamp, message, response, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                    [[user_id, first_seq + i] + _encode(entry, CONVERSATION_COLUMNS) for i, entry in enumerate(entries)],
+                )
+                storage._conn.execute("COMMIT")
+            except Exception:
+                storage._conn.execute("ROLLBACK")
+                raise
+        return first_seq
+
+    def _count(self, user_id: str) -> int:
+        row = self.storage._conn.execute("SELECT MAX(seq) FROM conversations WHERE user_id = ?", (user_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def count(self, user_id: str) -> int:
+        with self.storage._lock:
+            return self._count(user_id)
+
+    def read(self, user_id: str, start: int = 0, stop: int = None) -> list:
+        start, stop, _ = slice(start, stop).indices(self.count(user_id))
+        rows = self.storage.query(
+            "SELECT timestamp, message, response, extra FROM conversations WHERE user_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+            (user_id, start, stop),
+        )
+        return [_decode(row, CONVERSATION_COLUMNS) for row in rows]
+
+
+def import_json_layout(storage: SQLiteStorage, source: JSONStorage) -> dict:
+    # Importe profils, journaux, conversations et archives de la disposition JSON. Ré-exécutable :
+    # les données existantes d'un utilisateur importé sont remplacées.
+    counts = {"profiles": 0, "events": 0, "conversations": 0, "archived": 0}
+    archive = source.archive_store()
+    user_ids = set(source.profile_ids()) | set(archive.user_ids())
+    for name in EVENT_TABLES:
+        for path in glob.glob(os.path.join(source.profiles_dir, f"*_{name}.json*")):
+            base = os.path.basename(path)
+            if base.endswith((".json", ".jsonl")):
+                user_ids.add(base[:base.rindex(f"_{name}.json")])
+    conversations = source.conversation_log()
+    if os.path.isdir(conversations.base_dir):
+        user_ids.update(d for d in os.listdir(conversations.base_dir) if os.path.isdir(os.path.join(conversations.base_dir, d)))
+
+    for user_id in sorted(user_ids):
+        operations = [(f"DELETE FROM {table} WHERE user_id = ?", (user_id,), False)
+                      for table in ["profiles", "conversations", "archives"] + [t[0] for t in EVENT_TABLES.values()] + [t[0] for t in HISTORY_TABLES.values()]]
+        profile = source.load_profile(user_id)
+        if profile is not None:
+            # Les anciennes lignes sont supprimées dans la même transaction : tout l'historique est à insérer.
+            storage._persisted[user_id] = (0, None, {field: (profile.get(field), 0) for field in HISTORY_TABLES})
+            data = {k: v for k, v in profile.items() if k not in HISTORY_TABLES}
+            operations.extend(storage._profile_operations(user_id, profile, data, 1))
+            counts["profiles"] += 1
+        for name, (table, _, columns) in EVENT_TABLES.items():
+            journal = source.event_log(user_id, name)
+            entries = journal.read_all() if journal.exists() else []
+            if entries:
+                placeholders = ", ".join("?" * (len(columns) + 2))
+                operations.append((
+                    f"INSERT INTO {table} (user_id, {', '.join(columns)}, extra) VALUES ({placeholders})",
+                    [[user_id] + _encode(entry, columns) for entry in entries],
+                    True,
+                ))
+                counts["events"] += len(entries)
+        exchanges = conversations.read(user_id)
+        if exchanges:
+            operations.append((
+                "INSERT INTO conversations (user_id, seq, timestamp, message, response, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                [[user_id, seq] + _encode(entry, CONVERSATION_COLUMNS) for seq, entry in enumerate(exchanges)],
+                True,
+            ))
+            counts["conversations"] += len(exchanges)
+        for name in ARCHIVED_FIELDS:
+            # Segments mensuels recompressés tels quels (un seul membre gzip), résumés repris.
+            for month, rollup in archive.summary(user_id, name).items():
+                data = archive.read_segment(user_id, name, month)
+                operations.append((
+                    "INSERT INTO archives (user_id, name, month, entries, data, summary) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, name, month, rollup["count"], gzip.compress(data), json.dumps(rollup, ensure_ascii=False)),
+                    False,
+                ))
+                counts["archived"] += rollup["count"]
+        storage.transaction(operations)
+        storage.forget_profile(user_id)
+    return counts
+
+
+_default_storage = None
+_default_storage_lock = threading.Lock()
+
+
+def create_storage(kind: str = None):
+    kind = kind or os.environ.get("TRYANGEL_STORAGE", "json")
+    if kind == "sqlite":
+        return SQLiteStorage(os.environ.get("TRYANGEL_DB_PATH"))
+    if kind == "json":
+        return JSONStorage()
+    raise ValueError(f"Moteur de stockage inconnu : {kind}")
+
+
+def get_storage():
+    global _default_storage
+    with _default_storage_lock:
+        if _default_storage is None:
+            _default_storage = create_storage()
+            atexit.register(_default_storage.flush)
+        return _default_storage
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Outils de stockage TryAngel.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import-json", help="importe user_profiles/ et memory_logs/ dans SQLite")
+    imp.add_argument("--db", default=SQLiteStorage._DB_PATH)
+    imp.add_argument("--profiles-dir", default=JSONStorage._PROFILES_DIR)
+    imp.add_argument("--archive-dir", default=FileArchive._ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    storage = SQLiteStorage(args.db)
+    start = time.perf_counter()
+    counts = import_json_layout(storage, JSONStorage(args.profiles_dir, archive_dir=args.archive_dir))
+    storage.close()
+    print(f"Import terminé en {time.perf_counter() - start:.2f} s : {counts['profiles']} profils, "
+          f"{counts['events']} événements, {counts['conversations']} échanges, "
+          f"{counts['archived']} entrées archivées -> {args.db}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
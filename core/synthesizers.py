@@ -0,0 +1,41 @@
+import importlib
+import os
+import time
+
+# Trame MPEG-1 Layer III (128 kbit/s, 44,1 kHz) vide : ~26 ms de silence par trame.
+_SILENT_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+def synthesize_gtts(text: str, lang: str, voice: str, path: str):
+    from gtts import gTTS
+    # gTTS n'a qu'une voix par langue : `voice` ne sert qu'à distinguer les entrées du cache.
+    gTTS(text=text, lang=lang).save(path)
+
+
+def synthesize_stub(text: str, lang: str, voice: str, path: str):
+    # Synthétiseur hors ligne pour les tests et les benchmarks : un mp3 silencieux
+    # dont la durée suit la longueur du texte, avec un délai simulé optionnel
+    # (fixe, plus une part proportionnelle au nombre de caractères).
+    delay = float(os.environ.get("TRYANGEL_STUB_TTS_DELAY", "0"))
+    delay += float(os.environ.get("TRYANGEL_STUB_TTS_CHAR_DELAY", "0")) * len(text)
+    if delay:
+        time.sleep(delay)
+    with open(path, "wb") as f:
+        f.write(_SILENT_FRAME * max(1, len(text) // 4))
+
+
+SYNTHESIZERS = {
+    "gtts": synthesize_gtts,
+    "stub": synthesize_stub,
+}
+
+
+def get_synthesizer(name: str = None):
+    # TRYANGEL_TTS_ENGINE accepte un nom connu ("gtts", "stub") ou "module:fonction".
+    name = name or os.environ.get("TRYANGEL_TTS_ENGINE", "gtts")
+    if name in SYNTHESIZERS:
+        return SYNTHESIZERS[name]
+    module_name, _, func_name = name.partition(":")
+    if not func_name:
+        raise ValueError(f"Synthétiseur inconnu : {name}")
+    return getattr(importlib.import_module(module_name), func_name)
@@ -0,0 +1,23 @@
+import re
+import unicodedata
+
+# Mots vides français, sans accents (comparés aux textes après fold_accents).
+STOP_WORDS = [
+    "a", "au", "aux", "avec", "ce", "ces", "cet", "cette", "dans", "de", "des", "du", "elle", "en", "est",
+    "et", "etre", "il", "ils", "je", "j", "la", "le", "les", "leur", "lui", "ma", "mais", "me", "mes",
+    "moi", "mon", "ne", "nous", "on", "ou", "par", "pas", "pour", "qu", "que", "qui", "sa", "se", "ses",
+    "son", "sur", "ta", "te", "tes", "toi", "ton", "tu", "un", "une", "vos", "votre", "vous", "y",
+]
+_STOP_SET = frozenset(STOP_WORDS)
+_TOKEN_RE = re.compile(r"\w\w+")
+
+
+def fold_accents(text: str) -> str:
+    # "Sécurité" -> "securite" : décomposition NFD puis suppression des diacritiques.
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list:
+    # Mots d'au moins deux caractères, sans accents ni mots vides, dans l'ordre du texte.
+    return [token for token in _TOKEN_RE.findall(fold_accents(text)) if token not in _STOP_SET]
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from core.metrics import count_bytes, stage
+from core.synthesizers import get_synthesizer
+
+
+class TTSCache:
+    # Cache adressé par contenu : voices/tts_<sha256(texte, langue, voix)>.mp3.
+    # L'ordre LRU est porté par la date de modification du fichier, rafraîchie à chaque accès,
+    # pour survivre aux redémarrages. Le répertoire est partagé entre workers : l'occupation
+    # est relue sur le disque toutes les _RESCAN_INTERVAL secondes (fichiers écrits ou
+    # supprimés par les autres), et le budget _MAX_BYTES vaut pour le répertoire entier.
+    _VOICE_DIR = "voices"
+    _PREFIX = "tts_"
+    _SUFFIX = ".mp3"
+    _MAX_BYTES = int(os.environ.get("TRYANGEL_TTS_CACHE_MB", "200")) * 1024 * 1024
+    _MAX_AGE = int(os.environ.get("TRYANGEL_TTS_CACHE_DAYS", "30")) * 86400
+    _RESCAN_INTERVAL = float(os.environ.get("TRYANGEL_TTS_CACHE_RESCAN", "60"))
+
+    def __init__(self, voice_dir: str = None, max_bytes: int = None, max_age: int = None, synthesizer=None):
+        self.voice_dir = voice_dir or self._VOICE_DIR
+        self.max_bytes = self._MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age = self._MAX_AGE if max_age is None else max_age
+        self.synthesizer = synthesizer or get_synthesizer()
+        os.makedirs(self.voice_dir, exist_ok=True)
+        self._entries = OrderedDict()  # clé -> (taille, dernier accès)
+        self._total_bytes = 0
+        self._inflight = {}
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+
+    @staticmethod
+    def cache_key(text: str, lang: str = "fr", voice: str = None) -> str:
+        payload = json.dumps([text, lang, voice], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def filename(self, key: str) -> str:
+        return f"{self._PREFIX}{key}{self._SUFFIX}"
+
+    def key_from_filename(self, filename: str) -> str:
+        if filename.startswith(self._PREFIX) and filename.endswith(self._SUFFIX):
+            return filename[len(self._PREFIX):-len(self._SUFFIX)]
+        return None
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.voice_dir, self.filename(key))
+
+    def _list_files(self) -> list:
+        found = []
+        for filename in os.listdir(self.voice_dir):
+            key = self.key_from_filename(filename)
+            if key is None:
+                continue
+            try:
+                st = os.stat(os.path.join(self.voice_dir, filename))
+            except OSError:
+                continue
+            found.append((st.st_mtime, key, st.st_size))
+        return sorted(found)
+
+    def _scan(self, keep: str = None):
+        # Lecture du répertoire hors verrou, puis remplacement de la vue en mémoire.
+        found = self._list_files()
+        with self._lock:
+            entries = OrderedDict()
+            for mtime, key, size in found:
+                known = self._entries.get(key)
+                entries[key] = (size, max(mtime, known[1]) if known is not None else mtime)
+            if keep is not None and keep in entries:
+                entries.move_to_end(keep)
+            self._entries = entries
+            self._total_bytes = sum(size for size, _ in entries.values())
+            self._scanned_at = time.monotonic()
+            self._evict(keep)
+
+    def _evict(self, keep: str = None):
+        # keep : le fichier qui va être renvoyé, jamais supprimé (même plus gros que le budget).
+        now = time.time()
+        while self._entries:
+            key, (size, last_access) = next(iter(self._entries.items()))
+            if key == keep or (self._total_bytes <= self.max_bytes and now - last_access <= self.max_age):
+                break
+            del self._entries[key]
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def lookup(self, text: str, lang: str = "fr", voice: str = None) -> str:
+        key = self.cache_key(text, lang, voice)
+        path = self.path(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Peut-être synthétisé par un autre worker depuis le dernier parcours.
+                try:
+                    entry = (os.path.getsize(path), 0.0)
+                except OSError:
+                    return None
+                self._total_bytes += entry[0]
+            elif not os.path.exists(path):
+                del self._entries[key]
+                self._total_bytes -= entry[0]
+                return None
+            now = time.time()
+            self._entries[key] = (entry[0], now)
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        return path
+
+    def get_or_create(self, text: str, lang: str = "fr", voice: str = None) -> str:
+        path = self.lookup(text, lang, voice)
+        if path is not None:
+            return path
+        key = self.cache_key(text, lang, voice)
+        path = self.path(key)
+        with self._lock:
+            # Une seule synthèse par clé : les demandes concurrentes attendent la première.
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = threading.Event()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+        if not owner:
+            pending.wait()
+            if os.path.exists(path):
+                return path
+            raise RuntimeError(f"Synthèse vocale échouée pour la clé {key}")
+        try:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with stage("tts_synthesis"):
+                    self.synthesizer(text, lang, voice, tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            size = os.path.getsize(path)
+            count_bytes("tts", size)
+            with self._lock:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self._total_bytes -= previous[0]
+                self._entries[key] = (size, time.time())
+                self._total_bytes += size
+                rescan = time.monotonic() - self._scanned_at >= self._RESCAN_INTERVAL
+                if not rescan:
+                    self._evict(key)
+            if rescan:
+                self._scan(keep=key)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            pending.set()
+        return path
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_age": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TTSCache()
+        return _default_cache
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from core.tts_cache import TTSCache, get_tts_cache
+
+
+class QueueFull(Exception):
+    pass
+
+
+class TTSJobQueue:
+    # Synthèse vocale en arrière-plan : /speak rend la main tout de suite et le client
+    # interroge /voices/status/<job_id>. Au-delà de _MAX_PENDING synthèses en attente,
+    # submit() lève QueueFull plutôt que d'empiler sans limite (après au plus `wait`
+    # secondes d'attente d'une place, pour les lots). Le flux par phrases (core.tts_stream)
+    # prend ses places dans la même limite via reserve()/release().
+    _MAX_WORKERS = int(os.environ.get("TRYANGEL_TTS_WORKERS", "4"))
+    _MAX_PENDING = int(os.environ.get("TRYANGEL_TTS_QUEUE", "64"))
+    _JOB_TTL = 600
+
+    def __init__(self, cache: TTSCache = None, max_workers: int = None, max_pending: int = None):
+        self.cache = cache or get_tts_cache()
+        self.max_pending = max_pending or self._MAX_PENDING
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or self._MAX_WORKERS, thread_name_prefix="tts")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _new_job(self, text: str, lang: str, voice: str) -> dict:
+        key = self.cache.cache_key(text, lang, voice)
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "pending",
+            "filename": self.cache.filename(key),
+            "error": None,
+            "created": time.time(),
+            "finished": None,
+            "done": threading.Event(),
+        }
+        with self._lock:
+            self._purge()
+            self._jobs[job["job_id"]] = job
+        return job
+
+    def _purge(self):
+        limit = time.time() - self._JOB_TTL
+        expired = [job_id for job_id, job in self._jobs.items() if job["finished"] and job["finished"] < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _finish(self, job: dict, status: str, error: str = None):
+        job["status"] = status
+        job["error"] = error
+        job["finished"] = time.time()
+        job["done"].set()
+
+    def submit(self, text: str, lang: str = "fr", voice: str = None, wait: float = 0) -> dict:
+        if self.cache.lookup(text, lang, voice) is not None:
+            job = self._new_job(text, lang, voice)
+            self._finish(job, "done")
+            return self._public(job)
+        self.reserve(wait=wait)
+        job = self._new_job(text, lang, voice)
+        try:
+            self._executor.submit(self._run, job, text, lang, voice)
+        except Exception:
+            self.release()
+            raise
+        return self._public(job)
+
+    def reserve(self, count: int = 1, wait: float = 0):
+        # Prend count places d'un coup (tout ou rien) ; QueueFull si elles ne sont pas libres à temps.
+        deadline = time.monotonic() + wait
+        taken = 0
+        while taken < count:
+            remaining = deadline - time.monotonic()
+            if not (self._slots.acquire(timeout=remaining) if remaining > 0 else self._slots.acquire(blocking=False)):
+                self.release(taken)
+                with self._lock:
+                    self.rejected += 1
+                raise QueueFull(f"File de synthèse pleine ({self.max_pending} en attente).")
+            taken += 1
+
+    def release(self, count: int = 1):
+        for _ in range(count):
+            self._slots.release()
+
+    def _run(self, job: dict, text: str, lang: str, voice: str):
+        try:
+            job["status"] = "running"
+            self.cache.get_or_create(text, lang, voice)
+            self._finish(job, "done")
+        except Exception as e:
+            print(f"[Erreur synthèse] {e}")
+            self._finish(job, "failed", str(e))
+        finally:
+            self.release()
+
+    def status(self, job_id: str, wait: float = 0) -> dict:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if wait > 0:
+            job["done"].wait(wait)
+        return self._public(job)
+
+    def _public(self, job: dict) -> dict:
+        return {k: v for k, v in job.items() if k != "done"}
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if not job["finished"])
+            return {"jobs": len(self._jobs), "pending": pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_tts_queue() -> TTSJobQueue:
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = TTSJobQueue()
+        return _default_queue
@@ -0,0 +1,127 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.metrics import stage
+from core.tts_cache import TTSCache, get_tts_cache
+from core.tts_jobs import TTSJobQueue, get_tts_queue
+
+# Synthèse par phrases : la réponse est découpée, chaque morceau est synthétisé en
+# parallèle et mis en cache séparément (une phrase fréquente n'est synthétisée qu'une
+# fois), puis les morceaux sont rendus dans l'ordre dès que le premier est prêt.
+# Des trames mp3 mises bout à bout restent un mp3 lisible : le flux se joue tel quel.
+# Chaque morceau à synthétiser occupe une place de la file TTSJobQueue : flux et
+# synthèses en arrière-plan partagent la même limite (QueueFull si elle est atteinte).
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+_MIN_CHARS = int(os.environ.get("TRYANGEL_TTS_CHUNK_MIN_CHARS", "12"))
+_MAX_CHARS = int(os.environ.get("TRYANGEL_TTS_CHUNK_MAX_CHARS", "200"))
+
+
+def _split_long(sentence: str, max_chars: int) -> list:
+    # Coupe une phrase trop longue à la dernière virgule, sinon au dernier espace.
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(", ", 0, max_chars)
+        cut = cut + 1 if cut > 0 else sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_sentences(text: str, min_chars: int = None, max_chars: int = None) -> list:
+    # "Oui. Je t'écoute. Raconte-moi ta journée." -> ["Oui. Je t'écoute.", "Raconte-moi ta journée."]
+    # avec min_chars=12 : les phrases trop courtes sont collées à la suivante (une synthèse de moins).
+    min_chars = _MIN_CHARS if min_chars is None else min_chars
+    max_chars = _MAX_CHARS if max_chars is None else max_chars
+    chunks = []
+    pending = ""
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        if not sentence:
+            continue
+        pending = f"{pending} {sentence}" if pending else sentence
+        if len(pending) >= min_chars:
+            chunks.extend(_split_long(pending, max_chars))
+            pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) < max_chars:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+class TTSStreamer:
+    _MAX_WORKERS = int(os.environ.get("TRYANGEL_TTS_STREAM_WORKERS", "4"))
+    _READ_SIZE = 64 * 1024
+
+    def __init__(self, cache: TTSCache = None, max_workers: int = None, queue: TTSJobQueue = None):
+        self.cache = cache or get_tts_cache()
+        self.queue = queue or get_tts_queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or self._MAX_WORKERS,
+                                            thread_name_prefix="tts-stream")
+
+    def chunks(self, text: str, lang: str = "fr", voice: str = None):
+        # (morceau, chemin du mp3) dans l'ordre. Les morceaux déjà en cache ne passent pas
+        # par le pool ; si l'appelant abandonne le générateur, les synthèses pas encore
+        # commencées sont annulées. Les places de la file sont prises avant toute synthèse.
+        pending = [(chunk, self.cache.lookup(chunk, lang, voice)) for chunk in split_sentences(text)]
+        missing = sum(1 for _, path in pending if path is None)
+        self.queue.reserve(missing)
+        try:
+            for index, (chunk, path) in enumerate(pending):
+                if path is None:
+                    future = self._executor.submit(self.cache.get_or_create, chunk, lang, voice)
+                    future.add_done_callback(lambda _: self.queue.release())
+                    pending[index] = (chunk, future)
+                    missing -= 1
+        finally:
+            self.queue.release(missing)
+        try:
+            for index, (chunk, future) in enumerate(pending):
+                if isinstance(future, str):
+                    yield chunk, future
+                elif index == 0:
+                    with stage("tts_first_chunk"):
+                        path = future.result()
+                    yield chunk, path
+                else:
+                    yield chunk, future.result()
+        finally:
+            for _, future in pending:
+                if not isinstance(future, str):
+                    future.cancel()
+
+    def audio(self, text: str, lang: str = "fr", voice: str = None):
+        # Octets du mp3 complet, morceau après morceau (corps d'une réponse HTTP en flux).
+        for chunk, path in self.chunks(text, lang, voice):
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                # Évincé du cache entre la synthèse et la lecture : resynthétisé.
+                f = open(self.cache.get_or_create(chunk, lang, voice), "rb")
+            with f:
+                while True:
+                    data = f.read(self._READ_SIZE)
+                    if not data:
+                        break
+                    yield data
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+_default_streamer = None
+_default_streamer_lock = threading.Lock()
+
+
+def get_tts_streamer() -> TTSStreamer:
+    global _default_streamer
+    with _default_streamer_lock:
+        if _default_streamer is None:
+            _default_streamer = TTSStreamer()
+        return _default_streamer
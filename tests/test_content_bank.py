@@ -0,0 +1,17 @@
+import json
+import os
+
+from core.content_bank import ContentBank
+
+
+def test_malformed_reload_keeps_previous_content(tmp_path):
+    path = tmp_path / "reassurance_bank.json"
+    path.write_text(json.dumps({"stress": ["Respire doucement."]}), encoding="utf-8")
+    bank = ContentBank(str(path))
+    path.write_text(json.dumps({"stress": [{"weight": 2}]}), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    bank._RELOAD_CHECK_INTERVAL = 0
+    assert bank.choose("stress") == "Respire doucement."
+    assert bank.choose("stress") == "Respire doucement."
+    assert bank.version == 1
@@ -0,0 +1,24 @@
+import time
+
+from core.instance_registry import InstanceRegistry
+
+
+def test_idle_instances_are_closed_without_further_access():
+    closed = []
+
+    class Instance:
+        def __init__(self, user_id):
+            self.user_id = user_id
+
+        def close(self):
+            closed.append(self.user_id)
+
+    registry = InstanceRegistry(Instance, ttl=0.1, expire_interval=0.05)
+    registry.get("alice")
+    registry.get("bob")
+    deadline = time.monotonic() + 5
+    while len(closed) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert sorted(closed) == ["alice", "bob"]
+    assert len(registry) == 0
+    registry.close_all()
@@ -0,0 +1,19 @@
+import os
+import time
+
+from core.journal import Journal
+
+
+def test_batched_fsync_runs_without_a_later_append(tmp_path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(fd), fsync(fd)))
+    journal = Journal(str(tmp_path / "emotion_log.jsonl"))
+    journal._FSYNC_INTERVAL = 0.05
+    journal.append({"timestamp": "2026-01-01T00:00:00", "emotion": "joie"})
+    assert not synced
+    deadline = time.monotonic() + 5
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert synced
+    journal.close()
@@ -0,0 +1,32 @@
+import threading
+
+from core.memory_log import MemoryLogStore
+
+
+def test_concurrent_append_and_count(tmp_path):
+    # Les lecteurs rafraîchissent l'index pendant que l'écrivain l'étend : aucun offset en double.
+    store = MemoryLogStore(str(tmp_path))
+    total = 2000
+    done = threading.Event()
+    seen = []
+
+    def writer():
+        for i in range(total):
+            store.append("alice", {"i": i})
+        done.set()
+
+    def reader():
+        while not done.is_set():
+            seen.append(store.count("alice"))
+            store.read("alice", -5)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.count("alice") == total
+    assert max(seen, default=0) <= total
+    assert [entry["i"] for entry in store.read("alice")] == list(range(total))
+    assert MemoryLogStore(str(tmp_path)).count("alice") == total
@@ -0,0 +1,49 @@
+import json
+
+from core import profile_stats
+from core.insf_local_learner import INSFLocalLearner
+from core.profile_store import ProfileStore
+from core.storage import JSONStorage
+
+
+def test_incremental_stats_match_compute_stats_without_stored_stats(tmp_path):
+    # Profil antérieur aux compteurs : le premier événement les reconstruit sans compter l'entrée deux fois.
+    profiles_dir = tmp_path / "profiles"
+    profiles_dir.mkdir()
+    legacy = {
+        "user_id": "alice",
+        "trust_score": 70,
+        "speech_speed_avg": 150.0,
+        "preferred_voice": "Sol",
+        "feedback_history": [
+            {"timestamp": "2026-01-02T10:00:00", "voice_id": "Sol", "feedback": "positif",
+             "emotion": "neutre", "speech_speed_sample": 140.0},
+            {"timestamp": "2026-01-03T10:00:00", "voice_id": "Sol", "feedback": "confus",
+             "emotion": "triste", "speech_speed_sample": None},
+        ],
+        "last_emotion": "neutre",
+        "comprehension_scores": [{"timestamp": "2026-01-02T10:00:00", "score": 0.5}],
+        "dropout_risk_score": 0.1,
+        "creation_date": "2026-01-01T10:00:00",
+        "last_update_date": "2026-01-03T10:00:00",
+    }
+    storage = JSONStorage(str(profiles_dir), archive_dir=str(tmp_path / "archives"))
+    storage.save_profile("alice", dict(legacy))
+    store = ProfileStore(storage, write_behind=False)
+    learner = INSFLocalLearner(store)
+    assert "stats" not in learner.create_or_load_user_profile("alice")
+
+    learner.record_interaction("alice", "Sol", "négatif", "fatigué", 160.0)
+    profile = store.get("alice")
+    assert profile["stats"] == profile_stats.compute_stats(profile)
+    del profile["stats"]
+    learner.add_comprehension_score_to_profile("alice", 0.9)
+
+    profile = store.get("alice")
+    assert profile["stats"] == profile_stats.compute_stats(profile)
+    assert profile["stats"]["feedback_total"] == 3
+    assert profile["stats"]["comprehension_count"] == 2
+    assert learner.check_stats("alice") == []
+    with open(profiles_dir / "alice_profile.json", encoding="utf-8") as f:
+        assert json.load(f)["stats"] == profile["stats"]
+    store.close()
@@ -0,0 +1,37 @@
+import threading
+
+from core.profile_store import ProfileStore
+from core.storage import JSONStorage
+
+
+class SlowStorage(JSONStorage):
+    # Écritures bloquées jusqu'à ce que le test les libère.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def save_profiles(self, items: list):
+        self.writing.set()
+        assert self.release.wait(5)
+        super().save_profiles(items)
+
+
+def test_eviction_writes_outside_the_cache_lock(tmp_path):
+    storage = SlowStorage(str(tmp_path / "profiles"), archive_dir=str(tmp_path / "archives"))
+    JSONStorage.save_profile(storage, "carol", {"user_id": "carol", "trust_score": 50})
+    store = ProfileStore(storage, max_cached=1, write_behind=True, flush_interval=60)
+    alice = {"user_id": "alice", "trust_score": 90}
+    store.mark_dirty("alice", alice)
+
+    evicting = threading.Thread(target=store.put, args=("bob", {"user_id": "bob", "trust_score": 10}))
+    evicting.start()
+    assert storage.writing.wait(5)
+    # Pendant l'écriture d'alice : le cache répond, et alice revient sans relire le disque.
+    assert store.get("carol")["trust_score"] == 50
+    assert store.get("alice") is alice
+    storage.release.set()
+    evicting.join()
+
+    assert JSONStorage.load_profile(storage, "alice")["trust_score"] == 90
+    store.close()
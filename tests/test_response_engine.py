@@ -0,0 +1,29 @@
+import datetime
+import json
+
+from core.insf_local_learner import INSFLocalLearner
+from core.profile_store import ProfileStore
+from core.storage import JSONStorage
+
+
+def test_repeated_question_gets_an_answer_not_a_quote(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("insf_knowledge_base.json", "w", encoding="utf-8") as f:
+        json.dump({"stress": ["stress", "stressé", "examen", "peur"]}, f)
+    with open("reassurance_bank.json", "w", encoding="utf-8") as f:
+        json.dump({"stress": ["Respire doucement, tout va bien se passer."]}, f)
+    storage = JSONStorage(str(tmp_path / "profiles"), memory_dir=str(tmp_path / "memory_logs"),
+                          archive_dir=str(tmp_path / "archives"))
+    learner = INSFLocalLearner(ProfileStore(storage, write_behind=False))
+    log = storage.conversation_log()
+    question = "Je suis stressé, j'ai peur de mon examen"
+
+    answers = []
+    for _ in range(2):
+        answer = learner.generate_response(question, "alice")
+        seq = log.append("alice", {"timestamp": datetime.datetime.now().isoformat(),
+                                   "message": question, "response": answer})
+        learner.index_exchange("alice", seq, question)
+        answers.append(answer)
+
+    assert answers == ["Respire doucement, tout va bien se passer."] * 2
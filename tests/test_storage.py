@@ -0,0 +1,83 @@
+import datetime
+
+from core.insf_local_learner import INSFLocalLearner
+from core.profile_store import ProfileStore
+from core.retention import RetentionCompactor
+from core.storage import JSONStorage, SQLiteStorage, import_json_layout
+
+
+def test_sqlite_profile_writes_from_two_workers_are_merged(tmp_path):
+    # Deux connexions sur la même base jouent deux workers qui modifient le même profil.
+    db_path = str(tmp_path / "tryangel.db")
+    workers = []
+    for _ in range(2):
+        store = ProfileStore(SQLiteStorage(db_path), write_behind=False)
+        learner = INSFLocalLearner(store)
+        learner.create_or_load_user_profile("alice")
+        workers.append(learner)
+    first, second = workers
+
+    for _ in range(5):
+        first.record_interaction("alice", "Sol", "positif", "joie", 100.0)
+        second.record_interaction("alice", "Sol", "négatif", "triste", 200.0)
+        second.add_comprehension_score_to_profile("alice", 0.9)
+
+    reader = INSFLocalLearner(ProfileStore(SQLiteStorage(db_path), write_behind=False))
+    profile = reader.create_or_load_user_profile("alice")
+    assert profile["stats"]["feedback_total"] == 10
+    assert profile["stats"]["comprehension_count"] == 5
+    assert profile["trust_score"] == 70 + 5 * 2 - 5 * 5 + 5 * 1
+    assert profile["speech_speed_avg"] == 150.0
+    assert reader.check_stats("alice") == []
+
+
+def test_import_json_layout_keeps_archived_months(tmp_path):
+    source = JSONStorage(str(tmp_path / "profiles"), memory_dir=str(tmp_path / "memory_logs"),
+                         archive_dir=str(tmp_path / "archives"))
+    store = ProfileStore(source, write_behind=False)
+    learner = INSFLocalLearner(store)
+    profile = learner.create_or_load_user_profile("alice")
+    start = datetime.datetime(2025, 1, 1)
+    for i in range(300):
+        when = (start + datetime.timedelta(days=i)).isoformat()
+        profile["feedback_history"].append({"timestamp": when, "voice_id": "Sol", "feedback": "positif",
+                                            "emotion": "joie", "speech_speed_sample": 150.0})
+        source.event_log("alice", "emotion_log").append({"timestamp": when, "emotion": "joie"})
+    learner.rebuild_stats("alice")
+    done = RetentionCompactor(store, hot_days=30, hot_min=10).compact_user(
+        "alice", now=start + datetime.timedelta(days=300))
+    assert done["feedback_history"] > 200 and done["emotion_log"] > 200
+
+    target = SQLiteStorage(str(tmp_path / "tryangel.db"))
+    counts = import_json_layout(target, source)
+    assert counts["archived"] == done["feedback_history"] + done["emotion_log"]
+    for name in ("feedback_history", "emotion_log"):
+        assert target.archive_store().summary("alice", name) == source.archive_store().summary("alice", name)
+        assert target.archive_store().read("alice", name) == source.archive_store().read("alice", name)
+    imported = INSFLocalLearner(ProfileStore(target, write_behind=False))
+    assert len(imported.query_history("alice", "feedback_history")) == 300
+    assert len(imported.query_log("alice", "emotion_log")) == 300
+    assert imported.check_stats("alice") == []
+
+
+def test_sqlite_trim_history_keeps_rows_of_other_workers(tmp_path):
+    db_path = str(tmp_path / "tryangel.db")
+    first, second = (ProfileStore(SQLiteStorage(db_path), write_behind=False) for _ in range(2))
+
+    def entry(worker, second_):
+        return {"timestamp": f"2026-01-01T00:00:{second_:02d}", "voice_id": worker, "feedback": "positif",
+                "emotion": "joie", "speech_speed_sample": 150}
+
+    first.save("alice", {"user_id": "alice", "feedback_history": [entry("A", i) for i in range(5)],
+                         "comprehension_scores": []})
+    mine = first.get("alice")
+    theirs = second.get("alice")
+    theirs["feedback_history"].append(entry("B", 20))
+    second.save("alice", theirs)
+    for i in range(5, 10):
+        mine["feedback_history"].append(entry("A", i))
+
+    first.storage.trim_history("alice", mine, "feedback_history", 8)
+    rows = first.storage.query("SELECT voice_id, timestamp FROM feedback ORDER BY id")
+    assert rows == [("B", "2026-01-01T00:00:20"), ("A", "2026-01-01T00:00:08"), ("A", "2026-01-01T00:00:09")]
+    assert len(mine["feedback_history"]) == 2
@@ -0,0 +1,27 @@
+import os
+
+from core.tts_cache import TTSCache
+
+
+def fake_synthesizer(text, lang, voice, path):
+    with open(path, "wb") as f:
+        f.write(b"x" * int(text))
+
+
+def test_oversized_entry_is_returned_then_evicted_later(tmp_path):
+    cache = TTSCache(str(tmp_path / "voices"), max_bytes=1000, synthesizer=fake_synthesizer)
+    big = cache.get_or_create("5000")
+    assert os.path.exists(big)
+    small = cache.get_or_create("600")
+    assert os.path.exists(small) and not os.path.exists(big)
+
+
+def test_budget_counts_files_written_by_other_workers(tmp_path):
+    voice_dir = str(tmp_path / "voices")
+    first = TTSCache(voice_dir, max_bytes=1000, synthesizer=fake_synthesizer)
+    second = TTSCache(voice_dir, max_bytes=1000, synthesizer=fake_synthesizer)
+    second._RESCAN_INTERVAL = 0
+    first.get_or_create("700")
+    second.get_or_create("600")
+    assert sorted(os.path.getsize(os.path.join(voice_dir, f)) for f in os.listdir(voice_dir)) == [600]
+    assert second.stats()["bytes"] == 600